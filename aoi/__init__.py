@@ -1,4 +1,6 @@
+from .aliases import *
 from .aoi_bot import *
+from .bulk import *
 from .cmds_gen import *
 from .config import *
 from .custom_context import *
@@ -6,5 +8,8 @@ from .database import *
 from .database_models import *
 from .errors import *
 from .logging import *
+from .permissions import *
+from .render import *
+from .slowmode import *
 from .task import *
 from .triggers import *
@@ -0,0 +1,46 @@
+from typing import Dict, ItemsView, List, Optional, Tuple
+
+
+class AliasTable:
+    """
+    A guild's command aliases. The first word of a message is looked up directly, and a reverse index
+    from the first word of each alias target back to its aliases is kept in step on every change.
+    """
+
+    def __init__(self):
+        self._aliases: Dict[str, str] = {}
+        self._reverse: Dict[str, Dict[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+    def __contains__(self, alias: str) -> bool:
+        return alias in self._aliases
+
+    def items(self) -> ItemsView[str, str]:
+        return self._aliases.items()
+
+    def set(self, alias: str, to: str):
+        self.remove(alias)
+        self._aliases[alias] = to
+        self._reverse.setdefault(to.partition(" ")[0], {})[alias] = to
+
+    def remove(self, alias: str):
+        to = self._aliases.pop(alias, None)
+        if to is None:
+            return
+        target = to.partition(" ")[0]
+        del self._reverse[target][alias]
+        if not self._reverse[target]:
+            del self._reverse[target]
+
+    def resolve(self, content: str) -> Optional[str]:
+        """Returns the content with its first word replaced, or None if it isn't aliased"""
+        first, sep, rest = content.partition(" ")
+        to = self._aliases.get(first)
+        if to is None:
+            return None
+        return to + sep + rest
+
+    def reverse(self, *commands: str) -> List[Tuple[str, str]]:
+        return [(alias, to) for command in commands for alias, to in self._reverse.get(command, {}).items()]
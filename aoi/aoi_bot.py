@@ -7,7 +7,7 @@ import os
 import random
 import re
 import subprocess
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, Optional, List, Union, TYPE_CHECKING, Awaitable, Any, Callable, Tuple
 
 import aiohttp.client_exceptions
@@ -18,14 +18,22 @@ import aoi
 import discord
 # import pixivapi
 from discord.ext import commands, tasks
+from libs.byte_cache import ByteCache
+from libs.http_client import HttpClient
+from .aliases import AliasTable
+from .bulk import BulkOperation
 from wrappers import gmaps as gmaps, imgur
 from .cmds_gen import generate
 from .config import ConfigHandler
 from .database import AoiDatabase
+from .render import Renderer
 
 if TYPE_CHECKING:
     from aoi import AoiContext
 
+# stopped bulk operations kept per member for resumetask, older ones are dropped
+STOPPED_TASK_LIMIT = 5
+
 
 class FakeUser(discord.User):
     def __init__(self, *, state, data):
@@ -88,6 +96,9 @@ class AoiBot(commands.AutoShardedBot):
         self.logger = logging.getLogger("aoi")
         self.config = ConfigHandler()
         self.db: Optional[AoiDatabase] = None
+        self.renderer: Optional[Renderer] = None
+        self.image_cache: Optional[ByteCache] = None
+        self.web: Optional[HttpClient] = None
         self.prefixes: Dict[int, str] = {}
         self.banned_tags: List[str] = []
         self.gelbooru_key: str = ""
@@ -103,6 +114,7 @@ class AoiBot(commands.AutoShardedBot):
         # self.pixiv = pixivapi.Client()
         self.imgur: Optional[imgur.Imgur] = None
         self.messages = 0
+        self.chat_queue: Optional[asyncio.Queue] = None
         self.commands_executed = 0
         self.start_time = datetime.now()
         self.cog_groups = {}
@@ -111,16 +123,19 @@ class AoiBot(commands.AutoShardedBot):
         self.logger.debug(f"Found version string {version}")
         self.placeholders = PlaceholderManager()
         self.tasks: Dict[discord.Member, List[aoi.AoiTask]] = {}
+        # bulk operations that were stopped before finishing, they can be resumed
+        self.stopped_tasks: Dict[discord.Member, List[aoi.AoiTask]] = {}
         self.commands_ran = {}
         self.ksoft: Optional[ksoftapi.Client] = None
         self.fetched_users: Dict[int, Tuple[discord.User, datetime]] = {}
         self.is_restarting = False
         self.thumbnails: List[str] = []
         self.twitter_bearer = ""
-        self.slowmodes: Dict[int, int] = {}
         self.patreon_id: str = os.getenv("PATREON_ID")
         self.patreon_secret: str = os.getenv("PATREON_SECRET")
-        self.aliases: Dict[int, Dict[str, Tuple[str, bool]]] = {}
+        self.aliases: Dict[int, AliasTable] = {}
+        # non-bot members per guild, kept up to date from member events
+        self.human_counts: Dict[int, int] = {}
 
         async def command_ran(ctx: aoi.AoiContext):
             self.commands_executed += 1
@@ -131,6 +146,9 @@ class AoiBot(commands.AutoShardedBot):
 
         async def on_ready():
             self.logger.info(f"Aoi {self.version} online!")
+            # members are chunked by now
+            for guild in self.guilds:
+                self.count_humans(guild)
             await self.change_presence(activity=discord.Game(f",help | {len(self.guilds)} servers"))
             self.status_loop.start()
             await self.load_thumbnails()
@@ -142,6 +160,32 @@ class AoiBot(commands.AutoShardedBot):
 
         self.add_listener(on_ready, "on_ready")
 
+    async def on_member_join(self, member: discord.Member):
+        if not member.bot and member.guild.id in self.human_counts:
+            self.human_counts[member.guild.id] += 1
+
+    async def on_member_remove(self, member: discord.Member):
+        if not member.bot and member.guild.id in self.human_counts:
+            self.human_counts[member.guild.id] -= 1
+
+    async def on_guild_join(self, guild: discord.Guild):
+        self.count_humans(guild)
+
+    async def on_guild_available(self, guild: discord.Guild):
+        self.count_humans(guild)
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.human_counts.pop(guild.id, None)
+
+    def count_humans(self, guild: discord.Guild) -> int:
+        self.human_counts[guild.id] = sum(not m.bot for m in guild.members)
+        return self.human_counts[guild.id]
+
+    def humans(self, guild: discord.Guild) -> int:
+        if guild.id not in self.human_counts:
+            return self.count_humans(guild)
+        return self.human_counts[guild.id]
+
     async def fetch_unknown_user(self, user_id: int) -> discord.User:
         if self.get_user(user_id):
             if user_id in self.fetched_users:
@@ -161,18 +205,29 @@ class AoiBot(commands.AutoShardedBot):
     def create_task(self,
                     ctx: commands.Context,
                     coro: Awaitable[Any],  # noqa
-                    status: Optional[Callable[[], str]] = None):
+                    status: Optional[Callable[[], str]] = None,
+                    operation: Optional[BulkOperation] = None):
         task: asyncio.Task = asyncio.create_task(coro)
         if ctx.author not in self.tasks:
             self.tasks[ctx.author] = []
-        aoi_task = aoi.AoiTask(task, ctx, status=status or (lambda: ""))
+        aoi_task = aoi.AoiTask(task, ctx, status=status or (lambda: ""), operation=operation)
         self.tasks[ctx.author].append(aoi_task)
-        task.add_done_callback(lambda x: self.tasks[ctx.author].remove(aoi_task))
+        task.add_done_callback(lambda x: self._task_done(aoi_task))
         return task
 
+    def create_bulk_task(self, ctx: commands.Context, operation: BulkOperation):
+        return self.create_task(ctx, operation.run(), operation.status, operation)
+
+    def _task_done(self, aoi_task: aoi.AoiTask):
+        self.tasks[aoi_task.member].remove(aoi_task)
+        if aoi_task.task.cancelled() and aoi_task.operation and aoi_task.operation.remaining:
+            stopped = self.stopped_tasks.setdefault(aoi_task.member, [])
+            stopped.append(aoi_task)
+            del stopped[:-STOPPED_TASK_LIMIT]
+
     async def on_message(self, message: discord.Message):
         # check slowmode before all else
-        if await self.check_slowmode(message):
+        if self.check_slowmode(message):
             return
 
         if not message.guild:
@@ -181,13 +236,27 @@ class AoiBot(commands.AutoShardedBot):
         # handle aliases and transform message if needed
         message = await self.handle_aliases(message)
 
-        ctx: aoi.AoiContext = await self.get_context(message, cls=aoi.AoiContext)
-        await self.invoke(ctx)
-        if not ctx.command and not message.author.bot and message.guild:
-            await self.db.ensure_xp_entry(message)
-            await self.db.add_xp(message)
-            await self.db.add_global_currency(message)
-            self.messages += 1
+        # only messages starting with a prefix can be commands, everything else skips building a context.
+        # prefixed messages never count as chat, even when they don't name a command
+        if message.content.startswith(tuple(await self.get_prefix(message))):
+            await self.invoke(await self.get_context(message, cls=aoi.AoiContext))
+            return
+        if message.author.bot:
+            return
+        self.messages += 1
+        self.chat_queue.put_nowait(message)
+        self.dispatch("chat_message", message)
+
+    async def _chat_worker(self):
+        # xp and currency for chat are awarded in batches, so a burst of messages takes each db lock once
+        while True:
+            batch = [await self.chat_queue.get()]
+            while not self.chat_queue.empty() and len(batch) < 500:
+                batch.append(self.chat_queue.get_nowait())
+            try:
+                await self.db.add_chat_messages(batch)
+            except Exception:  # noqa
+                self.logger.exception(f"chat:Failed to award xp for {len(batch)} messages")
 
     async def start(self, *args, **kwargs):  # noqa: C901
         """|coro|
@@ -201,6 +270,21 @@ class AoiBot(commands.AutoShardedBot):
         bot = kwargs.pop('bot', True)  # noqa f841
         reconnect = kwargs.pop('reconnect', True)
         self.db = AoiDatabase(self)
+        self.renderer = Renderer(self,
+                                 self.config.get("render.workers"),
+                                 self.config.get("render.queue_size"),
+                                 self.config.get("render.per_guild"),
+                                 self.config.get("render.card_cache_size"))
+        self.image_cache = ByteCache(self.config.get("render.cache_dir"),
+                                     self.config.get("render.memory_cache_mb") * 1024 * 1024,
+                                     self.config.get("render.disk_cache_mb") * 1024 * 1024)
+        self.web = HttpClient(limit=self.config.get("http.limit"),
+                              limit_per_host=self.config.get("http.limit_per_host"),
+                              dns_ttl=self.config.get("http.dns_ttl"),
+                              keepalive=self.config.get("http.keepalive"),
+                              timeout=self.config.get("http.timeout"),
+                              retries=self.config.get("http.retries"),
+                              backoff=self.config.get("http.backoff"))
         self.banned_tags = os.getenv("BANNED_TAGS").split(",")
         self.gelbooru_user = os.getenv("GELBOORU_USER")
         self.gelbooru_key = os.getenv("GELBOORU_API_KEY")
@@ -210,20 +294,19 @@ class AoiBot(commands.AutoShardedBot):
         self.accuweather = os.getenv("ACCUWEATHER")
         self.imgur_user = os.getenv("IMGUR")
         self.imgur_secret = os.getenv("IMGUR_SECRET")
-        self.gmap = gmaps.GeoLocation(self.google)
+        self.gmap = gmaps.GeoLocation(self.google, self.web)
         self.ksoft_api = os.getenv("KSOFT")
         self.twitter_bearer = os.getenv("TWITTER_BEARER")
 
         # self.pixiv.login(self.pixiv_user, self.pixiv_password)
-        self.imgur = imgur.Imgur(self.imgur_user)
+        self.imgur = imgur.Imgur(self.imgur_user, self.web)
         await self.db.load()
+        self.chat_queue = asyncio.Queue()
+        self.loop.create_task(self._chat_worker())
 
         self.logger.info("Loading alias table")
         for row in await self.db.conn.execute_fetchall("select * from alias"):
-            if row[0] not in self.aliases:
-                self.aliases[row[0]] = {row[1]: row[2]}
-            else:
-                self.aliases[row[0]][row[1]] = row[2]
+            self.aliases.setdefault(row[0], AliasTable()).set(row[1], row[2])
 
         self.logger.info("Loaded alias table")
 
@@ -274,6 +357,13 @@ class AoiBot(commands.AutoShardedBot):
 
         await self.connect(reconnect=reconnect)
 
+    async def close(self):
+        if self.renderer:
+            self.renderer.close()
+        if self.web:
+            await self.web.close()
+        await super(AoiBot, self).close()
+
     def find_cog(self, name: str, *,
                  allow_ambiguous=False,
                  allow_none=False,
@@ -383,39 +473,36 @@ class AoiBot(commands.AutoShardedBot):
             delete_after=delete_after
         )
 
-    async def check_slowmode(self, message: discord.Message):
-        if message.channel.id not in self.slowmodes:
+    def check_slowmode(self, message: discord.Message) -> bool:
+        # in memory only, the database picks up changes on its next flush
+        if message.channel.id not in self.db.slowmode:
             return False
         if message.author.permissions_in(message.channel).manage_messages:
             return False
-        duration: int = self.slowmodes[message.channel.id]
-        row = await (await self.db.conn.execute("select timestamp from last_messages where user=? and channel=?",
-                                                (message.author.id, message.channel.id))).fetchone()
-        last = row[0] if row else 0
-        if message.created_at < datetime.fromtimestamp(last) + timedelta(seconds=duration):
+        if self.db.slowmode.allow(message.channel.id, message.author.id, message.created_at.timestamp()):
+            return False
+        self.loop.create_task(self._delete_slowmoded(message))
+        return True
+
+    async def _delete_slowmoded(self, message: discord.Message):
+        try:
             await message.delete()
-            return True
-        if last:
-            await self.db.conn.execute("update last_messages set timestamp=? where user=? and channel=?",
-                                       (message.created_at.timestamp(), message.author.id, message.channel.id))
-        else:
-            await self.db.conn.execute("insert into last_messages values (?,?,?)",
-                                       (message.channel.id, message.author.id, message.created_at.timestamp()))
-        return False
+        except discord.HTTPException as e:
+            self.logger.warning(f"slowmode:Couldn't delete message {message.id} in {message.channel.id}: {e}")
 
     async def handle_aliases(self, message: discord.Message) -> discord.Message:
-        content: str = message.content
-        if message.guild.id not in self.aliases:
+        table = self.aliases.get(message.guild.id)
+        if not table:
             return message
 
-        if content.split(" ")[0] in self.aliases[message.guild.id]:
-            message.content = " ".join([self.aliases[message.guild.id][content.split(" ")[0]]] +
-                                       content.split(" ")[1:])
-            return message
+        content = table.resolve(message.content)
+        if content is not None:
+            message.content = content
         return message
 
     async def rev_alias(self, ctx, command: str) -> Optional[List[Tuple[str, str]]]:
-        if ctx.guild.id in self.aliases and self.aliases[ctx.guild.id]:
-            return [(alias, to) for alias, to in self.aliases[ctx.guild.id].items()
-                    if to[0].split(" ")[0] == command] or None
-        return None
+        table = self.aliases.get(ctx.guild.id)
+        if not table:
+            return None
+        # alias targets may or may not include the prefix
+        return table.reverse(command, self.db.prefixes.get(ctx.guild.id, "") + command) or None
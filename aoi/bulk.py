@@ -0,0 +1,86 @@
+import asyncio
+import collections
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterable, List, Optional, TypeVar
+
+import discord
+
+T = TypeVar("T")
+
+
+class BulkOperation(Generic[T]):
+    """
+    Applies one discord call to each item, a few at a time. discord.py's http client already holds
+    requests until their bucket resets and retries 429s, so requests are issued as fast as it lets them
+    through. A 429 that still gets through pauses every worker for its Retry-After, and 5xx responses
+    are retried with exponential backoff.
+    discord.py doesn't expose bucket sizes, but workers past what the bucket allows just queue on its
+    lock, so `concurrency` only caps how many requests are in flight at once.
+    Items are only marked done once their call returns, so a stopped operation can be run again and
+    picks up the items it hadn't finished. `report` is awaited by whoever finishes the operation, the
+    command that started it or resumetask.
+    """
+
+    def __init__(self, items: Iterable[T], action: Callable[[T], Awaitable[Any]], *,
+                 concurrency: int = 4, retries: int = 3, backoff: float = 1,
+                 report: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.items = list(items)
+        self.action = action
+        self.report = report
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        # item index -> what the call returned, or the error it failed with
+        self.results: Dict[int, Any] = {}
+        self.failed: Dict[int, discord.HTTPException] = {}
+        self._paused_until = 0.0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def remaining(self) -> List[int]:
+        return [i for i in range(len(self.items)) if i not in self.results and i not in self.failed]
+
+    @property
+    def ordered_results(self) -> List[Any]:
+        return [self.results[i] for i in sorted(self.results)]
+
+    def status(self) -> str:
+        return f"{len(self.results)}/{len(self.items)}" + (f", {len(self.failed)} failed" if self.failed else "")
+
+    async def run(self):
+        pending = collections.deque(self.remaining)
+
+        async def worker():
+            while pending:
+                i = pending.popleft()
+                try:
+                    self.results[i] = await self._attempt(self.items[i])
+                except discord.HTTPException as error:
+                    self.failed[i] = error
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+
+    async def _attempt(self, item: T) -> Any:
+        loop = asyncio.get_event_loop()
+        attempt = 0
+        while True:
+            if self._paused_until > loop.time():
+                await asyncio.sleep(self._paused_until - loop.time())
+            try:
+                return await self.action(item)
+            except discord.HTTPException as error:
+                if error.status == 429:
+                    # rate limits aren't failures, wait them out without using up a retry
+                    self._paused_until = max(self._paused_until, loop.time() + self._retry_after(error))
+                    continue
+                if error.status < 500 or attempt >= self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def _retry_after(self, error: discord.HTTPException) -> float:
+        try:
+            return float(error.response.headers.get("Retry-After", self.backoff))
+        except (AttributeError, ValueError):
+            return self.backoff
@@ -12,6 +12,16 @@ class ConfigHandler:
                 config.write(sample.read())
         with open("assets/config.yaml") as config:
             self.yaml = YAML().load(config)
+        # pick up keys added to the sample since config.yaml was created
+        with open("assets/config_sample.yaml") as sample:
+            defaults = YAML().load(sample)
+        for category in defaults:
+            if category not in self.yaml:
+                self.yaml[category] = defaults[category]
+                continue
+            for key, value in defaults[category].items():
+                if key not in self.yaml[category]:
+                    self.yaml[category][key] = value
 
     def save(self):
         with open("assets/config.yaml", "w") as fp:
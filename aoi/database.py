@@ -1,21 +1,29 @@
 from __future__ import annotations
 
 import asyncio
+import collections
+import contextlib
 import datetime
 import sqlite3
-from typing import Dict, Optional, List, TYPE_CHECKING, Union, Tuple
+import time
+from typing import Dict, Optional, List, TYPE_CHECKING, Union, Tuple, OrderedDict, Set, Iterable, AsyncIterator
 
 import aiosqlite
 from aiosqlite import Connection
 
 import discord
 from aoi.database_models import GuildSettingModel, PunishmentModel, \
-    TimedPunishmentModel, RoleShopItemModel, PunishmentTypeModel, AoiMessageModel
+    TimedPunishmentModel, RoleShopItemModel, PunishmentTypeModel, AoiMessageModel, UserGlobalModel
 from discord.ext import tasks, commands
+from libs.rank_index import RankIndex
+from .permissions import PermissionProgram
+from .slowmode import SlowmodeTracker
 
 if TYPE_CHECKING:
     import aoi
 
+DATABASE = "database.db"
+
 SQL_STRING = """
 CREATE TABLE IF NOT EXISTS "permissions" (
   "guild"  INTEGER NOT NULL,
@@ -166,7 +174,6 @@ CREATE TABLE IF NOT EXISTS "quotes" (
   "name" TEXT NOT NULL,
   "content" TEXT NOT NULL
 );;
-CREATE INDEX IF NOT EXISTS idx_quotes on quotes (id);;
 CREATE TABLE IF NOT EXISTS "alias" (
   "guild" INTEGER NOT NULL,
   "from" TEXT NOT NULL,
@@ -180,24 +187,121 @@ CREATE TABLE IF NOT EXISTS roleplay (
 
 MIGRATIONS = {
     1: """
-ALTER TABLE guild_settings ADD COLUMN currency_img TEXT;
-ALTER TABLE guild_settings ADD COLUMN currency_chance INTEGER DEFAULT 4;
-ALTER TABLE guild_settings ADD COLUMN currency_max INTEGER DEFAULT 10;
-ALTER TABLE guild_settings ADD COLUMN currency_min INTEGER DEFAULT 8;
-ALTER TABLE guild_settings ADD COLUMN currency_gen_channels TEXT DEFAULT '';
+ALTER TABLE guild_settings ADD COLUMN currency_img TEXT;;
+ALTER TABLE guild_settings ADD COLUMN currency_chance INTEGER DEFAULT 4;;
+ALTER TABLE guild_settings ADD COLUMN currency_max INTEGER DEFAULT 10;;
+ALTER TABLE guild_settings ADD COLUMN currency_min INTEGER DEFAULT 8;;
+ALTER TABLE guild_settings ADD COLUMN currency_gen_channels TEXT DEFAULT '';;
     """,
     2: """
-ALTER TABLE guild_settings ADD COLUMN delete_on_ban INTEGER DEFAULT 1;
+ALTER TABLE guild_settings ADD COLUMN delete_on_ban INTEGER DEFAULT 1;;
     """,
     3: """
-ALTER TABLE guild_settings ADD COLUMN reply_embeds INTEGER DEFAULT 1;
+ALTER TABLE guild_settings ADD COLUMN reply_embeds INTEGER DEFAULT 1;;
     """,
     4: """
-ALTER TABLE punishments ADD COLUMN cleared INTEGER DEFAULT 0;
-ALTER TABLE punishments ADD COLUMN cleared_by INTEGER DEFAULT 0;
+ALTER TABLE punishments ADD COLUMN cleared INTEGER DEFAULT 0;;
+ALTER TABLE punishments ADD COLUMN cleared_by INTEGER DEFAULT 0;;
+    """,
+    5: """
+DELETE FROM xp WHERE rowid NOT IN (SELECT MAX(rowid) FROM xp GROUP BY user, guild);;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_xp_user_guild ON xp (user, guild);;
+DELETE FROM guild_currency WHERE rowid NOT IN (SELECT MAX(rowid) FROM guild_currency GROUP BY guild, user);;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_guild_currency_guild_user ON guild_currency (guild, user);;
+DELETE FROM global_currency WHERE rowid NOT IN (SELECT MAX(rowid) FROM global_currency GROUP BY user);;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_global_currency_user ON global_currency (user);;
+DELETE FROM user_global WHERE rowid NOT IN (SELECT MAX(rowid) FROM user_global GROUP BY user);;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_user_global_user ON user_global (user);;
+DELETE FROM currency_gains WHERE rowid NOT IN (SELECT MAX(rowid) FROM currency_gains GROUP BY guild);;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_currency_gains_guild ON currency_gains (guild);;
+    """,
+    6: """
+CREATE INDEX IF NOT EXISTS idx_punishments_user_guild ON punishments (user, guild, timestamp);;
+CREATE INDEX IF NOT EXISTS idx_punishments_guild ON punishments (guild);;
+DELETE FROM last_messages WHERE rowid NOT IN (SELECT MAX(rowid) FROM last_messages GROUP BY channel, user);;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_last_messages_channel_user ON last_messages (channel, user);;
+CREATE INDEX IF NOT EXISTS idx_rero_message ON rero (message, emoji);;
+DROP INDEX IF EXISTS idx_quotes;;
+CREATE INDEX IF NOT EXISTS idx_quotes_guild_name ON quotes (guild, name);;
+CREATE INDEX IF NOT EXISTS idx_quotes_user_guild ON quotes (user, guild);;
+CREATE INDEX IF NOT EXISTS idx_selfrole_guild ON selfrole (guild, role);;
+CREATE INDEX IF NOT EXISTS idx_selfrole_role ON selfrole (role);;
+CREATE INDEX IF NOT EXISTS idx_alias_guild ON alias (guild, "from");;
+CREATE INDEX IF NOT EXISTS idx_roletriggers_guild ON roletriggers (guild, type, role);;
+DELETE FROM warnpunish WHERE rowid NOT IN (SELECT MAX(rowid) FROM warnpunish GROUP BY guild, level);;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_warnpunish_guild_level ON warnpunish (guild, level);;
+    """,
+    7: """
+CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts USING fts5(name, content, content='quotes', content_rowid='id');;
+CREATE TRIGGER IF NOT EXISTS quotes_fts_insert AFTER INSERT ON quotes BEGIN
+  INSERT INTO quotes_fts (rowid, name, content) VALUES (new.id, new.name, new.content);
+END;;
+CREATE TRIGGER IF NOT EXISTS quotes_fts_delete AFTER DELETE ON quotes BEGIN
+  INSERT INTO quotes_fts (quotes_fts, rowid, name, content) VALUES ('delete', old.id, old.name, old.content);
+END;;
+CREATE TRIGGER IF NOT EXISTS quotes_fts_update AFTER UPDATE ON quotes BEGIN
+  INSERT INTO quotes_fts (quotes_fts, rowid, name, content) VALUES ('delete', old.id, old.name, old.content);
+  INSERT INTO quotes_fts (rowid, name, content) VALUES (new.id, new.name, new.content);
+END;;
+INSERT INTO quotes_fts (quotes_fts) VALUES ('rebuild');;
+    """,
+    8: """
+CREATE TABLE IF NOT EXISTS user_titles ("user" INTEGER NOT NULL, "title" TEXT NOT NULL);;
+CREATE INDEX IF NOT EXISTS idx_user_titles_user ON user_titles (user);;
+CREATE TABLE IF NOT EXISTS user_badges (
+  "user" INTEGER NOT NULL,
+  "badge" TEXT NOT NULL,
+  "equipped" INTEGER NOT NULL
+);;
+CREATE INDEX IF NOT EXISTS idx_user_badges_user ON user_badges (user);;
+INSERT INTO user_titles (user, title)
+  WITH RECURSIVE split (user, value, rest, n) AS (
+    SELECT user, '', owned_titles || ',', 0 FROM user_global WHERE owned_titles != ''
+    UNION ALL
+    SELECT user, substr(rest, 1, instr(rest, ',') - 1), substr(rest, instr(rest, ',') + 1), n + 1
+    FROM split WHERE rest != ''
+  )
+  SELECT user, value FROM split WHERE value != '' ORDER BY user, n;;
+INSERT INTO user_badges (user, badge, equipped)
+  WITH RECURSIVE split (user, value, rest, n) AS (
+    SELECT user, '', owned_badges || ',', 0 FROM user_global WHERE owned_badges != ''
+    UNION ALL
+    SELECT user, substr(rest, 1, instr(rest, ',') - 1), substr(rest, instr(rest, ',') + 1), n + 1
+    FROM split WHERE rest != ''
+  )
+  SELECT user, value, 0 FROM split WHERE value != '' ORDER BY user, n;;
+INSERT INTO user_badges (user, badge, equipped)
+  WITH RECURSIVE split (user, value, rest, n) AS (
+    SELECT user, '', badges || ',', 0 FROM user_global WHERE badges != ''
+    UNION ALL
+    SELECT user, substr(rest, 1, instr(rest, ',') - 1), substr(rest, instr(rest, ',') + 1), n + 1
+    FROM split WHERE rest != ''
+  )
+  SELECT user, value, 1 FROM split WHERE value != '' ORDER BY user, n;;
+UPDATE user_global SET badges=NULL, owned_titles=NULL, owned_badges=NULL;;
+    """,
+    9: """
+DELETE FROM current_punishments WHERE rowid NOT IN
+  (SELECT MAX(rowid) FROM current_punishments GROUP BY guild, user, role);;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_current_punishments_guild_user_role ON current_punishments (guild, user, role);;
     """
 }
 
+UPSERT_XP = "INSERT INTO xp (user, guild, xp) VALUES (?,?,?) " \
+            "ON CONFLICT (user, guild) DO UPDATE SET xp=excluded.xp"
+UPSERT_GUILD_CURRENCY = "INSERT INTO guild_currency (guild, user, amount) VALUES (?,?,?) " \
+                        "ON CONFLICT (guild, user) DO UPDATE SET amount=excluded.amount"
+UPSERT_GLOBAL_CURRENCY = "INSERT INTO global_currency (user, amount) VALUES (?,?) " \
+                         "ON CONFLICT (user) DO UPDATE SET amount=excluded.amount"
+UPSERT_USER_GLOBAL = "INSERT INTO user_global (user, title, background) VALUES (?,?,?) " \
+                     "ON CONFLICT (user) DO UPDATE SET title=excluded.title, background=excluded.background"
+UPSERT_CURRENCY_GAINS = "INSERT INTO currency_gains (guild, gain) VALUES (?,?) " \
+                        "ON CONFLICT (guild) DO UPDATE SET gain=excluded.gain"
+
+# seconds between xp gains per member and global currency gains per user
+XP_COOLDOWN = 180
+GLOBAL_CURRENCY_COOLDOWN = 60
+
 
 class AoiDatabase:
     # region # Database core
@@ -208,6 +312,7 @@ class AoiDatabase:
         self.guild_settings: Dict[int, GuildSettingModel] = {}
         self.prefixes: Dict[int, str] = {}
         self.perm_chains: Dict[int, List[str]] = {}
+        self.perm_programs: Dict[int, PermissionProgram] = {}
 
         self.xp_lock = asyncio.Lock()
         self.title_lock = asyncio.Lock()
@@ -216,36 +321,62 @@ class AoiDatabase:
         self.currency_gain_lock = asyncio.Lock()
         self.guild_shop_lock = asyncio.Lock()
         self.messages_lock = asyncio.Lock()
+        # held by every write on the shared connection, from the first statement to the commit,
+        # so no other commit or rollback can land inside a transaction
+        self.write_lock = asyncio.Lock()
+        self.write_waiting = 0
 
         self.xp: Dict[int, Dict[int, int]] = {}
-        self.changed_xp: Dict[int, List[int]] = {}
+        self.changed_xp: Dict[int, Set[int]] = {}
         self.global_currency: Dict[int, int] = {}
-        self.changed_global_currency: List[int] = []
+        self.changed_global_currency: Set[int] = set()
         self.messages: Dict[int, Tuple[AoiMessageModel, AoiMessageModel]] = {}
         self.global_xp: Dict[int, int] = {}
+        # kept in step with xp/global_xp so ranks don't need a full sort
+        self.xp_ranks: Dict[int, RankIndex] = {}
+        self.global_xp_ranks = RankIndex()
         self.guild_currency: Dict[int, Dict[int, int]] = {}
-        self.changed_guild_currency: Dict[int, List[int]] = {}
+        self.changed_guild_currency: Dict[int, Set[int]] = {}
         self.currency_gains: Dict[int, int] = {}
-        self.changed_currency_gains: List[int] = []
-        self.changed_guild_shop: List[int] = []
-        self.changed_messages: List[int] = []
+        self.changed_currency_gains: Set[int] = set()
+        self.changed_guild_shop: Set[int] = set()
+        self.changed_messages: Set[int] = set()
         self.auto_roles: Dict[int, List[int]] = {}
 
-        self.titles: Dict[int, str] = {}
-        self.owned_titles: Dict[int, List[str]] = {}
-        self.badges: Dict[int, List[str]] = {}
-        self.owned_badges: Dict[int, List[str]] = {}
-        self.backgrounds: Dict[int, str] = {}
-        self.changed_global_users: List[int] = []
+        self.user_globals: Dict[int, UserGlobalModel] = {}
+        self.changed_global_users: Set[int] = set()
 
         self.guild_shop: Dict[int, List[RoleShopItemModel]] = {}
 
         self.blacklisted: List[int] = []
 
-        self.xp_cooldown = commands.CooldownMapping.from_cooldown(
-            1.0, 180.0, commands.BucketType.member)
-        self.global_currency_cooldown = commands.CooldownMapping.from_cooldown(
-            1.0, 60.0, commands.BucketType.user)
+        self.slowmode = SlowmodeTracker()
+
+        # with lazy loading, per-guild and per-user rows are loaded on first use and
+        # the least recently used ones are dropped (after a flush if dirty) past the limits
+        self.lazy = False
+        self.lazy_guild_limit = 0
+        self.lazy_user_limit = 0
+        self.lazy_lock = asyncio.Lock()
+        self.loaded_guilds: OrderedDict[int, None] = collections.OrderedDict()
+        self.loaded_users: OrderedDict[int, None] = collections.OrderedDict()
+        # keys something is still working on, eviction skips them until it's done
+        self.pinned_guilds: collections.Counter = collections.Counter()
+        self.pinned_users: collections.Counter = collections.Counter()
+
+        # table name -> (rows written, milliseconds) for the last flush that touched it
+        self.flush_latency: Dict[str, Tuple[int, float]] = {}
+
+        # when each member last got xp and each user last got global currency, oldest first
+        self.xp_cooldown: Dict[Tuple[int, int], float] = {}
+        self.global_currency_cooldown: Dict[int, float] = {}
+
+        # idle read-only connections, query-heavy reads go through these so they don't queue behind writes
+        self.readers: Optional[asyncio.Queue] = None
+        self.reader_count = 0
+        self.read_waiting = 0
+        # statement -> [count, total ms, max ms, total ms waiting for a connection]
+        self.read_latency: Dict[str, List[float]] = {}
 
     async def perform_migrations(self):
         version = (await (await self.conn.execute("pragma user_version")).fetchone())[0]
@@ -253,17 +384,29 @@ class AoiDatabase:
         for i in sorted(MIGRATIONS.keys()):
             if i > version:
                 self.bot.logger.info(f"database:Upgrading to version {i + 1}")
-                [await self.conn.execute(_) for _ in MIGRATIONS[i].splitlines() if _]
+                [await self.conn.execute(_) for _ in MIGRATIONS[i].split(";;") if _.strip()]
                 await self.conn.execute(f"pragma user_version={i}")
                 await self.conn.commit()
 
     async def load(self):  # noqa: C901
         self.bot.logger.info("database:Connecting to database")
-        self.conn = await aiosqlite.connect("database.db")
+        cached_statements = self.bot.config.get("database.cached_statements")
+        self.conn = await aiosqlite.connect(DATABASE, cached_statements=cached_statements)
+        # WAL lets the read connections run alongside the writer, and NORMAL only syncs on checkpoints
+        await self.conn.execute("pragma journal_mode=WAL")
+        await self.conn.execute("pragma synchronous=NORMAL")
+        await self.conn.execute(f"pragma cache_size=-{self.bot.config.get('database.cache_size_mb') * 1024}")
         [await self.conn.execute(_) for _ in SQL_STRING.split(";;")]
         await self.conn.commit()
         await self.perform_migrations()
 
+        self.readers = asyncio.Queue()
+        self.reader_count = self.bot.config.get("database.read_connections")
+        for _ in range(self.reader_count):
+            reader = await aiosqlite.connect(f"file:{DATABASE}?mode=ro", uri=True, cached_statements=cached_statements)
+            await reader.execute(f"pragma cache_size=-{self.bot.config.get('database.cache_size_mb') * 1024}")
+            self.readers.put_nowait(reader)
+
         self.bot.logger.info("database:Loading database into memory")
         cursor = await self.conn.execute("SELECT * from guild_settings")
         rows = await cursor.fetchall()
@@ -297,6 +440,40 @@ class AoiDatabase:
 
         await self.cache_flush()
 
+        # load auto roles
+        cursor = await self.conn.execute("SELECT * from autorole")
+        rows = await cursor.fetchall()
+        await cursor.close()
+        for r in rows:
+            self.auto_roles[r[0]] = [int(x) for x in r[1].split(",") if x]
+
+        cursor = await self.conn.execute("select * from currency_gains")
+        rows = await cursor.fetchall()
+        await cursor.close()
+        for r in rows:
+            self.currency_gains[r[0]] = r[1]
+
+        for i in self.bot.guilds:
+            await self.ensure_currency_gain(i)
+
+        self.slowmode.load(await self.conn.execute_fetchall("select channel, seconds from slowmode"),
+                           await self.conn.execute_fetchall("select channel, user, timestamp from last_messages "
+                                                            "order by timestamp"))
+
+        self.lazy = self.bot.config.get("database.lazy_load")
+        self.lazy_guild_limit = self.bot.config.get("database.lazy_guilds")
+        self.lazy_user_limit = self.bot.config.get("database.lazy_users")
+        if self.lazy:
+            self.bot.logger.info("database:Lazy loading enabled, skipping user preload")
+            # global ranks cover every user, so the rank index holds all totals even when the rest is lazy
+            self.global_xp_ranks = RankIndex({r[0]: r[1] for r in await self.conn.execute_fetchall(
+                "select user, sum(xp) from xp group by user")})
+        else:
+            await self._preload_users()
+
+        self._cache_flush_loop.start()
+
+    async def _preload_users(self):  # noqa c901
         cursor = await self.conn.execute("SELECT * from xp")
         rows = await cursor.fetchall()
         await cursor.close()
@@ -305,6 +482,8 @@ class AoiDatabase:
                 self.xp[r[1]] = {}
             self.xp[r[1]][r[0]] = r[2]
             self.global_xp[r[0]] = self.global_xp.get(r[0], 0) + r[2]
+        self.xp_ranks = {guild: RankIndex(users) for guild, users in self.xp.items()}
+        self.global_xp_ranks = RankIndex(self.global_xp)
 
         # load global currency
         cursor = await self.conn.execute("SELECT * from global_currency")
@@ -313,13 +492,6 @@ class AoiDatabase:
         for r in rows:
             self.global_currency[r[0]] = r[1]
 
-        # load auto roles
-        cursor = await self.conn.execute("SELECT * from autorole")
-        rows = await cursor.fetchall()
-        await cursor.close()
-        for r in rows:
-            self.auto_roles[r[0]] = [int(x) for x in r[1].split(",") if x]
-
         cursor = await self.conn.execute("SELECT * from guild_shop")
         rows = await cursor.fetchall()
         await cursor.close()
@@ -328,24 +500,11 @@ class AoiDatabase:
                 self.guild_shop[r[0]] = []
             self.guild_shop[r[0]].append(RoleShopItemModel(*r[1:]))
 
-        cursor = await self.conn.execute("SELECT * from user_global")
-        rows = await cursor.fetchall()
-        await cursor.close()
-        for r in rows:
-            self.titles[r[0]] = r[1]
-            self.badges[r[0]] = r[2].split(",")
-            self.owned_titles[r[0]] = r[3].split(",")
-            self.owned_badges[r[0]] = r[4].split(",")
-            self.backgrounds[r[0]] = r[5]
-
-        cursor = await self.conn.execute("select * from currency_gains")
-        rows = await cursor.fetchall()
-        await cursor.close()
-        for r in rows:
-            self.currency_gains[r[0]] = r[1]
-
-        for i in self.bot.guilds:
-            await self.ensure_currency_gain(i)
+        self._set_user_globals(
+            await self.conn.execute_fetchall("select user, title, background from user_global"),
+            await self.conn.execute_fetchall("select user, title from user_titles order by rowid"),
+            await self.conn.execute_fetchall("select user, badge, equipped from user_badges order by rowid")
+        )
 
         cursor = await self.conn.execute("select * from guild_currency")
         rows = await cursor.fetchall()
@@ -359,111 +518,306 @@ class AoiDatabase:
             for m in i.members:
                 await self.ensure_user_entry(m)
 
-        self._cache_flush_loop.start()
+    def _set_user_globals(self, rows: Iterable[sqlite3.Row], titles: Iterable[sqlite3.Row],
+                          badges: Iterable[sqlite3.Row]):
+        loaded = {}
+        for user, title, background in rows:
+            loaded[user] = UserGlobalModel(title or "", background or "")
+        for user, title in titles:
+            if user in loaded:
+                loaded[user].add_title(title)
+        for user, badge, equipped in badges:
+            if user in loaded:
+                if equipped:
+                    loaded[user].badges += (badge,)
+                else:
+                    loaded[user].owned_badges += (badge,)
+        for user, model in loaded.items():
+            # users touched before loading may hold unflushed changes
+            self.user_globals.setdefault(user, model)
+
+    # region # Lazy loading
+
+    async def load_guild(self, guild: int):
+        if not self.lazy:
+            return
+        if guild in self.loaded_guilds:
+            self.loaded_guilds.move_to_end(guild)
+            return
+        async with self.lazy_lock:
+            if guild in self.loaded_guilds:
+                return
+            self.bot.logger.log(self.bot.TRACE, f"database:lazy loading guild {guild}")
+            xp = await self.conn.execute_fetchall("select user, xp from xp where guild=?", (guild,))
+            currency = await self.conn.execute_fetchall("select user, amount from guild_currency where guild=?",
+                                                        (guild,))
+            shop = await self.conn.execute_fetchall("select type, data, cost from guild_shop where guild=?",
+                                                    (guild,))
+            # rows loaded by an earlier touch are never overwritten, they may hold unflushed changes
+            self.xp[guild] = {**{r[0]: r[1] for r in xp}, **self.xp.get(guild, {})}
+            self.xp_ranks[guild] = RankIndex(self.xp[guild])
+            self.guild_currency[guild] = {**{r[0]: r[1] for r in currency}, **self.guild_currency.get(guild, {})}
+            if guild not in self.guild_shop and shop:
+                self.guild_shop[guild] = [RoleShopItemModel(*r) for r in shop]
+            self.loaded_guilds[guild] = None
+            await self._evict_guilds()
+
+    async def load_user(self, user: int):
+        if not self.lazy:
+            return
+        if user in self.loaded_users:
+            self.loaded_users.move_to_end(user)
+            return
+        async with self.lazy_lock:
+            if user in self.loaded_users:
+                return
+            self.bot.logger.log(self.bot.TRACE, f"database:lazy loading user {user}")
+            xp = await self.conn.execute_fetchall("select guild, xp from xp where user=?", (user,))
+            currency = await self.conn.execute_fetchall("select amount from global_currency where user=?", (user,))
+            user_global = await self.conn.execute_fetchall("select user, title, background from user_global "
+                                                           "where user=?", (user,))
+            titles = await self.conn.execute_fetchall("select user, title from user_titles where user=? "
+                                                      "order by rowid", (user,))
+            badges = await self.conn.execute_fetchall("select user, badge, equipped from user_badges where user=? "
+                                                      "order by rowid", (user,))
+            # loaded guilds may have xp that hasn't been flushed yet
+            per_guild = {r[0]: r[1] for r in xp}
+            per_guild.update({g: v[user] for g, v in self.xp.items() if user in v})
+            self.global_xp[user] = sum(per_guild.values())
+            self.global_xp_ranks.update(user, self.global_xp[user])
+            if user not in self.global_currency and currency:
+                self.global_currency[user] = list(currency)[0][0]
+            self._set_user_globals(user_global, titles, badges)
+            self.loaded_users[user] = None
+            await self._evict_users()
+
+    @contextlib.asynccontextmanager
+    async def pinned(self, guilds: Iterable[int], users: Iterable[int]):
+        """Loads the guilds and users and keeps them from being evicted until the block exits"""
+        if not self.lazy:
+            yield
+            return
+        guilds, users = set(guilds), set(users)
+        self.pinned_guilds.update(guilds)
+        self.pinned_users.update(users)
+        try:
+            for guild in guilds:
+                await self.load_guild(guild)
+            for user in users:
+                await self.load_user(user)
+            yield
+        finally:
+            self.pinned_guilds.subtract(guilds)
+            self.pinned_users.subtract(users)
+            for guild in guilds:
+                if not self.pinned_guilds[guild]:
+                    del self.pinned_guilds[guild]
+            for user in users:
+                if not self.pinned_users[user]:
+                    del self.pinned_users[user]
+        # anything held past the limits while pinned goes now
+        async with self.lazy_lock:
+            await self._evict_guilds()
+            await self._evict_users()
+
+    async def _evict_guilds(self):
+        while len(self.loaded_guilds) > self.lazy_guild_limit:
+            # least recently used first, pinned guilds are skipped and only a batch's worth can be pinned
+            guild = next((g for g in self.loaded_guilds if g not in self.pinned_guilds), None)
+            if guild is None:
+                return
+            if guild in self.changed_xp or guild in self.changed_guild_currency or guild in self.changed_guild_shop:
+                await self.cache_flush()
+                # the guild may have been touched again during the flush, so pick again
+                continue
+            del self.loaded_guilds[guild]
+            self.xp.pop(guild, None)
+            self.xp_ranks.pop(guild, None)
+            self.guild_currency.pop(guild, None)
+            self.guild_shop.pop(guild, None)
+
+    async def _evict_users(self):
+        while len(self.loaded_users) > self.lazy_user_limit:
+            user = next((u for u in self.loaded_users if u not in self.pinned_users), None)
+            if user is None:
+                return
+            if user in self.changed_global_currency or user in self.changed_global_users:
+                await self.cache_flush()
+                continue
+            del self.loaded_users[user]
+            # the user stays in global_xp_ranks, it holds every user's total
+            self.global_xp.pop(user, None)
+            self.global_currency.pop(user, None)
+            self.user_globals.pop(user, None)
+
+    async def get_global_rank(self, member: discord.Member) -> int:
+        await self.ensure_xp_entry(member)
+        return self.global_xp_ranks.rank(member.id)
+
+    async def get_rank(self, member: discord.Member) -> int:
+        await self.ensure_xp_entry(member)
+        return self.xp_ranks[member.guild.id].rank(member.id)
+
+    async def get_xp_page(self, guild: int, page: int, n: int) -> List[Tuple[int, int]]:
+        await self.load_guild(guild)
+        if guild not in self.xp_ranks:
+            return []
+        return self.xp_ranks[guild].page((page - 1) * n, n)
+
+    # endregion
+
+    # region # Read pool
+
+    async def read(self, sql: str, params: tuple = ()) -> Iterable[sqlite3.Row]:
+        """Runs a select on one of the read-only connections, only sees committed data"""
+        if not self.reader_count:
+            return await self.conn.execute_fetchall(sql, params)
+        start = time.perf_counter()
+        self.read_waiting += 1
+        reader = await self.readers.get()
+        self.read_waiting -= 1
+        waited = time.perf_counter() - start
+        try:
+            return await reader.execute_fetchall(sql, params)
+        finally:
+            self.readers.put_nowait(reader)
+            elapsed = (time.perf_counter() - start) * 1000
+            stats = self.read_latency.setdefault(sql, [0, 0, 0, 0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += waited * 1000
+
+    # endregion
+
+    # region # Writes
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Connection]:
+        """Holds the write lock and yields the connection, commits on exit and rolls back on error"""
+        self.write_waiting += 1
+        async with self.write_lock:
+            self.write_waiting -= 1
+            try:
+                yield self.conn
+            except BaseException:
+                await self.conn.rollback()
+                raise
+            await self.conn.commit()
+
+    async def write(self, sql: str, params: tuple = ()):
+        async with self.transaction() as conn:
+            await conn.execute(sql, params)
+
+    # endregion
 
     async def close(self):
         await self.cache_flush()
         await self.conn.close()
+        while self.readers and not self.readers.empty():
+            await self.readers.get_nowait().close()
 
     @tasks.loop(minutes=1)
     async def _cache_flush_loop(self):
         await self.cache_flush()
 
-    async def cache_flush(self):  # noqa: C901
-        self.bot.logger.log(self.bot.TRACE, "xp:flush:waiting for lock")
-        async with self.xp_lock:
-            self.bot.logger.log(self.bot.TRACE, "xp:flush:-got lock")
-            for guild, users in self.changed_xp.items():
-                for u in users:
-                    xp = self.xp[guild][u]
-                    self.bot.logger.log(self.bot.TRACE, f"xp:flush:-checking user {self.bot.get_user(u)}")
-                    a = await self.conn.execute("SELECT * from xp where guild = ? and user=?", (guild, u))
-                    if not await a.fetchall():
-                        self.bot.logger.log(self.bot.TRACE, f"xp:flush:-adding user {self.bot.get_user(u)}")
-                        await self.conn.execute("INSERT INTO xp (user, guild, xp) values (?,?,?)", (u, guild, 0))
-                    self.bot.logger.log(self.bot.TRACE, f"xp:flush:-updating user {self.bot.get_user(u)}")
-                    await self.conn.execute("UPDATE xp set xp=? where user=? and guild=?", (xp, u, guild))
-            await self.conn.commit()
-            self.changed_xp = {}
-        self.bot.logger.log(self.bot.TRACE, "xp:flush:released")
-        async with self.global_currency_lock:
-            for u in self.changed_global_currency:
-                a = await self.conn.execute("SELECT * from global_currency where user=?",
-                                            (u,))
-                if not await a.fetchall():
-                    await self.conn.execute("insert into global_currency (user, amount) "
-                                            "values (?,?)", (u, 0))
-                await self.conn.execute("update global_currency set amount=? where user=?",
-                                        (self.global_currency[u], u))
-            await self.conn.commit()
-            self.changed_global_currency = []
-        async with self.title_lock:
-            for u in self.changed_global_users:
-                a = await self.conn.execute("select * from user_global where user=?", (u,))
-                if not await a.fetchall():
-                    await self.conn.execute("insert into user_global (user, title, badges, owned_titles, owned_badges,"
-                                            "background) "
-                                            "values (?,?,?,?,?,?)", (u, "", "", "", "", ""))
-                await self.conn.execute("update user_global set title=?, badges=?, owned_titles=?, "
-                                        "owned_badges=?, background=? where user=?",
-                                        (self.titles[u],
-                                         ",".join(self.badges[u]),
-                                         ",".join(self.owned_titles[u]),
-                                         ",".join(self.owned_badges[u]),
-                                         self.backgrounds[u],
-                                         u))
-            await self.conn.commit()
-        async with self.guild_currency_lock:
-            self.bot.logger.log(self.bot.TRACE, "guild_cur:flush:-got lock")
-            for guild, users in self.changed_guild_currency.items():
-                for u in users:
-                    currency = self.guild_currency[guild][u]
-                    self.bot.logger.log(self.bot.TRACE, f"guild_cur:flush:-checking user {self.bot.get_user(u)}")
-                    a = await self.conn.execute("SELECT * from guild_currency where guild = ? and user=?",
-                                                (guild, u))
-                    if not await a.fetchall():
-                        self.bot.logger.log(self.bot.TRACE, f"guild_cur:flush:-adding user {self.bot.get_user(u)}")
-                        await self.conn.execute("INSERT INTO guild_currency (user, guild, amount) values (?,?,?)",
-                                                (u, guild, 0))
-                    self.bot.logger.log(self.bot.TRACE, f"guild_cur:flush:-updating user {self.bot.get_user(u)}")
-                    await self.conn.execute("UPDATE guild_currency set amount=? where user=? and guild=?",
-                                            (currency, u, guild))
-            await self.conn.commit()
-            self.changed_guild_currency = {}
-        async with self.currency_gain_lock:
-            for g in self.changed_currency_gains:
-                a = await self.conn.execute("SELECT * from currency_gains where guild=?",
-                                            (g,))
-                if not await a.fetchall():
-                    await self.conn.execute("insert into currency_gains (guild, gain) "
-                                            "values (?,?)", (g, 0))
-                await self.conn.execute("update currency_gains set gain=? where guild=?",
-                                        (self.currency_gains[g], g))
-            await self.conn.commit()
-            self.changed_currency_gains = []
-
-        async with self.guild_shop_lock:
-            for guild in self.changed_guild_shop:
-                await self.conn.execute("DELETE FROM guild_shop WHERE guild=?", (guild,))
-                for shop_item in self.guild_shop[guild]:
-                    await self.conn.execute("INSERT INTO guild_shop (guild, type, data, cost) values (?,?,?,?)",
-                                            (guild, shop_item.type, shop_item.data, shop_item.cost))
-            await self.conn.commit()
-
-        async with self.messages_lock:
-            for guild in self.changed_messages:
-                await self.conn.execute("delete from messages where guild=?", (guild,))
-                await self.conn.execute("INSERT INTO messages values (?,?,?,?,?,?,?)",
-                                        (guild,
-                                         self.messages[guild][0].message,
-                                         self.messages[guild][0].channel or 0,
-                                         self.messages[guild][0].delete or 0,
-                                         self.messages[guild][1].message,
-                                         self.messages[guild][1].channel or 0,
-                                         self.messages[guild][1].delete or 0,
-                                         ))
-            self.changed_messages = []
+    async def cache_flush(self):
+        # the write lock is held from collecting the rows to the commit, so two flushes can't overlap
+        # and an older snapshot never commits over a newer one
+        self.write_waiting += 1
+        async with self.write_lock:
+            self.write_waiting -= 1
+            await self._cache_flush()
+
+    async def _cache_flush(self):  # noqa: C901
+        # collect everything that changed since the last flush, then write each table in one batch.
+        # nothing here awaits, so the changed sets are swapped out atomically and chat accrual never waits on it
+        self.bot.logger.log(self.bot.TRACE, "flush:collecting changes")
+        changed_xp, self.changed_xp = self.changed_xp, {}
+        xp_rows = [(u, guild, self.xp[guild][u]) for guild, users in changed_xp.items() for u in users]
+        changed_global_currency, self.changed_global_currency = self.changed_global_currency, set()
+        global_currency_rows = [(u, self.global_currency[u]) for u in changed_global_currency]
+        changed_global_users, self.changed_global_users = self.changed_global_users, set()
+        user_global_rows = [(u, self.user_globals[u].title, self.user_globals[u].background)
+                            for u in changed_global_users]
+        user_title_rows = [(u, title) for u in changed_global_users for title in self.user_globals[u].owned_titles]
+        user_badge_rows = [(u, badge, equipped) for u in changed_global_users
+                           for equipped, badges in enumerate((self.user_globals[u].owned_badges,
+                                                              self.user_globals[u].badges))
+                           for badge in badges]
+        changed_guild_currency, self.changed_guild_currency = self.changed_guild_currency, {}
+        guild_currency_rows = [(guild, u, self.guild_currency[guild][u])
+                               for guild, users in changed_guild_currency.items() for u in users]
+        changed_currency_gains, self.changed_currency_gains = self.changed_currency_gains, set()
+        currency_gain_rows = [(g, self.currency_gains[g]) for g in changed_currency_gains]
+        changed_guild_shop, self.changed_guild_shop = self.changed_guild_shop, set()
+        guild_shop_rows = [(guild, shop_item.type, shop_item.data, shop_item.cost)
+                           for guild in changed_guild_shop for shop_item in self.guild_shop[guild]]
+        changed_messages, self.changed_messages = self.changed_messages, set()
+        messages_rows = [(guild,
+                          self.messages[guild][0].message,
+                          self.messages[guild][0].channel or 0,
+                          self.messages[guild][0].delete or 0,
+                          self.messages[guild][1].message,
+                          self.messages[guild][1].channel or 0,
+                          self.messages[guild][1].delete or 0) for guild in changed_messages]
+        self.slowmode.expire(time.time())
+        changed_slowmodes, last_message_rows = self.slowmode.take_changes()
+
+        # everything below runs in a single transaction
+        start = time.perf_counter()
+        try:
+            await self._flush_rows("xp", UPSERT_XP, xp_rows)
+            await self._flush_rows("global_currency", UPSERT_GLOBAL_CURRENCY, global_currency_rows)
+            await self._flush_rows("user_global", UPSERT_USER_GLOBAL, user_global_rows)
+            if changed_global_users:
+                users = [(u,) for u in changed_global_users]
+                await self.conn.executemany("DELETE FROM user_titles WHERE user=?", users)
+                await self.conn.executemany("DELETE FROM user_badges WHERE user=?", users)
+            await self._flush_rows("user_titles", "INSERT INTO user_titles (user, title) values (?,?)", user_title_rows)
+            await self._flush_rows("user_badges", "INSERT INTO user_badges (user, badge, equipped) values (?,?,?)",
+                                   user_badge_rows)
+            await self._flush_rows("guild_currency", UPSERT_GUILD_CURRENCY, guild_currency_rows)
+            await self._flush_rows("currency_gains", UPSERT_CURRENCY_GAINS, currency_gain_rows)
+            if changed_guild_shop:
+                await self.conn.executemany("DELETE FROM guild_shop WHERE guild=?", [(g,) for g in changed_guild_shop])
+            await self._flush_rows("guild_shop", "INSERT INTO guild_shop (guild, type, data, cost) values (?,?,?,?)",
+                                   guild_shop_rows)
+            await self._flush_rows("messages", "INSERT OR REPLACE INTO messages values (?,?,?,?,?,?,?)", messages_rows)
+            if changed_slowmodes:
+                await self.conn.executemany("DELETE FROM last_messages WHERE channel=?",
+                                            [(c,) for c in changed_slowmodes])
+            await self._flush_rows("last_messages", "INSERT INTO last_messages values (?,?,?)", last_message_rows)
             await self.conn.commit()
+        except sqlite3.Error:
+            await self.conn.rollback()
+            # put the changes back so the next flush retries them
+            for guild, users in changed_xp.items():
+                self.changed_xp.setdefault(guild, set()).update(users)
+            for guild, users in changed_guild_currency.items():
+                self.changed_guild_currency.setdefault(guild, set()).update(users)
+            self.changed_global_currency |= changed_global_currency
+            self.changed_global_users |= changed_global_users
+            self.changed_currency_gains |= changed_currency_gains
+            self.changed_guild_shop |= changed_guild_shop
+            self.changed_messages |= changed_messages
+            self.slowmode.restore_changes(changed_slowmodes)
+            self.bot.logger.exception("flush:Cache flush failed, changes will be retried")
+            raise
+        self.flush_latency["total"] = (len(xp_rows) + len(global_currency_rows) + len(user_global_rows) +
+                                       len(user_title_rows) + len(user_badge_rows) +
+                                       len(guild_currency_rows) + len(currency_gain_rows) +
+                                       len(guild_shop_rows) + len(messages_rows) + len(last_message_rows),
+                                       (time.perf_counter() - start) * 1000)
+        self.bot.logger.log(self.bot.TRACE, f"flush:done in {self.flush_latency['total'][1]:.2f}ms")
+
+    async def _flush_rows(self, table: str, sql: str, rows: List[tuple]):
+        if not rows:
+            return
+        start = time.perf_counter()
+        await self.conn.executemany(sql, rows)
+        self.flush_latency[table] = (len(rows), (time.perf_counter() - start) * 1000)
+        self.bot.logger.log(self.bot.TRACE, f"flush:{table}:{len(rows)} rows in {self.flush_latency[table][1]:.2f}ms")
 
     # endregion
 
@@ -475,27 +829,27 @@ class AoiDatabase:
         elif role.id not in self.auto_roles[guild.id]:
             self.auto_roles[guild.id].append(role.id)
         # immediately write to database
-        a = await self.conn.execute("select * from autorole where guild=?", (guild.id,))
-        if not await a.fetchall():
-            await self.conn.execute("insert into autorole (guild, roles) values (?,?)",
-                                    (guild.id, ",".join(map(str, self.auto_roles[guild.id]))))
-        else:
-            await self.conn.execute("update autorole set roles=? where guild=?",
-                                    (",".join(map(str, self.auto_roles[guild.id])), guild.id))
-        await self.conn.commit()
+        async with self.transaction() as conn:
+            a = await conn.execute("select * from autorole where guild=?", (guild.id,))
+            if not await a.fetchall():
+                await conn.execute("insert into autorole (guild, roles) values (?,?)",
+                                   (guild.id, ",".join(map(str, self.auto_roles[guild.id]))))
+            else:
+                await conn.execute("update autorole set roles=? where guild=?",
+                                   (",".join(map(str, self.auto_roles[guild.id])), guild.id))
 
     async def del_auto_role(self, guild: discord.Guild, role: int):
         if guild.id in self.auto_roles and role in self.auto_roles[guild.id]:
             self.auto_roles[guild.id].remove(role)
         # immediately write to database
-        a = await self.conn.execute("select * from autorole where guild=?", (guild.id,))
-        if not await a.fetchall():
-            await self.conn.execute("insert into autorole (guild, roles) values (?,?)",
-                                    (guild.id, ",".join(map(str, self.auto_roles[guild.id]))))
-        else:
-            await self.conn.execute("update autorole set roles=? where guild=?",
-                                    (",".join(map(str, self.auto_roles[guild.id])), guild.id))
-        await self.conn.commit()
+        async with self.transaction() as conn:
+            a = await conn.execute("select * from autorole where guild=?", (guild.id,))
+            if not await a.fetchall():
+                await conn.execute("insert into autorole (guild, roles) values (?,?)",
+                                   (guild.id, ",".join(map(str, self.auto_roles[guild.id]))))
+            else:
+                await conn.execute("update autorole set roles=? where guild=?",
+                                   (",".join(map(str, self.auto_roles[guild.id])), guild.id))
 
     # endregion
 
@@ -503,30 +857,28 @@ class AoiDatabase:
 
     async def get_self_roles(self, guild: discord.Guild) -> List[int]:
         return [a[0] for a in
-                await self.conn.execute_fetchall(f"select role from selfrole where guild=?", (guild.id,))]
+                await self.read("select role from selfrole where guild=?", (guild.id,))]
 
     async def add_self_role(self, guild: discord.Guild, role: discord.Role) -> None:
         if role.id in await self.get_self_roles(guild):
             return
-        await self.conn.execute("insert into selfrole (guild, role) values (?,?)", (guild.id, role.id))
-        await self.conn.commit()
+        await self.write("insert into selfrole (guild, role) values (?,?)", (guild.id, role.id))
 
     async def remove_self_role(self, guild: discord.Guild, role: Union[discord.Role, int]) -> None:
         if isinstance(role, discord.Role):
             role = role.id
-        await self.conn.execute("delete from selfrole where role=?", (role,))
-        await self.conn.commit()
+        await self.write("delete from selfrole where role=?", (role,))
 
     # endregion
 
     # region # Guild shop
 
     async def ensure_guild_shop(self, guild: discord.Guild) -> None:
+        await self.load_guild(guild.id)
         if guild.id not in self.guild_shop:
             async with self.guild_shop_lock:
                 self.guild_shop[guild.id] = []
-                if guild.id not in self.changed_guild_shop:
-                    self.changed_guild_shop.append(guild.id)
+                self.changed_guild_shop.add(guild.id)
 
     async def get_guild_shop(self, guild: discord.Guild) -> List[RoleShopItemModel]:
         await self.ensure_guild_shop(guild)
@@ -536,8 +888,7 @@ class AoiDatabase:
         await self.ensure_guild_shop(guild)
         async with self.guild_shop_lock:
             self.guild_shop[guild.id].append(RoleShopItemModel(typ, data, cost))
-            if guild.id not in self.changed_guild_shop:
-                self.changed_guild_shop.append(guild.id)
+            self.changed_guild_shop.add(guild.id)
 
     async def del_guild_shop_item(self, guild: discord.Guild, typ: str, data: str):
         await self.ensure_guild_shop(guild)
@@ -548,8 +899,7 @@ class AoiDatabase:
         else:
             raise commands.CommandError("Guild shop item does not exist")
         async with self.guild_shop_lock:
-            if guild.id not in self.changed_guild_shop:
-                self.changed_guild_shop.append(guild.id)
+            self.changed_guild_shop.add(guild.id)
             self.guild_shop[guild.id].remove(found)
 
     # region # Helper Methods
@@ -566,15 +916,13 @@ class AoiDatabase:
     async def ensure_currency_gain(self, guild: discord.Guild):
         if guild.id not in self.currency_gains:
             async with self.currency_gain_lock:
-                if guild.id not in self.changed_currency_gains:
-                    self.changed_currency_gains.append(guild.id)
+                self.changed_currency_gains.add(guild.id)
                 self.currency_gains[guild.id] = 0
 
     async def set_currency_gain(self, guild: discord.Guild, new: int):
         await self.ensure_currency_gain(guild)
         async with self.currency_gain_lock:
-            if guild.id not in self.changed_currency_gains:
-                self.changed_currency_gains.append(guild.id)
+            self.changed_currency_gains.add(guild.id)
             self.currency_gains[guild.id] = new
 
     async def get_currency_gain(self, guild: discord.Guild):
@@ -586,59 +934,56 @@ class AoiDatabase:
     # region # User
 
     async def ensure_user_entry(self, member: discord.Member):
-        async with self.title_lock:
-            if member.id not in self.titles:
-                self.titles[member.id] = ""
-            if member.id not in self.owned_titles:
-                self.owned_titles[member.id] = []
-            if member.id not in self.badges:
-                self.badges[member.id] = []
-            if member.id not in self.owned_badges:
-                self.owned_badges[member.id] = []
-            if member.id not in self.backgrounds:
-                self.backgrounds[member.id] = ""
-            if member.id not in self.changed_global_users:
-                self.changed_global_users.append(member.id)
+        await self.load_user(member.id)
+        if member.id not in self.user_globals:
+            self.user_globals[member.id] = UserGlobalModel()
+            self.changed_global_users.add(member.id)
 
-    async def get_titles(self, member: discord.Member) -> Tuple[str, List[str]]:
+    async def get_user_global(self, member: discord.Member) -> UserGlobalModel:
         await self.ensure_user_entry(member)
-        return self.titles[member.id], self.owned_titles[member.id]
+        return self.user_globals[member.id]
+
+    async def get_titles(self, member: discord.Member) -> Tuple[str, List[str]]:
+        user = await self.get_user_global(member)
+        return user.title, user.owned_titles
 
     async def get_badges(self, member: discord.Member) -> Tuple[List[str], List[str]]:
-        await self.ensure_user_entry(member)
-        return self.badges[member.id], self.owned_badges[member.id]
+        user = await self.get_user_global(member)
+        return user.badges, user.owned_badges
 
     async def add_title(self, member: discord.Member, title: str):
-        await self.ensure_user_entry(member)
+        user = await self.get_user_global(member)
         async with self.title_lock:
-            self.owned_titles[member.id].append(title)
+            user.add_title(title)
+            self.changed_global_users.add(member.id)
+            self._card_changed(member.id)
         await self.cache_flush()
 
     async def equip_title(self, member: discord.Member, index: int):
-        await self.ensure_user_entry(member)
+        user = await self.get_user_global(member)
         async with self.title_lock:
-            self.titles[member.id] = self.owned_titles[member.id][index]
+            user.title = user.owned_titles[index]
+            self.changed_global_users.add(member.id)
+            self._card_changed(member.id)
+        await self.cache_flush()
+
+    async def set_background(self, member: discord.Member, background: str):
+        user = await self.get_user_global(member)
+        user.background = background
+        self.changed_global_users.add(member.id)
+        self._card_changed(member.id)
         await self.cache_flush()
 
     async def get_badges_titles(self, member: discord.Member) -> Tuple[str, List[str], List[str], List[str], str]:
-        await self.ensure_user_entry(member)
-        async with self.title_lock:
-            if member.id not in self.titles:
-                self.titles[member.id] = ""
-                self.badges[member.id] = []
-                self.owned_badges[member.id] = []
-                self.owned_titles[member.id] = []
-                await self.conn.execute("insert into user_global (user, title, badges, owned_titles, owned_badges) "
-                                        "values (?,?,?,?,?)", (member.id, "", "", "", ""))
-                await self.conn.commit()
-            return self.titles[member.id], self.badges[member.id], self.owned_titles[member.id], \
-                   self.owned_badges[member.id], self.backgrounds[member.id]
+        user = await self.get_user_global(member)
+        return user.title, user.badges, user.owned_titles, user.owned_badges, user.background
 
     # endregion
 
     # region # Guild currency
 
     async def ensure_guild_currency_entry(self, member: discord.Member):
+        await self.load_guild(member.guild.id)
         self.bot.logger.log(self.bot.TRACE, "guild_cur:ensure:waiting for lock")
         async with self.guild_currency_lock:
             self.bot.logger.log(self.bot.TRACE, "guild_cur:ensure:-got lock")
@@ -646,10 +991,7 @@ class AoiDatabase:
                 self.guild_currency[member.guild.id] = {}
             if member.id not in self.guild_currency[member.guild.id]:
                 self.guild_currency[member.guild.id][member.id] = 0
-            if member.guild.id not in self.changed_guild_currency:
-                self.changed_guild_currency[member.guild.id] = []
-            if member.id not in self.changed_guild_currency[member.guild.id]:
-                self.changed_guild_currency[member.guild.id].append(member.id)
+            self.changed_guild_currency.setdefault(member.guild.id, set()).add(member.id)
         self.bot.logger.log(self.bot.TRACE, f"guild_cur:ensure:-releasing lock")
 
     async def get_guild_currency(self, member: discord.Member) -> int:
@@ -660,10 +1002,8 @@ class AoiDatabase:
         await self.ensure_guild_currency_entry(member)
         async with self.guild_currency_lock:
             self.guild_currency[member.guild.id][member.id] += amount
-            if member.guild.id not in self.changed_guild_currency:
-                self.changed_guild_currency[member.guild.id] = []
-            if member.id not in self.changed_guild_currency[member.guild.id]:
-                self.changed_guild_currency[member.guild.id].append(member.id)
+            self._card_changed(member.id)
+            self.changed_guild_currency.setdefault(member.guild.id, set()).add(member.id)
 
     # endregion
 
@@ -674,27 +1014,18 @@ class AoiDatabase:
         return self.global_currency[member.id]
 
     async def award_global_currency(self, member: discord.Member, amount: int):
+        await self.load_user(member.id)
         async with self.global_currency_lock:
             self.global_currency[member.id] = self.global_currency.get(member.id, 0) + amount
-            if member.id not in self.changed_global_currency:
-                self.changed_global_currency.append(member.id)
+            self._card_changed(member.id)
+            self.changed_global_currency.add(member.id)
 
     async def ensure_global_currency_entry(self, member: discord.Member):
+        await self.load_user(member.id)
         async with self.global_currency_lock:
             if member.id not in self.global_currency:
                 self.global_currency[member.id] = 0
-                if member.id not in self.changed_global_currency:
-                    self.changed_global_currency.append(member.id)
-
-    async def add_global_currency(self, msg: discord.Message):
-        if msg.author.id in self.blacklisted:
-            return
-        if self.global_currency_cooldown.get_bucket(msg).update_rate_limit():
-            return
-        async with self.global_currency_lock:
-            self.global_currency[msg.author.id] = self.global_currency.get(msg.author.id, 0) + 1
-            if msg.author.id not in self.changed_global_currency:
-                self.changed_global_currency.append(msg.author.id)
+                self.changed_global_currency.add(member.id)
 
     # endregion
 
@@ -707,65 +1038,97 @@ class AoiDatabase:
         else:
             guild_id = msg.guild.id
             user_id = msg.id
-        self.bot.logger.log(self.bot.TRACE, "xp:ensure:waiting for lock")
-        async with self.xp_lock:
-            self.bot.logger.log(self.bot.TRACE, "xp:ensure:-got lock")
-            if user_id not in self.global_xp:
-                self.global_xp[user_id] = 0
-                for _, v in self.xp.items():
-                    self.global_xp[user_id] += v.get(user_id, 0)
-            if guild_id not in self.xp:
-                self.xp[guild_id] = {}
-            if user_id not in self.xp[guild_id]:
-                self.xp[guild_id][user_id] = 0
-            if guild_id not in self.changed_xp:
-                self.changed_xp[guild_id] = []
-            if user_id not in self.changed_xp[guild_id]:
-                self.changed_xp[guild_id].append(user_id)
+        async with self.pinned((guild_id,), (user_id,)):
+            self.bot.logger.log(self.bot.TRACE, "xp:ensure:waiting for lock")
+            async with self.xp_lock:
+                self.bot.logger.log(self.bot.TRACE, "xp:ensure:-got lock")
+                self._ensure_xp(guild_id, user_id)
         self.bot.logger.log(self.bot.TRACE, f"xp:ensure:-releasing lock")
 
-    async def add_xp(self, msg: discord.Message):  # noqa c901
-        if msg.author.bot:
-            return
-        if msg.author.id in self.blacklisted:
-            return
-        if self.xp_cooldown.get_bucket(msg).update_rate_limit():
-            return
-        self.bot.logger.log(self.bot.TRACE, f"xp:add:ensure xp entry for {msg.author}")
-        await self.ensure_xp_entry(msg)
-        c = 0
-        for i in msg.guild.members:
-            if not i.bot:
-                c += 1
-            if c == 3:
-                break
-        if c < 3:
-            return
-        self.bot.logger.log(self.bot.TRACE, f"xp:add:waiting for lock")
+    def _ensure_xp(self, guild_id: int, user_id: int):
+        # caller holds xp_lock
+        if user_id not in self.global_xp:
+            # anyone with xp already has a global total, from the preload or from load_user when lazy
+            self.global_xp[user_id] = 0
+            self.global_xp_ranks.update(user_id, 0)
+        if guild_id not in self.xp:
+            self.xp[guild_id] = {}
+            self.xp_ranks[guild_id] = RankIndex()
+        if user_id not in self.xp[guild_id]:
+            self.xp[guild_id][user_id] = 0
+            self.xp_ranks[guild_id].update(user_id, 0)
+            self.changed_xp.setdefault(guild_id, set()).add(user_id)
+
+    def _card_changed(self, user: int):
+        # rendered cards for this user are now out of date
+        if self.bot.renderer:
+            self.bot.renderer.invalidate(user)
+
+    def _set_xp(self, guild: int, user: int, xp: int):
+        self._card_changed(user)
+        self.global_xp[user] += xp - self.xp[guild][user]
+        self.xp[guild][user] = xp
+        self.xp_ranks[guild].update(user, xp)
+        self.global_xp_ranks.update(user, self.global_xp[user])
+
+    async def set_xp(self, member: discord.Member, xp: int):
+        await self.ensure_xp_entry(member)
         async with self.xp_lock:
-            self.bot.logger.log(self.bot.TRACE, f"xp:add:-got lock")
-            self.xp[msg.guild.id][msg.author.id] += 3
-            self.global_xp[msg.author.id] += 3
-            if msg.author.id not in self.changed_xp[msg.guild.id]:
-                self.bot.logger.log(self.bot.TRACE, f"xp:add:-adding user change for {msg.author}")
-                self.changed_xp[msg.guild.id].append(msg.author.id)
-        self.bot.logger.log(self.bot.TRACE, f"xp:add:-releasing lock")
-        await self.ensure_currency_gain(msg.guild)
-        await self.ensure_guild_currency_entry(msg.author)
-        async with self.guild_currency_lock:
-            self.guild_currency[msg.guild.id][msg.author.id] += self.currency_gains[msg.guild.id]
-            if msg.guild.id not in self.changed_guild_currency:
-                self.changed_guild_currency[msg.guild.id] = []
-            if msg.author.id not in self.changed_guild_currency[msg.guild.id]:
-                self.changed_guild_currency[msg.guild.id].append(msg.author.id)
+            self._set_xp(member.guild.id, member.id, max(xp, 0))
+            self.changed_xp.setdefault(member.guild.id, set()).add(member.id)
+
+    async def add_chat_messages(self, messages: List[discord.Message]):
+        """Awards xp and currency for a batch of non-command messages"""
+        messages = [m for m in messages if not m.author.bot and m.author.id not in self.blacklisted]
+        if not self.lazy:
+            return self._add_chat_messages(messages)
+        # loading one key can evict another, so the whole batch stays loaded until it's been applied
+        async with self.pinned((m.guild.id for m in messages), (m.author.id for m in messages)):
+            self._add_chat_messages(messages)
+
+    def _add_chat_messages(self, messages: List[discord.Message]):
+        # nothing here awaits, so it can't interleave with a flush swapping out the changed sets
+        # and doesn't need the locks
+        now = time.time()
+        for msg in messages:
+            guild, user = msg.guild.id, msg.author.id
+            self._ensure_xp(guild, user)
+            if self._off_cooldown(self.global_currency_cooldown, user, GLOBAL_CURRENCY_COOLDOWN, now):
+                self.global_currency[user] = self.global_currency.get(user, 0) + 1
+                self.changed_global_currency.add(user)
+                self._card_changed(user)
+            # xp is only given in guilds with at least 3 humans
+            if not self._off_cooldown(self.xp_cooldown, (guild, user), XP_COOLDOWN, now) or \
+                    not self._has_humans(msg.guild):
+                continue
+            self._set_xp(guild, user, self.xp[guild][user] + 3)
+            self.changed_xp.setdefault(guild, set()).add(user)
+            if guild not in self.currency_gains:
+                self.currency_gains[guild] = 0
+                self.changed_currency_gains.add(guild)
+            guild_currency = self.guild_currency.setdefault(guild, {})
+            guild_currency[user] = guild_currency.get(user, 0) + self.currency_gains[guild]
+            self.changed_guild_currency.setdefault(guild, set()).add(user)
+
+    @staticmethod
+    def _off_cooldown(cooldowns: dict, key, per: float, now: float) -> bool:
+        # entries are kept in the order they were set, so expired ones are all at the front
+        while cooldowns and now - next(iter(cooldowns.values())) >= per:
+            del cooldowns[next(iter(cooldowns))]
+        if key in cooldowns:
+            return False
+        cooldowns[key] = now
+        return True
+
+    def _has_humans(self, guild: discord.Guild) -> bool:
+        return self.bot.humans(guild) >= 3
 
     # endregion
 
     # region # Moderation
 
     async def lookup_punishments(self, user: int) -> List[PunishmentModel]:
-        cursor = await self.conn.execute("SELECT * from punishments where user=?", (user,))
-        punishments = await cursor.fetchall()
+        punishments = await self.read("SELECT * from punishments where user=?", (user,))
         return [
             PunishmentModel(
                 *p[:5],
@@ -778,12 +1141,11 @@ class AoiDatabase:
 
     async def add_punishment(self, user: int, guild: int, staff: int, typ: int,
                              reason: str = None):
-        await self.conn.execute("INSERT INTO punishments "
-                                "(user, guild, staff, type, reason, timestamp) values"
-                                "(?,?,?,?,?,?)",
-                                (user, guild, staff, typ, reason, datetime.datetime.now().timestamp())
-                                )
-        await self.conn.commit()
+        await self.write("INSERT INTO punishments "
+                         "(user, guild, staff, type, reason, timestamp) values"
+                         "(?,?,?,?,?,?)",
+                         (user, guild, staff, typ, reason, datetime.datetime.now().timestamp())
+                         )
 
     async def add_user_ban(self, user: int, ctx: aoi.AoiContext, reason: str = None):
         await self.add_punishment(user, ctx.guild.id, ctx.author.id, PunishmentTypeModel.BAN, reason)
@@ -798,45 +1160,42 @@ class AoiDatabase:
         await self.add_punishment(user, ctx.guild.id, ctx.author.id, PunishmentTypeModel.KICK, reason)
 
     async def get_warnp(self, guild: int, warns: int) -> Optional[str]:
-        rows = list(await self.conn.execute_fetchall("select action from warnpunish where guild=? and level=?",
-                                                     (guild, warns)))
+        rows = list(await self.read("select action from warnpunish where guild=? and level=?", (guild, warns)))
         return rows[0][0] if rows else None
 
     async def set_warnp(self, guild: int, warns: int, action: str):
-        await self.conn.execute("delete from warnpunish where guild=? and level=?", (guild, warns))
-        await self.conn.execute("insert into warnpunish (guild, level, action) values (?,?,?)",
-                                (guild, warns, action))
-        await self.conn.commit()
+        async with self.transaction() as conn:
+            await conn.execute("delete from warnpunish where guild=? and level=?", (guild, warns))
+            await conn.execute("insert into warnpunish (guild, level, action) values (?,?,?)",
+                               (guild, warns, action))
 
     async def del_warnp(self, guild: int, warns: int):
-        await self.conn.execute("delete from warnpunish where guild=? and level=?", (guild, warns))
-        await self.conn.commit()
+        await self.write("delete from warnpunish where guild=? and level=?", (guild, warns))
 
     async def get_all_warnp(self, guild: int) -> List[Tuple[int, str]]:
-        rows = list(
-            await self.conn.execute_fetchall("select level, action from warnpunish where guild=? order by level",
-                                             (guild,)))
+        rows = list(await self.read("select level, action from warnpunish where guild=? order by level", (guild,)))
         return list(map(tuple, rows))
 
-    async def add_timed_punishment(self, guild: int, duration: datetime.timedelta, user: int, role: int, mute: bool):
-        await self.conn.execute("insert into punishments (id, guild, end, user, role, ismute) values (?,?,?,?,?)",
-                                (datetime.datetime.now().utcnow(), guild, datetime.datetime.utcnow() + duration,
-                                 user, role, 1 if mute else 0))
-        await self.conn.commit()
-
-    async def removed_timed_punishment(self, _id: int):
-        await self.conn.execute("delete from punishments where id=?", (_id,))
-        await self.conn.commit()
-
-    async def load_backing_punishments(self) -> Dict[int, List[TimedPunishmentModel]]:
-        rows = await self.conn.execute_fetchall("select * from punishments")
-        punishments = {}
-        for r in rows:
-            _id, guild, role, end, ismute, user = *r[0:4], r[4] == 1, r[5]  # noqa
-            if guild not in punishments:
-                punishments[guild] = []
-            punishments[guild].append(TimedPunishmentModel(_id, guild, role, end, ismute, user))
-        return punishments
+    async def add_timed_punishment(self, guild: int, duration: datetime.timedelta, user: int, role: int,
+                                   mute: bool) -> TimedPunishmentModel:
+        """Replaces any running punishment for the same guild, user and role. Bans use role 0"""
+        end = int(time.time() + duration.total_seconds())
+        async with self.transaction() as conn:
+            await conn.execute("delete from current_punishments where guild=? and user=? and role=?",
+                               (guild, user, role))
+            _id = (await conn.execute_insert(
+                "insert into current_punishments (id, guild, role, end, ismute, user) "
+                "values ((select coalesce(max(rowid), 0) + 1 from current_punishments),?,?,?,?,?)",
+                (guild, role, end, 1 if mute else 0, user)))[0]
+        return TimedPunishmentModel(_id, guild, role, end, mute, user)
+
+    async def remove_timed_punishment(self, guild: int, user: int, role: int):
+        await self.write("delete from current_punishments where guild=? and user=? and role=?", (guild, user, role))
+
+    async def load_backing_punishments(self) -> List[TimedPunishmentModel]:
+        rows = await self.conn.execute_fetchall("select id, guild, role, end, ismute, user from current_punishments")
+        return [TimedPunishmentModel(_id, guild, role, end, ismute == 1, user)
+                for _id, guild, role, end, ismute, user in rows]
 
     # endregion
 
@@ -844,20 +1203,19 @@ class AoiDatabase:
 
     async def _auto_messages(self, guild: int) -> Tuple[AoiMessageModel, AoiMessageModel]:
         if guild not in self.messages:
-            async with self.messages_lock:
+            async with self.messages_lock, self.transaction() as conn:
                 try:
-                    await self.conn.execute("INSERT INTO messages values (?,?,?,?,?,?,?)",
-                                            (guild,
-                                             "&user_name; has joined the server",
-                                             0,
-                                             0,
-                                             "&user_name; has left the server",
-                                             0,
-                                             0
-                                             ))
+                    await conn.execute("INSERT INTO messages values (?,?,?,?,?,?,?)",
+                                       (guild,
+                                        "&user_name; has joined the server",
+                                        0,
+                                        0,
+                                        "&user_name; has left the server",
+                                        0,
+                                        0
+                                        ))
                 except sqlite3.IntegrityError:
                     pass
-                await self.conn.commit()
                 self.messages[guild] = (
                     AoiMessageModel("&user_name; has joined the server", 0, 0),
                     AoiMessageModel("&user_name; has left the server", 0, 0)
@@ -881,8 +1239,7 @@ class AoiDatabase:
                 self.messages[guild][0].channel = channel.id
             if delete is not None:
                 self.messages[guild][0].delete = delete
-            if guild not in self.changed_messages:
-                self.changed_messages.append(guild)
+            self.changed_messages.add(guild)
 
     async def set_goodbye_message(self, guild: int, *,
                                   message: str = None,
@@ -895,108 +1252,106 @@ class AoiDatabase:
                 self.messages[guild][1].channel = channel.id
             if delete is not None:
                 self.messages[guild][1].delete = delete
-            if guild not in self.changed_messages:
-                self.changed_messages.append(guild)
+            self.changed_messages.add(guild)
 
     async def guild_setting(self, guild: int) -> GuildSettingModel:
         if guild not in self.guild_settings:
-            try:
-                await self.conn.execute("INSERT INTO guild_settings (Guild) values (?)", (guild,))
-            except sqlite3.IntegrityError:
-                self.bot.logger.warning(f"Passing IntegrityError for guild {guild}")
-            await self.conn.commit()
+            async with self.transaction() as conn:
+                try:
+                    await conn.execute("INSERT INTO guild_settings (Guild) values (?)", (guild,))
+                except sqlite3.IntegrityError:
+                    self.bot.logger.warning(f"Passing IntegrityError for guild {guild}")
             self.guild_settings[guild] = GuildSettingModel()
             self.prefixes[guild] = ","
         return self.guild_settings[guild]
 
     async def set_currency_gen(self, guild: int, **kwargs):
         await self.guild_setting(guild)
-        if "min_amt" in kwargs:
-            self.guild_settings[guild].currency_min = kwargs["min_amt"]
-            await self.conn.execute("UPDATE guild_settings SET currency_min=? WHERE guild=?",
-                                    (kwargs["min_amt"], guild))
-        if "max_amt" in kwargs:
-            self.guild_settings[guild].currency_max = kwargs["min_amt"]
-            await self.conn.execute("UPDATE guild_settings SET currency_max=? WHERE guild=?",
-                                    (kwargs["max_amt"], guild))
-        if "chance" in kwargs:
-            self.guild_settings[guild].currency_chance = kwargs["chance"]
-            await self.conn.execute("UPDATE guild_settings SET currency_chance=? WHERE guild=?",
-                                    (kwargs["chance"], guild))
-        await self.conn.commit()
+        async with self.transaction() as conn:
+            if "min_amt" in kwargs:
+                self.guild_settings[guild].currency_min = kwargs["min_amt"]
+                await conn.execute("UPDATE guild_settings SET currency_min=? WHERE guild=?",
+                                   (kwargs["min_amt"], guild))
+            if "max_amt" in kwargs:
+                self.guild_settings[guild].currency_max = kwargs["min_amt"]
+                await conn.execute("UPDATE guild_settings SET currency_max=? WHERE guild=?",
+                                   (kwargs["max_amt"], guild))
+            if "chance" in kwargs:
+                self.guild_settings[guild].currency_chance = kwargs["chance"]
+                await conn.execute("UPDATE guild_settings SET currency_chance=? WHERE guild=?",
+                                   (kwargs["chance"], guild))
 
     async def add_currency_channel(self, channel: discord.TextChannel):
         await self.guild_setting(channel.guild.id)
         if channel.id not in self.guild_settings[channel.guild.id].currency_gen_channels:
             self.guild_settings[channel.guild.id].currency_gen_channels.append(channel.id)
-        await self.conn.execute(f"UPDATE guild_settings SET currency_gen_channels=? WHERE Guild=?",
-                                (",".join(map(str, self.guild_settings[channel.guild.id].currency_gen_channels)),
-                                 channel.guild.id))
-        await self.conn.commit()
+        await self.write(f"UPDATE guild_settings SET currency_gen_channels=? WHERE Guild=?",
+                         (",".join(map(str, self.guild_settings[channel.guild.id].currency_gen_channels)),
+                          channel.guild.id))
 
     async def remove_currency_channel(self, channel: discord.TextChannel):
         await self.guild_setting(channel.guild.id)
         if channel.id in self.guild_settings[channel.guild.id].currency_gen_channels:
             self.guild_settings[channel.guild.id].currency_gen_channels.remove(channel.id)
-        await self.conn.execute(f"UPDATE guild_settings SET currency_gen_channels=? WHERE Guild=?",
-                                (",".join(map(str, self.guild_settings[channel.guild.id].currency_gen_channels)),
-                                 channel.guild.id))
-        await self.conn.commit()
+        await self.write(f"UPDATE guild_settings SET currency_gen_channels=? WHERE Guild=?",
+                         (",".join(map(str, self.guild_settings[channel.guild.id].currency_gen_channels)),
+                          channel.guild.id))
 
     async def set_ok_color(self, guild: int, value: str):
-        await self.conn.execute(f"UPDATE guild_settings SET OkColor=? WHERE Guild=?", (value, guild))
-        await self.conn.commit()
+        await self.write(f"UPDATE guild_settings SET OkColor=? WHERE Guild=?", (value, guild))
         self.guild_settings[guild].ok_color = int(value, 16)
 
     async def set_error_color(self, guild: int, value: str):
-        await self.conn.execute(f"UPDATE guild_settings SET ErrorColor=? WHERE Guild=?", (value, guild))
-        await self.conn.commit()
+        await self.write(f"UPDATE guild_settings SET ErrorColor=? WHERE Guild=?", (value, guild))
         self.guild_settings[guild].error_color = int(value, 16)
 
     async def set_info_color(self, guild: int, value: str):
-        await self.conn.execute(f"UPDATE guild_settings SET InfoColor=? WHERE Guild=?", (value, guild))
-        await self.conn.commit()
+        await self.write(f"UPDATE guild_settings SET InfoColor=? WHERE Guild=?", (value, guild))
         self.guild_settings[guild].info_color = int(value, 16)
 
     async def set_reply_embeds(self, guild: int, value: bool):
-        await self.conn.execute("UPDATE guild_settings SET reply_embeds=? WHERE Guild=?", (1 if value else 0, guild))
-        await self.conn.commit()
+        await self.write("UPDATE guild_settings SET reply_embeds=? WHERE Guild=?", (1 if value else 0, guild))
         self.guild_settings[guild].reply_embeds = value
 
     async def set_prefix(self, guild: int, prefix: str):
-        await self.conn.execute(f"UPDATE guild_settings SET Prefix=? WHERE Guild=?", (prefix, guild))
-        await self.conn.commit()
+        await self.write(f"UPDATE guild_settings SET Prefix=? WHERE Guild=?", (prefix, guild))
         self.prefixes[guild] = prefix
 
     async def get_permissions(self, guild: int):
         if guild not in self.perm_chains:
-            await self.conn.execute("INSERT INTO permissions (guild) values (?)", (guild,))
-            await self.conn.commit()
+            await self.write("INSERT INTO permissions (guild) values (?)", (guild,))
             self.perm_chains[guild] = ["asm enable"]
         return [s for s in self.perm_chains[guild]]
 
+    async def get_permission_program(self, guild: int) -> PermissionProgram:
+        if guild not in self.perm_programs:
+            await self.get_permissions(guild)
+            self.perm_programs[guild] = PermissionProgram(self.perm_chains[guild])
+        return self.perm_programs[guild]
+
     async def set_permissions(self, guild: int, perms: List[str]):
         self.perm_chains[guild] = [s for s in perms]
-        await self.conn.execute("UPDATE permissions SET permissions=? WHERE guild=?",
-                                (";".join(perms), guild))
+        self.perm_programs.pop(guild, None)
+        await self.write("UPDATE permissions SET permissions=? WHERE guild=?",
+                         (";".join(perms), guild))
 
     async def add_permission(self, guild: int, perm: str):
         self.bot.logger.info(f"db:adding permission {guild}:{perm}")
         self.perm_chains[guild].append(perm)
-        await self.conn.execute("UPDATE permissions SET permissions=? WHERE guild=?",
-                                (";".join(self.perm_chains[guild]), guild))
-        await self.conn.commit()
+        self.perm_programs.pop(guild, None)
+        await self.write("UPDATE permissions SET permissions=? WHERE guild=?",
+                         (";".join(self.perm_chains[guild]), guild))
 
     async def remove_permission(self, guild: int, perm: int):
         del self.perm_chains[guild][perm]
-        await self.conn.execute("UPDATE permissions SET permissions=? WHERE guild=?",
-                                (";".join(self.perm_chains[guild]), guild))
-        await self.conn.commit()
+        self.perm_programs.pop(guild, None)
+        await self.write("UPDATE permissions SET permissions=? WHERE guild=?",
+                         (";".join(self.perm_chains[guild]), guild))
 
     async def clear_permissions(self, guild: int):
         self.perm_chains[guild] = ["asm enable"]
-        await self.conn.execute("UPDATE permissions SET permissions=? WHERE guild=?",
-                                (";".join(self.perm_chains[guild]), guild))
-        await self.conn.commit()
+        self.perm_programs.pop(guild, None)
+        await self.write("UPDATE permissions SET permissions=? WHERE guild=?",
+                         (";".join(self.perm_chains[guild]), guild))
 
     # endregion
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime
+from typing import List, Tuple
 
 
 @dataclass(frozen=True)
@@ -45,3 +46,22 @@ class AoiMessageModel:
     message: str
     channel: int
     delete: int
+
+
+class UserGlobalModel:
+    __slots__ = ("title", "background", "badges", "owned_badges", "owned_titles")
+
+    def __init__(self, title: str = "", background: str = ""):
+        self.title = title
+        self.background = background
+        # badges can't be changed from the bot, so they share the empty tuple until loaded
+        self.badges: Tuple[str, ...] = ()
+        self.owned_badges: Tuple[str, ...] = ()
+        self.owned_titles: List[str] = []
+
+    def add_title(self, title: str):
+        self.owned_titles.append(title)
+
+    def owns_title(self, title: str) -> bool:
+        title = title.lower()
+        return any(owned.lower() == title for owned in self.owned_titles)
@@ -13,6 +13,10 @@ class Blacklisted(commands.CommandError):
     pass
 
 
+class RenderQueueFull(commands.CommandError):
+    pass
+
+
 class MathError(BaseException):
     pass
 
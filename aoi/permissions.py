@@ -0,0 +1,75 @@
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# rule prefix -> (scope, what it applies to)
+# scope: s - server, c - channel, x - category, r - role, u - user
+# applies to: a - all commands, m - a module, c - a single command
+_RULES = {
+    "asm": ("s", "a"), "acm": ("c", "a"), "axm": ("x", "a"), "arm": ("r", "a"), "aum": ("u", "a"),
+    "sm": ("s", "m"), "cm": ("c", "m"), "xm": ("x", "m"), "rm": ("r", "m"), "um": ("u", "m"),
+    "sc": ("s", "c"), "cc": ("c", "c"), "xc": ("x", "c"), "rc": ("r", "c"), "uc": ("u", "c"),
+}
+
+# (index in the chain, enabled, applies to, module/command name)
+_Rule = Tuple[int, bool, str, Optional[str]]
+
+
+class PermissionProgram:
+    """
+    A guild's permission chain parsed once into per-scope lookup tables. The last
+    rule in the chain that matches decides whether a command can be used.
+    """
+
+    _MAX_CACHED = 4096
+
+    def __init__(self, chain: List[str]):
+        self.chain = list(chain)
+        self._server: List[_Rule] = []
+        self._scoped: Dict[str, Dict[int, List[_Rule]]] = {"c": {}, "x": {}, "r": {}, "u": {}}
+        self._cache: Dict[Tuple, Optional[int]] = {}
+        for n, rule in enumerate(chain):
+            tok = rule.split()
+            if not tok or tok[0] not in _RULES:
+                continue
+            scope, applies = _RULES[tok[0]]
+            try:
+                if scope == "s":
+                    self._server.append((n, tok[1] == "enable", applies, tok[2].lower() if applies != "a" else None))
+                else:
+                    self._scoped[scope].setdefault(int(tok[1]), []).append(
+                        (n, tok[2] == "enable", applies, tok[3].lower() if applies != "a" else None))
+            except (IndexError, ValueError):
+                continue
+
+    def check(self, command: str, cog: str, channel: int, category: int,
+              roles: List[int], user: int) -> Optional[int]:
+        """
+        Returns the index of the rule disallowing the command, or None if it can be used
+        """
+        role_rules = self._scoped["r"]
+        # only roles and users with rules of their own change the outcome, which keeps the cache small
+        key = (command, cog, channel, category,
+               frozenset(r for r in roles if r in role_rules), user if user in self._scoped["u"] else 0)
+        if key in self._cache:
+            return self._cache[key]
+        denied = self._evaluate(command, cog, channel, category, key[4], user)
+        if len(self._cache) >= self._MAX_CACHED:
+            self._cache.clear()
+        self._cache[key] = denied
+        return denied
+
+    def _evaluate(self, command: str, cog: str, channel: int, category: int,
+                  roles: FrozenSet[int], user: int) -> Optional[int]:
+        candidates = [self._server,
+                      self._scoped["c"].get(channel, []),
+                      self._scoped["x"].get(category, []),
+                      self._scoped["u"].get(user, [])] + [self._scoped["r"][r] for r in roles]
+        last: Optional[_Rule] = None
+        for rules in candidates:
+            for rule in rules:
+                if last is not None and rule[0] < last[0]:
+                    continue
+                if rule[2] == "a" or (rule[2] == "m" and rule[3] == cog) or (rule[2] == "c" and rule[3] == command):
+                    last = rule
+        if last is None or last[1]:
+            return None
+        return last[0]
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import hashlib
+import multiprocessing
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple, TYPE_CHECKING
+
+from .errors import RenderQueueFull
+
+if TYPE_CHECKING:
+    import aoi
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    # forking the bot would copy its event loop, sockets and aiohttp sessions into every worker, so workers
+    # come from a forkserver that has only imported the drawing code, or are spawned where there's none
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["libs.images"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class Renderer:
+    """
+    Runs PIL work (see libs.images) in a process pool so that card renders don't block the
+    event loop. At most `queue_size` jobs can be waiting or running at once, and each guild can
+    only have `per_guild` of those running at the same time.
+    """
+
+    def __init__(self, bot: aoi.AoiBot, workers: int, queue_size: int, per_guild: int, card_cache_size: int):
+        self.bot = bot
+        self.queue_size = queue_size
+        self.per_guild = per_guild
+        self.workers = workers
+        self._pool = self._new_pool()
+        # only guilds with jobs waiting or running have a semaphore
+        self._guild_slots: Dict[int, asyncio.Semaphore] = {}
+        self._guild_jobs: Dict[int, int] = {}
+        self.pending = 0
+        # job name -> [count, total ms, max ms, total ms spent waiting]
+        self.timings: Dict[str, list] = {}
+        self.rejected = 0
+        # (job name, guild, user, digest of the job's arguments) -> result
+        self.card_cache_size = card_cache_size
+        self._cards: OrderedDict[Tuple[str, int, int, bytes], Any] = OrderedDict()
+        self._user_cards: Dict[int, Set[Tuple[str, int, int, bytes]]] = {}
+        self.card_hits = 0
+        # bumped on reset, so a card that started rendering with the old assets isn't cached
+        self._generation = 0
+
+    async def render(self, guild: Optional[int], func: Callable[..., Any], *args) -> Any:
+        if self.pending >= self.queue_size:
+            self.rejected += 1
+            raise RenderQueueFull("Too many images are being generated right now, try again in a bit")
+        if guild not in self._guild_slots:
+            self._guild_slots[guild] = asyncio.Semaphore(self.per_guild)
+            self._guild_jobs[guild] = 0
+        self._guild_jobs[guild] += 1
+        self.pending += 1
+        queued = time.perf_counter()
+        try:
+            async with self._guild_slots[guild]:
+                started = time.perf_counter()
+                result = await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+                done = time.perf_counter()
+        finally:
+            self.pending -= 1
+            self._guild_jobs[guild] -= 1
+            if not self._guild_jobs[guild]:
+                # nothing else holds or waits on it
+                del self._guild_jobs[guild]
+                del self._guild_slots[guild]
+        self._record(func.__name__, (done - started) * 1000, (started - queued) * 1000)
+        return result
+
+    async def render_card(self, guild: int, user: int, func: Callable[..., Any], *args) -> Any:
+        """
+        Like render, but returns the earlier result if everything the card draws is the same.
+        A user's cards are dropped when their xp, currency or titles change.
+        """
+        key = (func.__name__, guild, user, hashlib.sha1(pickle.dumps(args)).digest())
+        if key in self._cards:
+            self._cards.move_to_end(key)
+            self.card_hits += 1
+            return self._cards[key]
+        generation = self._generation
+        result = await self.render(guild, func, *args)
+        if generation != self._generation:
+            return result
+        self._cards[key] = result
+        self._user_cards.setdefault(user, set()).add(key)
+        while len(self._cards) > self.card_cache_size:
+            old, _ = self._cards.popitem(last=False)
+            self._user_cards[old[2]].discard(old)
+            if not self._user_cards[old[2]]:
+                del self._user_cards[old[2]]
+        return result
+
+    def invalidate(self, user: int):
+        for key in self._user_cards.pop(user, ()):
+            self._cards.pop(key, None)
+
+    def _record(self, name: str, ms: float, waited: float):
+        if name not in self.timings:
+            self.timings[name] = [0, 0.0, 0.0, 0.0]
+        timing = self.timings[name]
+        timing[0] += 1
+        timing[1] += ms
+        timing[2] = max(timing[2], ms)
+        timing[3] += waited
+        self.bot.logger.log(self.bot.TRACE, f"render:{name} took {ms:.2f}ms after waiting {waited:.2f}ms")
+
+    def reset(self):
+        # workers cache templates and fonts, so swapping the pool makes them reread assets
+        old, self._pool = self._pool, self._new_pool()
+        old.shutdown(wait=False)
+        # cached cards were drawn with the old templates and fonts
+        self._cards.clear()
+        self._user_cards.clear()
+        self._generation += 1
+
+    def _new_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers or None, mp_context=_pool_context())
+
+    def close(self):
+        self._pool.shutdown(wait=False)
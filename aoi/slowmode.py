@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class SlowmodeTracker:
+    """
+    Last message times for channels with a slowmode Aoi enforces itself (longer than discord's 6 hours).
+    Each channel keeps user -> timestamp oldest first, so entries older than the slowmode are dropped
+    from the front. Nothing here touches the database, changed channels are written on the cache flush.
+    """
+
+    def __init__(self):
+        self.durations: Dict[int, int] = {}
+        self._last: Dict[int, OrderedDict[int, float]] = {}
+        self._changed: Set[int] = set()
+
+    def __contains__(self, channel: int) -> bool:
+        return channel in self.durations
+
+    def __len__(self) -> int:
+        return sum(len(last) for last in self._last.values())
+
+    def load(self, durations: Iterable[Tuple[int, int]], last_messages: Iterable[Tuple[int, int, float]]):
+        for channel, seconds in durations:
+            self.set(channel, seconds)
+        # rows come sorted by timestamp, so later duplicates win and order is kept
+        for channel, user, timestamp in last_messages:
+            if channel in self._last:
+                self._last[channel].pop(user, None)
+                self._last[channel][user] = timestamp
+
+    def set(self, channel: int, seconds: int):
+        self.durations[channel] = seconds
+        self._last.setdefault(channel, OrderedDict())
+
+    def clear(self, channel: int):
+        self.durations.pop(channel, None)
+        self._last.pop(channel, None)
+        self._changed.add(channel)
+
+    def allow(self, channel: int, user: int, timestamp: float) -> bool:
+        """Records the message and returns True if the user is allowed to send it"""
+        last = self._last[channel]
+        before = timestamp - self.durations[channel]
+        self._expire(last, before)
+        previous = last.get(user)
+        if previous is not None and previous > before:
+            return False
+        last.pop(user, None)
+        last[user] = timestamp
+        self._changed.add(channel)
+        return True
+
+    def expire(self, now: float):
+        for channel, last in self._last.items():
+            if self._expire(last, now - self.durations[channel]):
+                self._changed.add(channel)
+
+    @staticmethod
+    def _expire(last: OrderedDict[int, float], before: float) -> bool:
+        expired = False
+        while last and next(iter(last.values())) <= before:
+            last.popitem(last=False)
+            expired = True
+        return expired
+
+    def take_changes(self) -> Tuple[Set[int], List[Tuple[int, int, float]]]:
+        changed, self._changed = self._changed, set()
+        return changed, [(channel, user, timestamp) for channel in changed
+                         for user, timestamp in self._last.get(channel, {}).items()]
+
+    def restore_changes(self, changed: Set[int]):
+        self._changed |= changed
@@ -1,16 +1,19 @@
 import asyncio
 from datetime import datetime
-from typing import Callable
+from typing import Callable, Optional
 
 import discord
 from discord.ext import commands
+from .bulk import BulkOperation
 
 
 class AoiTask:
-    def __init__(self, task: asyncio.Task, ctx: commands.Context, status: Callable[[], str]):
+    def __init__(self, task: asyncio.Task, ctx: commands.Context, status: Callable[[], str],
+                 operation: Optional[BulkOperation] = None):
         self.task = task
         self.ctx = ctx
         self._status = status
+        self.operation = operation
         self.time = datetime.now()
         self.ctx.bot.logger.info(f"Creating task for {ctx.author.id} {ctx.message.content}")
 
@@ -9,3 +9,10 @@ class Trigger:
 
     async def run(self, member: discord.Member):
         await self.coro(member)
+
+
+class RoleTrigger(Trigger):
+    def __init__(self, coro: Callable[[discord.Member], Awaitable[None]], channel: int, message: str):
+        super().__init__(coro)
+        self.channel = channel
+        self.message = message
@@ -0,0 +1,69 @@
+"""
+Chat xp and currency through AoiDatabase.add_chat_messages, one message per call against the
+batches of up to 500 the chat worker hands it. Messages are synthetic, spread over 50 guilds,
+and only the in-memory db layer is exercised.
+
+    python -m benchmarks.chat_xp [messages] [users]
+"""
+import asyncio
+import logging
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from aoi.database import AoiDatabase
+
+GUILDS = 50
+
+
+class Config:
+    def get(self, key):
+        return {"database.lazy_load": False}.get(key, 0)
+
+
+class Bot:
+    logger = logging.getLogger("benchmarks.chat_xp")
+    config = Config()
+    renderer = None
+
+    @staticmethod
+    def humans(_) -> int:
+        return 5
+
+
+def messages(count: int, users: int):
+    guilds = [SimpleNamespace(id=guild) for guild in range(GUILDS)]
+    for _ in range(count):
+        guild = random.choice(guilds)
+        author = SimpleNamespace(id=random.randrange(users), bot=False, guild=guild)
+        yield SimpleNamespace(guild=guild, author=author, channel=SimpleNamespace(id=guild.id),
+                              content="hello there")
+
+
+async def run(count: int, users: int):
+    batch = list(messages(count, users))
+
+    db = AoiDatabase(Bot())
+    start = time.perf_counter()
+    for message in batch:
+        await db.add_chat_messages([message])
+    single = count / (time.perf_counter() - start)
+
+    db = AoiDatabase(Bot())
+    start = time.perf_counter()
+    for i in range(0, count, 500):
+        await db.add_chat_messages(batch[i:i + 500])
+    batched = count / (time.perf_counter() - start)
+
+    print(f"{count:,} messages from {users:,} users over {GUILDS} guilds")
+    print(f"  one message per call     {single:,.0f} msg/s")
+    print(f"  batches of 500           {batched:,.0f} msg/s")
+
+
+def main(count: int = 50_000, users: int = 20_000):
+    asyncio.run(run(count, users))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
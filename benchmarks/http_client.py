@@ -0,0 +1,55 @@
+"""
+Requests through the pooled libs.http_client.HttpClient against opening an aiohttp session per
+request, which is what the api cogs used to do. Runs against a local stub server.
+
+    python -m benchmarks.http_client [requests]
+"""
+import asyncio
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+from libs.http_client import HttpClient
+
+
+async def ok(_):
+    return web.json_response({"ok": True})
+
+
+async def run(requests: int):
+    app = web.Application()
+    app.add_routes([web.get("/ok", ok)])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/ok"  # noqa
+
+    client = HttpClient()
+    start = time.perf_counter()
+    for _ in range(requests):
+        (await client.get(url)).json()
+    pooled = (time.perf_counter() - start) / requests
+    await client.close()
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as resp:
+                await resp.json()
+    fresh = (time.perf_counter() - start) / requests
+
+    await runner.cleanup()
+    print(f"{requests} sequential GETs")
+    print(f"  HttpClient (pooled)      {pooled * 1000:.2f} ms/request")
+    print(f"  session per request      {fresh * 1000:.2f} ms/request")
+
+
+def main(requests: int = 500):
+    asyncio.run(run(requests))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
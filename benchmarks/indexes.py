@@ -0,0 +1,93 @@
+"""
+Lookups and the last_messages flush on a synthetic database, before and after migration 6 adds
+the indexes they filter on. Builds a throwaway sqlite file with `rows` rows in each table.
+
+    python -m benchmarks.indexes [rows]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from aoi.database import MIGRATIONS, SQL_STRING
+
+
+def build(conn: sqlite3.Connection, rows: int, rand: random.Random):
+    for statement in SQL_STRING.split(";;"):
+        conn.execute(statement)
+    # databases created before migration 6 still have this index
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quotes on quotes (id)")
+    for version in range(1, 6):
+        for statement in MIGRATIONS[version].split(";;"):
+            if statement.strip():
+                conn.execute(statement)
+    conn.executemany("INSERT INTO punishments values (?,?,?,?,?,?,0,0)",
+                     ((rand.randrange(200000), rand.randrange(2000), 1, 0, "x", i) for i in range(rows)))
+    conn.executemany("INSERT INTO last_messages values (?,?,?)",
+                     ((rand.randrange(5000), rand.randrange(200000), i) for i in range(rows)))
+    conn.executemany("INSERT INTO quotes (user, guild, name, content) values (?,?,?,?)",
+                     ((rand.randrange(200000), rand.randrange(2000), f"q{rand.randrange(500)}", "hello " * 10)
+                      for _ in range(rows)))
+    conn.executemany("INSERT INTO rero values (?,?,?,?,?,0,0)",
+                     ((rand.randrange(2000), 1, rand.randrange(300000), "e", 1) for _ in range(rows)))
+    conn.executemany("INSERT INTO selfrole values (?,?)", ((rand.randrange(20000), i) for i in range(rows)))
+    conn.commit()
+
+
+def timed(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def bench(conn: sqlite3.Connection, rand: random.Random):
+    def query(sql, *params):
+        return lambda: conn.execute(sql, tuple(p() if callable(p) else p for p in params)).fetchall()
+
+    def flush():
+        channels = [rand.randrange(5000) for _ in range(20)]
+        conn.executemany("DELETE FROM last_messages WHERE channel=?", ((channel,) for channel in channels))
+        conn.executemany("INSERT INTO last_messages values (?,?,?)",
+                         ((channel, user, 0) for channel in channels for user in range(50)))
+        conn.commit()
+
+    return {
+        "punishments by user": timed(query("SELECT * FROM punishments WHERE user=?",
+                                           lambda: rand.randrange(200000)), 20),
+        "punishments by guild": timed(query("SELECT count(*) FROM punishments WHERE guild=?",
+                                            lambda: rand.randrange(2000)), 20),
+        "quote by guild+name": timed(query("SELECT id, content, user FROM quotes WHERE guild=? and name=?",
+                                           lambda: rand.randrange(2000), "q5"), 20),
+        "rero by message": timed(query("SELECT * FROM rero WHERE message=?",
+                                       lambda: rand.randrange(300000)), 20),
+        "selfrole by guild": timed(query("SELECT role FROM selfrole WHERE guild=?",
+                                         lambda: rand.randrange(20000)), 20),
+        "last_messages flush (20 channels)": timed(flush, 5),
+    }
+
+
+def main(rows: int = 1_000_000):
+    rand = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        conn = sqlite3.connect(os.path.join(directory, "indexes.db"))
+        build(conn, rows, rand)
+        before = bench(conn, rand)
+        start = time.perf_counter()
+        for statement in MIGRATIONS[6].split(";;"):
+            if statement.strip():
+                conn.execute(statement)
+        conn.commit()
+        migration = time.perf_counter() - start
+        after = bench(conn, rand)
+        conn.close()
+
+    print(f"{rows:,} rows per table, migration 6 took {migration:.1f}s")
+    for name, ms in before.items():
+        print(f"  {name:36} {ms:9.2f}ms -> {after[name]:7.3f}ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,57 @@
+"""
+Ranks from libs.rank_index.RankIndex against sorting the whole xp dict, which is what profile, xp
+and xplb used to do on every call.
+
+    python -m benchmarks.rank_index [users]
+"""
+import random
+import sys
+import time
+
+from libs.rank_index import RankIndex
+
+
+def sorted_rank(values, key) -> int:
+    for rank, (user, _) in enumerate(sorted(values.items(), key=lambda x: x[1], reverse=True), 1):
+        if user == key:
+            return rank
+
+
+def main(users: int = 1_000_000):
+    values = {user: random.randint(0, 10 ** 7) for user in range(users)}
+    start = time.perf_counter()
+    index = RankIndex(values)
+    build = time.perf_counter() - start
+
+    keys = random.sample(range(users), 20)
+    start = time.perf_counter()
+    for key in keys:
+        sorted_rank(values, key)
+    sort = (time.perf_counter() - start) / len(keys)
+
+    start = time.perf_counter()
+    for key in keys * 500:
+        index.rank(key)
+    rank = (time.perf_counter() - start) / (len(keys) * 500)
+
+    start = time.perf_counter()
+    for key in keys * 500:
+        values[key] += 3
+        index.update(key, values[key])
+    update = (time.perf_counter() - start) / (len(keys) * 500)
+
+    start = time.perf_counter()
+    for page in range(10000):
+        index.page(page * 10, 10)
+    page = (time.perf_counter() - start) / 10000
+
+    print(f"{users:,} users")
+    print(f"  full sort + scan per lookup  {sort * 1000:.0f} ms")
+    print(f"  RankIndex.rank               {rank * 1e6:.1f} us")
+    print(f"  RankIndex.update             {update * 1e6:.1f} us")
+    print(f"  RankIndex.page (10 rows)     {page * 1e6:.1f} us")
+    print(f"  one-off build                {build:.1f} s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
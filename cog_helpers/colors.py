@@ -1,7 +1,4 @@
 import colorsys
-import io
-
-from PIL import ImageDraw, Image
 
 from discord.ext import commands
 from libs.converters import AoiColor
@@ -12,26 +9,10 @@ class ColorService:
     def __init__(self):
         self.MAX = 60
 
-    def _gradient_buf(self, color1: AoiColor, color2: AoiColor, num: int, hls: bool):
+    def _gradient_colors(self, color1: AoiColor, color2: AoiColor, num: int, hls: bool):
         if num < 3 or num > self.MAX:
             raise commands.BadArgument(f"Number of colors must be between 2 and {self.MAX}")
-        colors = self.hls_gradient(color1, color2, num) if hls else self.rgb_gradient(color1, color2, num)
-        img = Image.new("RGB", (240, 48))
-        img_draw = ImageDraw.Draw(img)
-        for n, clr in enumerate(colors):
-            img_draw.rectangle([
-                (n * 240 / num, 0),
-                ((n + 1) * 240 / num, 48)
-            ], fill=tuple(map(int, clr)))
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        return buf, colors
-
-    def _color_buf(self, color: AoiColor):
-        img = Image.new("RGB", (120, 120), color.to_rgb())
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        return buf
+        return self.hls_gradient(color1, color2, num) if hls else self.rgb_gradient(color1, color2, num)
 
     def rgb_gradient(self, color1: AoiColor, color2: AoiColor, num: int):
         rgb, rgb2 = color1.to_rgb(), color2.to_rgb()
@@ -15,7 +15,6 @@ class CurrencyService:
 
     async def maybe_gen_currency(self, msg: discord.Message):
         gs = await self.bot.db.guild_setting(msg.guild.id)
-        prefix = escape((await self.bot.get_prefix(msg))[-1], msg)
         if gs.currency_chance == 0:
             return
         if not gs.currency_gen_channels:
@@ -26,6 +25,7 @@ class CurrencyService:
             return
 
         amount = random.randint(gs.currency_min, gs.currency_max + 1)
+        prefix = escape((await self.bot.get_prefix(msg))[-1], msg)
 
         with open("assets/currency_mokke.png", "rb") as fp:
             file = discord.File(fp, filename="mokke.png")
@@ -3,7 +3,6 @@ import subprocess
 from datetime import datetime
 from typing import List, Dict
 
-import aiohttp
 import aiosqlite
 import psutil
 import redis
@@ -28,6 +27,8 @@ class Bot(commands.Cog):
         self.ping: int = 0
         self.ping_run: List[int] = []
         self.avg_ping: int = 0
+        self.message_run: List[int] = []
+        self.message_rate: float = 0
         self.shard_times: Dict[int, datetime] = {}
         self.shard_statuses: Dict[int, bool] = {}
         self.shard_server_counts: Dict[int, int] = {}
@@ -57,6 +58,12 @@ class Bot(commands.Cog):
         if len(self.ping_run) > 30 * 60:
             del self.ping_run[0]
         self.avg_ping = round(sum(self.ping_run) / len(self.ping_run))
+        # message counts sampled every 2 seconds over the last minute
+        self.message_run.append(self.bot.messages)
+        if len(self.message_run) > 30:
+            del self.message_run[0]
+        if len(self.message_run) > 1:
+            self.message_rate = (self.message_run[-1] - self.message_run[0]) / (2 * (len(self.message_run) - 1))
 
     @resource_loop.before_loop
     async def _before_mem_loop(self):
@@ -99,7 +106,8 @@ class Bot(commands.Cog):
                         fields=[
                             ("Ping", f"{self.ping} ms\n"
                                      f"{self.avg_ping} ms (1h average)"),
-                            ("Messages", f"{self.bot.messages}"),
+                            ("Messages", f"{self.bot.messages}\n"
+                                         f"{self.message_rate:.1f}/s (1m average)"),
                             ("Commands\nExecuted", f"{self.bot.commands_executed}"),
                             ("Uptime", dhm_notation(datetime.now() - self.bot.start_time)),
                             ("Shard", f"{self.bot.shard_id or 0}/{self.bot.shard_count}"),
@@ -108,7 +116,8 @@ class Bot(commands.Cog):
                             ("Presence", f"{len(self.bot.guilds)} Guilds\n"
                                          f"{text_channels} Text Channels\n"
                                          f"{voice_channels} Voice Channels\n"
-                                         f"{len(self.bot.users)} Users Cached"),
+                                         f"{len(self.bot.users)} Users Cached\n"
+                                         f"{sum(self.bot.human_counts.values())} Humans"),
                         ],
                         thumbnail=self.bot.user.avatar.url)
 
@@ -140,7 +149,46 @@ class Bot(commands.Cog):
     )
     async def flush(self, ctx: aoi.AoiContext):
         await self.bot.db.cache_flush()
-        await ctx.send_ok("Cache flushed to disk")
+        await ctx.send_ok("Cache flushed to disk\n" +
+                          "\n".join(f"`{table}`: {rows} rows in {ms:.2f}ms"
+                                    for table, (rows, ms) in self.bot.db.flush_latency.items()))
+
+    @commands.is_owner()
+    @commands.command(
+        brief="Shows image render timings"
+    )
+    async def renderstats(self, ctx: aoi.AoiContext):
+        renderer = self.bot.renderer
+        await ctx.send_info(f"{renderer.pending}/{renderer.queue_size} queued, {renderer.rejected} rejected, "
+                            f"{renderer.card_hits} cached cards served\n" +
+                            "\n".join(f"`{name}`: {count} renders, avg {total / count:.2f}ms, "
+                                      f"max {worst:.2f}ms, avg wait {waited / count:.2f}ms"
+                                      for name, (count, total, worst, waited) in renderer.timings.items()))
+
+    @commands.is_owner()
+    @commands.command(
+        brief="Shows waiting database writes and read latency"
+    )
+    async def dbstats(self, ctx: aoi.AoiContext):
+        db = self.bot.db
+        await ctx.send_info(f"{db.write_waiting} writes waiting, {db.read_waiting} reads waiting for one of "
+                            f"{db.reader_count} read connections\n" +
+                            "\n".join(f"`{' '.join(sql.split())[:60]}`: {count} reads, avg {total / count:.2f}ms, "
+                                      f"max {worst:.2f}ms, avg wait {waited / count:.2f}ms"
+                                      for sql, (count, total, worst, waited) in
+                                      sorted(db.read_latency.items(), key=lambda x: -x[1][1])[:15]))
+
+    @commands.is_owner()
+    @commands.command(
+        brief="Shows outgoing HTTP request stats per host"
+    )
+    async def httpstats(self, ctx: aoi.AoiContext):
+        if not self.bot.web.stats:
+            return await ctx.send_info("No requests made yet")
+        await ctx.send_info("\n".join(f"`{host}`: {stats.requests} requests, {stats.errors} errors, "
+                                      f"{stats.retries} retries, avg {stats.avg_ms:.2f}ms, max {stats.max_ms:.2f}ms"
+                                      for host, stats in sorted(self.bot.web.stats.items(),
+                                                                key=lambda x: -x[1].requests)))
 
     @commands.is_owner()
     @commands.command(
@@ -213,9 +261,7 @@ class Bot(commands.Cog):
     @commands.command(brief="Sets #BOT#'s avatar", aliases=["setav"])
     async def setavatar(self, ctx: aoi.AoiContext, *, url: str):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url=url) as resp:
-                    await self.bot.user.edit(avatar=await resp.read())
+            await self.bot.user.edit(avatar=(await self.bot.web.get(url)).body)
             await ctx.send_ok("Avatar set!")
         except discord.InvalidArgument:
             return await ctx.send_error("URL must be a direct image link.")
@@ -299,14 +345,15 @@ class Bot(commands.Cog):
         resp = await ctx.input(str, ch=lambda m: m.lower() in ("cancel", "yes"))
         if resp == "yes":
             try:
-                await self.bot.db.conn.executescript(sql)
-                await self.bot.db.conn.commit()
+                async with self.bot.db.write_lock:
+                    try:
+                        await self.bot.db.conn.executescript(sql)
+                    finally:
+                        await self.bot.db.conn.commit()
                 await ctx.send_ok("Executed successfully")
             except (aiosqlite.Error, aiosqlite.Warning) as e:
                 await ctx.send_error(f"An error occurred while running the SQL command. If this was a complex "
                                      f"statement, it may have been partially executed.\n```{e}```")
-            finally:
-                await self.bot.db.conn.commit()
 
     @commands.is_owner()
     @commands.command(brief="Runs an SQL select command")
@@ -314,14 +361,12 @@ class Bot(commands.Cog):
         sql = sql_trim(sql)
         try:
             # TODO this breaks ```sql formatted code blocks... :thonk:... maybe remove a beginning `select`?
+            # a select has nothing to commit, and a commit here could land inside another write's transaction
             rows = await self.bot.db.conn.execute_fetchall(f"select {sql}")
-            await self.bot.db.conn.commit()
             await ctx.paginate(["|".join(map(str, row)) for row in rows] if rows else ["None"], 20, sql)
         except (aiosqlite.Error, aiosqlite.Warning) as e:
             await ctx.send_error(f"An error occurred while running the SQL command. If this was a complex "
                                  f"statement, it may have been partially executed.\n```{e}```")
-        finally:
-            await self.bot.db.conn.commit()
 
     @commands.is_owner()
     @commands.command(brief="View bot-wide configs",
@@ -1,5 +1,4 @@
 from datetime import timedelta
-from typing import Dict
 
 import aoi
 import discord
@@ -11,30 +10,23 @@ from libs.converters import t_delta
 class Channels(commands.Cog):
     def __init__(self, bot: aoi.AoiBot):
         self.bot = bot
+        bot.loop.create_task(self._init())
 
     @property
-    def slowmodes(self) -> Dict[int, int]:
-        return self.bot.slowmodes
+    def slowmodes(self) -> aoi.SlowmodeTracker:
+        return self.bot.db.slowmode
 
     async def _init(self):
         await self.bot.wait_until_ready()
-        for row in await self.bot.db.conn.execute_fetchall("select * from slowmode"):
-            self.slowmodes[row[0]] = row[1]
-
-        # update slowmodes
+        # slowmodes are loaded with the database, drop the ones Aoi no longer needs to handle
         ch: discord.TextChannel
-        for channel, value in self.slowmodes.items():
-            ch = self.bot.get_channel(channel)
-            if not ch:
-                # channel doesn't exist anymore
-                del self.slowmodes[channel]
-                await self.bot.db.conn.execute("delete from slowmode where channel=?", (channel,))
-                await self.bot.db.conn.execute("delete from last_messages where channel=?", (channel,))
-            if ch.slowmode_delay < 6 * 3600:
-                # slowmode is less than 6 hours, so Aoi no longer needs to handle it
-                await self.bot.db.conn.execute("delete from slowmode where channel=?", (channel,))
-                await self.bot.db.conn.execute("delete from last_messages where channel=?", (channel,))
-        await self.bot.db.conn.commit()  # commit transaction once done
+        async with self.bot.db.transaction() as conn:
+            for channel in list(self.slowmodes.durations):
+                ch = self.bot.get_channel(channel)
+                # either the channel doesn't exist anymore, or its slowmode is less than 6 hours
+                if not ch or ch.slowmode_delay < 6 * 3600:
+                    self.slowmodes.clear(channel)
+                    await conn.execute("delete from slowmode where channel=?", (channel,))
 
     @property
     def description(self):
@@ -66,18 +58,16 @@ class Channels(commands.Cog):
             return await ctx.send_error("Invalid slowmode time")
         if not time.days and time.seconds <= 21600:
             if ctx.channel.id in self.slowmodes:
-                del self.slowmodes[ctx.channel.id]
-                await self.bot.db.conn.execute("delete from slowmode where channel=?", (ctx.channel.id,))
-                await self.bot.db.conn.execute("delete from last_messages where channel=?", (ctx.channel.id,))
-                await self.bot.db.conn.commit()
+                self.slowmodes.clear(ctx.channel.id)
+                await self.bot.db.write("delete from slowmode where channel=?", (ctx.channel.id,))
             await ctx.channel.edit(slowmode_delay=time.seconds)
             return await ctx.send_ok(f"Slowmode set to {hms_notation(time.seconds)}"
                                      if time.total_seconds() else "Slowmode turned off.")
         await ctx.channel.edit(slowmode_delay=21600)
-        await self.bot.db.conn.execute("delete from slowmode where channel=?", (ctx.channel.id,))
-        await self.bot.db.conn.execute("insert into slowmode values (?,?)", (ctx.channel.id, int(time.total_seconds())))
-        await self.bot.db.conn.commit()
-        self.slowmodes[ctx.channel.id] = int(time.total_seconds())
+        async with self.bot.db.transaction() as conn:
+            await conn.execute("delete from slowmode where channel=?", (ctx.channel.id,))
+            await conn.execute("insert into slowmode values (?,?)", (ctx.channel.id, int(time.total_seconds())))
+        self.slowmodes.set(ctx.channel.id, int(time.total_seconds()))
         await ctx.send_ok(f"Slowmode set to {dhms_notation(time)}"
                           if time.total_seconds() else "Slowmode turned off")
 
@@ -172,10 +162,8 @@ class Channels(commands.Cog):
             return
         if after.slowmode_delay < 21600:
             if after.id in self.slowmodes:
-                del self.slowmodes[after.id]
-                await self.bot.db.conn.execute("delete from slowmode where channel=?", (after.id,))
-                await self.bot.db.conn.execute("delete from last_messages where channel=?", (after.id,))
-                await self.bot.db.conn.commit()
+                self.slowmodes.clear(after.id)
+                await self.bot.db.write("delete from slowmode where channel=?", (after.id,))
 
 
 def setup(bot: aoi.AoiBot) -> None:
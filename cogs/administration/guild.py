@@ -36,14 +36,13 @@ class Guilds(commands.Cog):
     async def serveravatar(self, ctx: aoi.AoiContext, *, url: str = None):
         if not url:
             return await ctx.send(ctx.guild.icon.url if ctx.guild.icon else "No server icon set")
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get(url) as resp:
-                await ctx.confirm_coro("Change guild avatar?",
-                                       "Avatar changed",
-                                       "Avatar change cancelled",
-                                       ctx.guild.edit(
-                                           icon=await resp.content.read()
-                                       ))
+        resp = await self.bot.web.get(url)
+        await ctx.confirm_coro("Change guild avatar?",
+                               "Avatar changed",
+                               "Avatar change cancelled",
+                               ctx.guild.edit(
+                                   icon=resp.body
+                               ))
 
     @commands.bot_has_permissions(manage_guild=True)
     @commands.has_permissions(manage_guild=True)
@@ -154,21 +153,20 @@ class Guilds(commands.Cog):
             src = str(src.url)
         buf = io.BytesIO()
         try:
-            async with aiohttp.ClientSession() as sess:
-                try:
-                    async with sess.get(src) as resp:
-                        if resp.status != 200:
-                            return await ctx.send_error(f"Server responded with a {resp.status}")
-                        if "Content-Type" in resp.headers:
-                            typ = resp.headers["Content-Type"].split("/")[-1]
-                        if "Content-Type" not in resp.headers or resp.headers["Content-Type"] not in \
-                                ("image/gif", "image/jpeg", "image/png"):
-                            return await ctx.send_error(f"That doesn't seem to be an image")
-                        buf.write(await resp.content.read())
-                except (ClientResponseError, BadHttpMessage):
-                    await ctx.send_error(f"I got an error trying to get that image."
-                                         f"Try pasting the image into discord and using that link instead.")
-                    raise
+            try:
+                resp = await self.bot.web.get(src)
+                if resp.status != 200:
+                    return await ctx.send_error(f"Server responded with a {resp.status}")
+                if "Content-Type" in resp.headers:
+                    typ = resp.headers["Content-Type"].split("/")[-1]
+                if "Content-Type" not in resp.headers or resp.headers["Content-Type"] not in \
+                        ("image/gif", "image/jpeg", "image/png"):
+                    return await ctx.send_error(f"That doesn't seem to be an image")
+                buf.write(resp.body)
+            except (ClientResponseError, BadHttpMessage):
+                await ctx.send_error(f"I got an error trying to get that image."
+                                     f"Try pasting the image into discord and using that link instead.")
+                raise
         except aiohttp.InvalidURL:
             return await ctx.send_info(f"`{src}` is an invalid URL")
         buf.seek(0)
@@ -7,6 +7,12 @@ from typing import List, Optional, Union
 import aoi
 import discord
 from discord.ext import commands
+from libs import chat_export
+from libs.purge import Purge
+
+SAVECHAT_LIMIT = 100000
+# how far back clear looks for messages matching its filters
+CLEAR_SCAN_LIMIT = 10000
 
 
 class Messages(commands.Cog):
@@ -118,110 +124,84 @@ class Messages(commands.Cog):
 
     @commands.has_permissions(manage_messages=True)
     @commands.cooldown(1, 30, commands.BucketType.channel)
-    @commands.command(brief="Saves chat in a txt file. Limit can be a message to stop at or a number of messages")
+    @commands.command(brief="Saves chat to files. Limit can be a message to stop at or a number of messages",
+                      flags={"format": (str, "txt, jsonl or html")})
     async def savechat(self, ctx: aoi.AoiContext, channel: Optional[discord.TextChannel],
                        limit: Union[int, discord.Message]):
         time = datetime.datetime.now()
         channel = channel or ctx.channel
+        fmt = (ctx.flags.get("format") or "txt").lower()
+        if fmt not in chat_export.FORMATS:
+            return await ctx.send_error(f"Format must be one of {', '.join(chat_export.FORMATS)}")
         await ctx.trigger_typing()
-        # fetch the messages first, in blocks
-        current_message: Optional[discord.Message]
-        if isinstance(limit, int):
-            messages: List[discord.Message] = (await channel.history(limit=min(limit, 1000)).flatten())[::-1]
-        else:
-            messages: List[discord.Message] = \
-                (await channel.history(limit=1000, after=limit).flatten())[::-1]
-        buf = io.StringIO()
-        buf.write(f"Channel save of {channel.name} [{channel.id}] triggered by {ctx.author} [{ctx.author.id}] on "
-                  f"{datetime.datetime.now().strftime('%x %X')}. The messages go from "
-                  f"{messages[0].created_at.strftime('%x %X')} "
-                  f"to {messages[-1].created_at.strftime('%x %X')}\n\n")
-        seen_ids = []
-        seen_dates = []
-        for m in messages:
-            date = m.created_at.strftime("%x")
-            if date not in seen_dates:
-                seen_dates.append(date)
-                buf.write("=" * 10 + date + "=" * 10)
-            buf.write(f"\n[{m.created_at.strftime('%X')}] ")
-            if m.author.id not in seen_ids:
-                seen_ids.append(m.author.id)
-                buf.write(f"[{m.author} | {m.author.id}] ")
+
+        async def send(part, filename: str):
+            await ctx.send(file=discord.File(part, filename=filename))
+
+        export = chat_export.ChatExport(
+            fmt,
+            f"Channel save of {channel.name} [{channel.id}] triggered by {ctx.author} [{ctx.author.id}] on "
+            f"{time.strftime('%x %X')}.",
+            # leave room for the rest of the upload
+            ctx.guild.filesize_limit - 64 * 1024,
+            send
+        )
+
+        async def do_op():
+            if isinstance(limit, int):
+                records = chat_export.newest_to_oldest(channel.history(limit=min(limit, SAVECHAT_LIMIT)))
             else:
-                buf.write(f"[{m.author}]")
-            if m.author.bot:
-                buf.write(f" [BOT]")
-            content = " " + m.content
-            buf.write(f":{content.splitlines(keepends=False)[0]}\n")
-            buf.write("\n".join(f"      {line}" for line in content.splitlines(keepends=False)[1:]))
-        buf.seek(0)
-        await ctx.send(content=f"Saved {len(messages)} in {(datetime.datetime.now() - time).seconds} s",
-                       file=discord.File(buf, filename="chat-save.txt"))
+                records = (chat_export.message_record(m) async for m in
+                           channel.history(limit=SAVECHAT_LIMIT, after=limit, oldest_first=True))
+            async for record in records:
+                await export.write(record)
+            await export.close()
+
+        await self.bot.create_task(ctx, do_op(), lambda: f"{export.count} messages, {export.parts} files")
+        if not export.count:
+            return await ctx.send_error("No messages to save")
+        await ctx.send_ok(f"Saved {export.count} messages from "
+                          f"{datetime.datetime.utcfromtimestamp(export.first).strftime('%x %X')} to "
+                          f"{datetime.datetime.utcfromtimestamp(export.last).strftime('%x %X')} UTC in "
+                          f"{(datetime.datetime.now() - time).seconds}s")
 
     @commands.has_permissions(manage_messages=True)
     @commands.bot_has_permissions(manage_channels=True, manage_messages=True)
     @commands.cooldown(1, 30, commands.BucketType.channel)
-    @commands.command(brief="Clear message from a channel",
+    @commands.command(brief="Clear message from a channel. Messages older than 14 days are deleted one at a time",
                       flags={"safe": (None, "Ignore pinned messages"),
-                             "from": (discord.Member, "From a certain member")})
-    async def clear(self, ctx: aoi.AoiContext, n: int):  # noqa C901
+                             "from": (discord.Member, "From a certain member"),
+                             "contains": (str, "Containing some text"),
+                             "bots": (None, "Only messages from bots"),
+                             "attachments": (None, "Only messages with attachments")})
+    async def clear(self, ctx: aoi.AoiContext, n: int):
+        if n > CLEAR_SCAN_LIMIT:
+            return await ctx.send_error(f"I can only look through the last {CLEAR_SCAN_LIMIT} messages, "
+                                        f"clear at most that many at once")
+        contains = ctx.flags["contains"].lower() if "contains" in ctx.flags else None
+
+        def check(message: discord.Message) -> bool:
+            if "safe" in ctx.flags and message.pinned:
+                return False
+            if "from" in ctx.flags and message.author.id != ctx.flags["from"].id:
+                return False
+            if "bots" in ctx.flags and not message.author.bot:
+                return False
+            if "attachments" in ctx.flags and not message.attachments:
+                return False
+            return not contains or contains in message.content.lower()
+
+        purge = Purge(self.bot.http, ctx.channel, n, check, before=ctx.message, scan_limit=CLEAR_SCAN_LIMIT,
+                      reason=f"Clear | {ctx.author} ({ctx.author.id})")
         await ctx.trigger_typing()
-        # fetch the messages first, in blocks
-        messages: List[discord.Message] = []
-        channel: discord.TextChannel = ctx.channel
-        last_message: Optional[discord.Message] = None
-        current_message: Optional[discord.Message]
-        reached_bulk_limit = False
-        now_timestamp = discord.utils.snowflake_time(ctx.message.id)
-        log = False
-        if n > 100 or ("from" in ctx.flags and n > 50):
-            log = True
-            msg = await ctx.send("Fetching messages...")
-
-        while len(messages) < n and not reached_bulk_limit:
-            async for current_message in channel.history(
-                    limit=min(100, n - len(messages)), before=last_message
-            ):
-                if current_message.id == ctx.message.id:
-                    continue
-                if log and current_message.id == msg.id:
-                    continue
-                last_message = current_message
-                if (now_timestamp - discord.utils.snowflake_time(current_message.id)).days >= 13:
-                    reached_bulk_limit = True
-                    break
-                if "safe" in ctx.flags and current_message.pinned:
-                    continue
-                if "from" not in ctx.flags or ("from" in ctx.flags and
-                                               ctx.flags["from"].id == current_message.author.id):
-                    messages.append(current_message)
-            if log:
-                await msg.edit(content=f"Fetching messages...{len(messages)}/{n}")
-            if len(messages) < n and not reached_bulk_limit:
-                await asyncio.sleep(1)
-
-        to_delete = [messages[i * 100:(i + 1) * 100] for i in range((len(messages) + 100 - 1) // 100)]
-
-        for n, row in enumerate(to_delete):
-            if log:
-                await msg.edit(content=f"Deleting batch {n + 1}/{len(to_delete)}")
-            if len(row) == 0:
-                continue
-            if len(row) == 1:
-                await row[0].delete()
-                continue
-            await self.bot.http.delete_messages(ctx.channel.id, message_ids=[m.id for m in row],
-                                                reason=f"Bulk | {n + 1}/{len(to_delete)} | "
-                                                       f"{ctx.author} ({ctx.author.id})")
-            await asyncio.sleep(1)
+        await self.bot.create_task(ctx, purge.run(), purge.status)
 
         ignore_pins = ", while ignoring pins" if "safe" in ctx.flags else ""
         from_user = f"from {ctx.flags['from'].mention}" if "from" in ctx.flags else ""
-        confirmation = f"Done! Cleared {len(messages)} {from_user}{ignore_pins}. " + \
-                       ("The 14 day limit was hit." if reached_bulk_limit else "")
-
-        if log:
-            await msg.delete()
+        confirmation = f"Done! Cleared {purge.deleted} {from_user}{ignore_pins}. " + \
+                       (f"{purge.deleted_old} were older than 14 days. " if purge.deleted_old else "") + \
+                       (f"Stopped after looking through the last {purge.scanned} messages."
+                        if purge.scan_limited else "")
 
         msg = await ctx.send_ok(confirmation)
         await asyncio.sleep(3)
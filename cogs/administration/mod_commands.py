@@ -1,11 +1,14 @@
 import asyncio
-from datetime import datetime
-from typing import List, Union, Optional, Dict
+from datetime import datetime, timedelta
+from typing import List, Union, Optional, Dict, Tuple
 
 import aoi
 import discord
 from aoi.database import PunishmentModel, PunishmentTypeModel, TimedPunishmentModel
 from discord.ext import commands
+from libs.conversions import dhms_notation
+from libs.converters import t_delta
+from libs.expiry_scheduler import ExpiryScheduler
 
 
 def _soft_check_role(ctx: aoi.AoiContext, member: discord.Member, action: str = "edit"):
@@ -16,12 +19,49 @@ def _soft_check_role(ctx: aoi.AoiContext, member: discord.Member, action: str =
 class Moderation(commands.Cog):
     def __init__(self, bot: aoi.AoiBot):
         self.bot = bot
-        self.timed_punishments: Dict[int, List[TimedPunishmentModel]] = {}
+        # (guild, user, role) -> punishment, bans have a role of 0
+        self.timed_punishments: Dict[Tuple[int, int, int], TimedPunishmentModel] = {}
+        self.expiries: ExpiryScheduler[Tuple[int, int, int]] = ExpiryScheduler(self._expire)
         bot.loop.create_task(self._init())
 
     async def _init(self):
         await self.bot.wait_until_ready()
-        self.timed_punishments = await self.bot.db.load_backing_punishments()
+        for punishment in await self.bot.db.load_backing_punishments():
+            self._schedule(punishment)
+        # anything that ended while the bot was down expires straight away
+        self.expiries.start()
+        self.bot.logger.info(f"moderation:Resumed {len(self.expiries)} timed punishments")
+
+    def cog_unload(self):
+        self.expiries.stop()
+
+    def _schedule(self, punishment: TimedPunishmentModel):
+        key = (punishment.guild, punishment.user, punishment.role)
+        self.timed_punishments[key] = punishment
+        self.expiries.schedule(key, punishment.end)
+
+    async def _cancel_timed(self, guild: int, user: int, role: int = 0):
+        key = (guild, user, role)
+        if self.timed_punishments.pop(key, None):
+            self.expiries.cancel(key)
+            await self.bot.db.remove_timed_punishment(*key)
+
+    async def _expire(self, key: Tuple[int, int, int]):
+        punishment = self.timed_punishments.pop(key, None)
+        guild = self.bot.get_guild(key[0])
+        try:
+            if not punishment or not guild:
+                pass
+            elif punishment.ismute:
+                member = guild.get_member(punishment.user)
+                role = guild.get_role(punishment.role)
+                if member and role:
+                    await member.remove_roles(role, reason="Timed mute expired")
+            else:
+                await guild.unban(discord.Object(punishment.user), reason="Temporary ban expired")
+        except discord.HTTPException as error:
+            self.bot.logger.warning(f"moderation:Couldn't end timed punishment {key}: {error}")
+        await self.bot.db.remove_timed_punishment(*key)
 
     def _check_role(self, ctx: aoi.AoiContext, member: discord.Member, action: str = "edit"):
         if member.top_role >= ctx.author.top_role and ctx.guild.owner_id != ctx.author.id:
@@ -72,6 +112,27 @@ class Moderation(commands.Cog):
             await member.ban(reason=f"{reason} | {ctx.author.id} {ctx.author}")
             await ctx.send(embed=self.get_action_embed(ctx, member, PunishmentTypeModel.BAN, reason,
                                                        extra="DM could not be sent" if not dm_sent else ""))
+        await self._cancel_timed(ctx.guild.id, member.id)
+        await self.bot.db.add_user_ban(member.id, ctx, reason)
+
+    @commands.has_permissions(ban_members=True)
+    @commands.command(brief="Bans a member from the server for a while",
+                      description="""
+                      tempban @user 1d spamming
+                      tempban @user 12h
+                      """)
+    async def tempban(self, ctx: aoi.AoiContext, member: discord.Member, duration: t_delta(), *, reason: str = None):
+        duration: timedelta = duration
+        if duration.total_seconds() <= 0:
+            return await ctx.send_error("Invalid ban time")
+        self._check_role(ctx, member, "ban")
+        dm_sent = await self._dm(member, discord.Embed(title=f"Banned from {ctx.guild} for {dhms_notation(duration)}",
+                                                       description=reason))
+        await member.ban(reason=f"{reason} | {ctx.author.id} {ctx.author} | {dhms_notation(duration)}")
+        self._schedule(await self.bot.db.add_timed_punishment(ctx.guild.id, duration, member.id, 0, False))
+        await ctx.send(embed=self.get_action_embed(ctx, member, PunishmentTypeModel.BAN, reason,
+                                                   extra=f"Unbanned in {dhms_notation(duration)}" +
+                                                         ("\n\nDM could not be sent" if not dm_sent else "")))
         await self.bot.db.add_user_ban(member.id, ctx, reason)
 
     @commands.has_permissions(ban_members=True)
@@ -100,6 +161,7 @@ class Moderation(commands.Cog):
             return await ctx.send_error(f"User ID {user} not banned from this server")
         user = await self.bot.fetch_unknown_user(user)
         await ctx.guild.unban(found.user, reason=f"{reason} | {ctx.author.id} {ctx.author}")
+        await self._cancel_timed(ctx.guild.id, user.id)
         await ctx.send(embed=self.get_action_embed(ctx, user, PunishmentTypeModel.UNBAN, reason))
         await self.bot.db.add_punishment(user.id, ctx.guild.id, ctx.author.id, PunishmentTypeModel.UNBAN, reason)
 
@@ -140,14 +202,13 @@ class Moderation(commands.Cog):
             return ctx.send_error("Invalid warning number")
         p = punishments[num - 1]
         if "del" in ctx.flags:
-            await self.bot.db.conn.execute("delete from punishments where user=? and guild=? and timestamp=?",
-                                           (p.user,
-                                            p.guild,
-                                            p.time.timestamp()))
+            await self.bot.db.write("delete from punishments where user=? and guild=? and timestamp=?",
+                                    (p.user,
+                                     p.guild,
+                                     p.time.timestamp()))
         else:
-            await self.bot.db.conn.execute("update punishments set cleared=1,cleared_by=? where user=? and guild=? "
-                                           "and timestamp=?", (ctx.author.id, p.user, p.guild, p.time.timestamp()))
-        await self.bot.db.conn.commit()
+            await self.bot.db.write("update punishments set cleared=1,cleared_by=? where user=? and guild=? "
+                                    "and timestamp=?", (ctx.author.id, p.user, p.guild, p.time.timestamp()))
         await ctx.send_ok(f"Cleared punishment #{num} for {member}")
 
     @commands.command(brief="Views the punishment logs for a user")
@@ -1,5 +1,4 @@
-from dataclasses import dataclass
-from typing import Dict, Optional, List, Union
+from typing import Dict, Optional, Union, Set, Iterable, Tuple
 
 import aoi
 import discord
@@ -8,50 +7,68 @@ from discord.ext import commands
 from libs.converters import partial_emoji_convert
 
 
-@dataclass()
-class _ReactionRoleData:
-    role: discord.Role
-
-
 # TODO help refactor
 
 class ReactionRoles(commands.Cog):
     def __init__(self, bot: aoi.AoiBot):
         self.bot = bot
-        self._roles: Dict[int, Dict[str, _ReactionRoleData]] = {}
-        self._reaction_cache: Dict[int, Dict[str, List[int]]] = {}
+        # message -> emoji -> role id, roles are looked up when a reaction comes in
+        self._roles: Dict[int, Dict[str, int]] = {}
+        # the same entries by role, and the messages in each channel, so deletes don't scan everything
+        self._role_entries: Dict[int, Set[Tuple[int, str]]] = {}
+        self._channels: Dict[int, Set[int]] = {}
+        self._message_channels: Dict[int, int] = {}
         self._db: Optional[AoiDatabase]
         self.bot.loop.create_task(self._init())
 
-    async def _delete(self, row):
-        await self._db.conn.execute("delete from rero where rowid=?", (row[0],))
-
     async def _init(self):
         self.bot.logger.info("rero:Waiting for bot")
         await self.bot.wait_until_ready()
         self._db = self.bot.db
-        for row in await self._db.conn.execute_fetchall("select rowid, * from rero"):
-            channel: discord.TextChannel = self.bot.get_channel(row[2])
-            if not channel:
-                await self._delete(row)
-                continue
-            message_id: int = row[3]
-            if message_id not in self._roles:
-                try:
-                    await channel.fetch_message(message_id)
-                except discord.NotFound:
-                    await self._delete(row)
-                    continue
-            role: discord.Role = self.bot.get_guild(row[1]).get_role(row[5])
-            if not role:
-                await self._delete(row)
-                continue
-            emoji_name: str = row[4]
-            if message_id not in self._roles:
-                self._roles[message_id] = {}
-            self._roles[message_id][emoji_name] = _ReactionRoleData(role)
-        await self._db.conn.commit()
-        self.bot.logger.info("rero:Ready!")
+        # nothing is fetched here, deleted messages are dropped when discord tells us about them
+        for channel, message, emoji, role in await self._db.conn.execute_fetchall("select channel, message, emoji, "
+                                                                                  "role from rero"):
+            self._add(channel, message, emoji, role)
+        self.bot.logger.info(f"rero:Ready with {len(self._roles)} messages")
+
+    def _add(self, channel: int, message: int, emoji: str, role: int):
+        self._roles.setdefault(message, {})[emoji] = role
+        self._role_entries.setdefault(role, set()).add((message, emoji))
+        self._channels.setdefault(channel, set()).add(message)
+        self._message_channels[message] = channel
+
+    def _remove(self, message: int, emoji: Optional[str] = None) -> bool:
+        # drops one emoji, or all of them, from a message and cleans up the indexes that point at it
+        roles = self._roles.get(message)
+        if not roles:
+            return False
+        for emoji in [emoji] if emoji else list(roles):
+            role = roles.pop(emoji)
+            entries = self._role_entries[role]
+            entries.discard((message, emoji))
+            if not entries:
+                del self._role_entries[role]
+        if not roles:
+            del self._roles[message]
+            channel = self._message_channels.pop(message)
+            self._channels[channel].discard(message)
+            if not self._channels[channel]:
+                del self._channels[channel]
+        return True
+
+    async def _forget(self, messages: Iterable[int]):
+        messages = [(message,) for message in messages if self._remove(message)]
+        if messages:
+            async with self._db.transaction() as conn:
+                await conn.executemany("delete from rero where message=?", messages)
+
+    def _role(self, payload: discord.RawReactionActionEvent) -> Optional[discord.Role]:
+        roles = self._roles.get(payload.message_id)
+        if not roles:
+            return None
+        role = roles.get(self._emoji(payload.emoji))
+        guild = self.bot.get_guild(payload.guild_id)
+        return guild.get_role(role) if role and guild else None
 
     @property
     def description(self):
@@ -59,37 +76,40 @@ class ReactionRoles(commands.Cog):
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
-        if payload.message_id not in self._roles:
-            return
-        if str(payload.emoji.id) in self._roles[payload.message_id]:
-            role = self._roles[payload.message_id][str(payload.emoji.id)].role
-            if role:
-                await payload.member.add_roles(role)
-            return
-        if payload.emoji.name in self._roles[payload.message_id]:
-            role = self._roles[payload.message_id][str(payload.emoji.name)].role
-            if role:
-                await payload.member.add_roles(role)
+        role = self._role(payload)
+        if role and payload.member:
+            await payload.member.add_roles(role)
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
-        if payload.message_id not in self._roles:
+        role = self._role(payload)
+        if not role:
             return
-        if self._emoji(payload.emoji) in self._roles[payload.message_id]:
-            # inject payload member
-            # come on discord, why not just tell us who un-reacted :(
-            payload.member = self.bot.get_guild(payload.guild_id).get_member(payload.user_id)
-            if payload.message_id not in self._roles:
-                return
-            if str(payload.emoji.id) in self._roles[payload.message_id]:
-                role = self._roles[payload.message_id][str(payload.emoji.id)].role
-                if role:
-                    await payload.member.remove_roles(role)
-                return
-            if payload.emoji.name in self._roles[payload.message_id]:
-                role = self._roles[payload.message_id][str(payload.emoji.name)].role
-                if role:
-                    await payload.member.remove_roles(role)
+        # discord doesn't send the member on removal
+        member = role.guild.get_member(payload.user_id)
+        if member:
+            await member.remove_roles(role)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if payload.message_id in self._roles:
+            await self._forget((payload.message_id,))
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        await self._forget(payload.message_ids)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        await self._forget(list(self._channels.get(channel.id, ())))
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        deleted = list(self._role_entries.get(role.id, ()))
+        for message, emoji in deleted:
+            self._remove(message, emoji)
+        if deleted:
+            await self._db.write("delete from rero where role=?", (role.id,))
 
     @commands.has_permissions(manage_roles=True)
     @commands.command(brief="Add a reaction role message, pass them in emoji - role pairs")
@@ -97,7 +117,6 @@ class ReactionRoles(commands.Cog):
         split = ctx.group_list(args.split(), 2)
         role_converter = commands.RoleConverter()
         for i in split:
-            print(i)
             try:
                 emoji: discord.PartialEmoji = await partial_emoji_convert(ctx, i[0])
                 role: discord.Role = await role_converter.convert(ctx, i[1])
@@ -115,15 +134,11 @@ class ReactionRoles(commands.Cog):
                 return await ctx.send_error("I can't react to that message!")
             except discord.HTTPException:
                 return await ctx.send_error(f"Emoji {i[0]} invalid")
-            if message.id not in self._roles:
-                self._roles[message.id] = {}
-            if emoji.name in self._roles[message.id] or str(emoji.id) in self._roles[message.id]:
+            if self._emoji(emoji) in self._roles.get(message.id, {}):
                 return await ctx.send_error("That emoji is already being used")
-            self._roles[message.id][str(emoji.id) if emoji.id else emoji.name] = _ReactionRoleData(role)
-            await self._db.conn.execute("insert into rero values (?,?,?,?,?,0,0)",
-                                        (ctx.guild.id, message.channel.id, message.id,
-                                         str(emoji.id) if emoji.id else emoji.name, role.id))
-            await self._db.conn.commit()
+            self._add(message.channel.id, message.id, self._emoji(emoji), role.id)
+            await self._db.write("insert into rero values (?,?,?,?,?,0,0)",
+                                 (ctx.guild.id, message.channel.id, message.id, self._emoji(emoji), role.id))
             await ctx.send_ok("Added!")
 
     @commands.has_permissions(manage_roles=True)
@@ -133,16 +148,14 @@ class ReactionRoles(commands.Cog):
             return await ctx.send_error("Message has no reaction roles!")
         if not emoji:
             await message.clear_reactions()
-            del self._roles[message.id]
-            await self._db.conn.execute("delete from rero where message=?", (message.id,))
-            await self._db.conn.commit()
+            self._remove(message.id)
+            await self._db.write("delete from rero where message=?", (message.id,))
             return await ctx.send_ok("Cleared all reaction roles from message")
         emoji = await partial_emoji_convert(ctx, emoji)
         if self._emoji(emoji) not in self._roles[message.id]:
             return await ctx.send_error(f"{emoji} not part of the reaction role")
-        del self._roles[message.id][self._emoji(emoji)]
-        await self._db.conn.execute("delete from rero where message=? and emoji=?", (message.id, self._emoji(emoji)))
-        await self._db.conn.commit()
+        self._remove(message.id, self._emoji(emoji))
+        await self._db.write("delete from rero where message=? and emoji=?", (message.id, self._emoji(emoji)))
         return await ctx.send_ok(f"Cleared {self._emoji(emoji)}")
 
     def _emoji(self, emoji: Union[str, discord.PartialEmoji]):
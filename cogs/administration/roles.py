@@ -1,4 +1,3 @@
-import asyncio
 import io
 from typing import List, Union
 
@@ -73,32 +72,21 @@ class Roles(commands.Cog, ColorService):
     @commands.command(brief="Creates one or more roles - multiword role names must be quoted.",
                       aliases=["cr"])
     async def createrole(self, ctx: aoi.AoiContext, names: Greedy[rolename()]):
-
-        async def _(name):
-            await ctx.guild.create_role(name=name)
-            await asyncio.sleep(10)
-
         if len(names) > 3:
             conf = await ctx.confirm("Create roles: " + (" ".join(f"`{n}`" for n in names) + "?"),
                                      "Creating roles...",
                                      "Role creation cancelled")
             if not conf:
                 return
-        n = 0
-        roles = []
-        num = len(names)
-
-        async def do_op():
-            nonlocal n
-            for r in names:
-                roles.append(await ctx.guild.create_role(name=r))
-                await asyncio.sleep(1)
-                n += 1
 
-        await ctx.send_info(f"Creating {num} roles. Will take at least {num}s")
-        await self.bot.create_task(ctx, do_op(), lambda: f"{n}/{num}")
+        async def report():
+            roles = operation.ordered_results
+            await ctx.send_ok(f"Created {' '.join(r.mention for r in roles)}", ping=len(roles) > 10)
 
-        await ctx.send_ok(f"Created {' '.join(r.mention for r in roles)}", ping=len(roles) > 10)
+        operation = aoi.BulkOperation(names, lambda name: ctx.guild.create_role(name=name), report=report)
+        await ctx.send_info(f"Creating {len(names)} roles")
+        await self.bot.create_bulk_task(ctx, operation)
+        await report()
 
     @commands.bot_has_permissions(manage_roles=True)
     @commands.has_permissions(manage_roles=True)
@@ -116,20 +104,17 @@ class Roles(commands.Cog, ColorService):
                                      "Role deletion cancelled")
             if not conf:
                 return
-        n = 0
 
-        async def do_op():
-            nonlocal n
-            for r in roles:
-                await r.delete()
-                await asyncio.sleep(1)
-                n += 1
+        async def report():
+            await ctx.send_ok(f"Deleted {' '.join('`' + roles[i].name + '`' for i in sorted(operation.results))}",
+                              ping=len(roles) > 10)
 
+        operation = aoi.BulkOperation(roles, lambda r: r.delete(), report=report)
         await ctx.trigger_typing()
         if len(roles) > 3:
-            await ctx.send_info(f"Deleting {len(roles)} roles. Will take at least {len(roles)}s")
-        await self.bot.create_task(ctx, do_op(), lambda: f"{n}/{(len(roles))}")
-        await ctx.send_ok(f"Deleted {' '.join('`' + r.name + '`' for r in roles)}", ping=len(roles) > 10)
+            await ctx.send_info(f"Deleting {len(roles)} roles")
+        await self.bot.create_bulk_task(ctx, operation)
+        await report()
 
     @commands.bot_has_permissions(manage_roles=True)
     @commands.has_permissions(manage_roles=True)
@@ -149,21 +134,17 @@ class Roles(commands.Cog, ColorService):
         img = Image.new("RGB", (240, 48))
         await ctx.trigger_typing()
         img_draw = ImageDraw.Draw(img)
-        n = 0
         buf = io.BytesIO()
-
-        async def do_op():
-            nonlocal n
-            for idx, clr in enumerate(colors):
-                await asyncio.sleep(0.5)
-                await roles[idx].edit(colour=AoiColor(*clr).to_discord_color())
-                img_draw.rectangle([
-                    (idx * 240 / num, 0),
-                    ((idx + 1) * 240 / num, 48)
-                ], fill=tuple(map(int, clr)))
-            img.save(buf, format="PNG")
-
-        await self.bot.create_task(ctx, do_op(), lambda: f"{n}/{num}")
+        for idx, clr in enumerate(colors):
+            img_draw.rectangle([
+                (idx * 240 / num, 0),
+                ((idx + 1) * 240 / num, 48)
+            ], fill=tuple(map(int, clr)))
+        img.save(buf, format="PNG")
+
+        operation = aoi.BulkOperation(zip(roles, colors),
+                                      lambda pair: pair[0].edit(colour=AoiColor(*pair[1]).to_discord_color()))
+        await self.bot.create_bulk_task(ctx, operation)
         await ctx.embed(title="Roles colored according to gradient",
                         description=" ".join("#" + "".join(hex(x)[2:] for x in c) for c in colors),
                         image=buf)
@@ -195,23 +176,12 @@ class Roles(commands.Cog, ColorService):
             members = [member for member in members if with_role.id in [r.id for r in member.roles]]
         await ctx.send_ok(f"Adding {role.mention} to {len(members)} that don't have it" +
                           (", while ignoring bots" if ignore_bots else "") +
-                          ". This will take at " +
-                          f"least {len(members) // 2}s")
-        n = 0
-
-        async def do_op():
-            nonlocal n
-            for m in members:
-                if m.bot and ignore_bots:
-                    continue
-                if with_role and with_role.id not in [r.id for r in m.roles]:
-                    continue
-                await m.add_roles(role, reason=f"roleall by {ctx.author} | {ctx.author.id}")
-                n += 1
-                await aoi.asyncio.sleep(1)
+                          f". Do `{ctx.prefix}mytasks` to see how far along it is.")
+        operation = aoi.BulkOperation(members,
+                                      lambda m: m.add_roles(role, reason=f"roleall by {ctx.author} | {ctx.author.id}"))
 
         await ctx.trigger_typing()
-        await self.bot.create_task(ctx, do_op(), lambda: f"{n}/{len(members)}")
+        await self.bot.create_bulk_task(ctx, operation)
 
         await ctx.done_ping()
 
@@ -526,15 +496,17 @@ class Roles(commands.Cog, ColorService):
             "Tan": 0xbb8553,
             "Gray": 0x888888
         }
-        created = []
 
-        await ctx.trigger_typing()
+        async def report():
+            await ctx.send_info(f"Created " + " ".join(r.mention for r in operation.ordered_results))
 
-        for color, value in colors.items():
-            created.append(await ctx.guild.create_role(name=color, color=discord.Colour(value)))
-            await asyncio.sleep(0.5)
+        operation = aoi.BulkOperation(colors.items(),
+                                      lambda pair: ctx.guild.create_role(name=pair[0], color=discord.Colour(pair[1])),
+                                      report=report)
 
-        await ctx.send_info(f"Created " + " ".join(r.mention for r in created))
+        await ctx.trigger_typing()
+        await self.bot.create_bulk_task(ctx, operation)
+        await report()
 
 
 def setup(bot: aoi.AoiBot) -> None:
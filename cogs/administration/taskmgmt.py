@@ -49,7 +49,33 @@ class TaskManagement(commands.Cog):
         if not conf:
             return await ctx.send_ok("Cancellation stopped")
         task.task.cancel()
-        await ctx.send_ok("Task stopped")
+        await ctx.send_ok("Task stopped" + (f", do `{ctx.prefix}resumetask` to pick it back up"
+                                            if task.operation else ""))
+
+    @commands.command(
+        brief="List your stopped tasks that can be resumed"
+    )
+    async def stoppedtasks(self, ctx: aoi.AoiContext):
+        if ctx.author in self.bot.stopped_tasks and self.bot.stopped_tasks[ctx.author]:
+            return await ctx.paginate(self.bot.stopped_tasks[ctx.author], 5, "Your stopped tasks", numbered=True)
+        await ctx.send_info("You have no stopped tasks")
+
+    @commands.command(
+        brief="Resumes a stopped task. Defaults to the last one stopped"
+    )
+    async def resumetask(self, ctx: aoi.AoiContext, num: int = -1):
+        if ctx.author not in self.bot.stopped_tasks or not self.bot.stopped_tasks[ctx.author]:
+            return await ctx.send_info("You have no stopped tasks")
+        if num < -1 or num >= len(self.bot.stopped_tasks[ctx.author]):
+            return await ctx.send_error(f"Invalid task, do `{ctx.prefix}stoppedtasks` to see your tasks.")
+        operation = self.bot.stopped_tasks[ctx.author].pop(num).operation
+        if not self.bot.stopped_tasks[ctx.author]:
+            del self.bot.stopped_tasks[ctx.author]
+        await ctx.send_ok(f"Resuming at {operation.status()}")
+        await self.bot.create_bulk_task(ctx, operation)
+        if operation.report:
+            return await operation.report()
+        await ctx.send_ok(f"Task finished, {operation.status()}")
 
 
 def setup(bot: aoi.AoiBot) -> None:
@@ -1,10 +1,8 @@
-from typing import Dict, List, Optional
-
-from aiosqlite import Connection
+from typing import Dict
 
 import aoi
 import discord
-from aoi.triggers import Trigger
+from aoi.triggers import RoleTrigger
 from discord.ext import commands
 from discord.ext.commands import RoleConverter
 
@@ -14,9 +12,9 @@ from discord.ext.commands import RoleConverter
 class Triggers(commands.Cog):
     def __init__(self, bot: aoi.AoiBot):
         self.bot = bot
-        self.role_add_triggers: Dict[int, Dict[int, Trigger]] = {}
-        self.role_remove_triggers: Dict[int, Dict[int, Trigger]] = {}
-        self.db: Optional[Connection] = None
+        # guild -> role -> trigger, guilds without triggers have no entry
+        self.role_add_triggers: Dict[int, Dict[int, RoleTrigger]] = {}
+        self.role_remove_triggers: Dict[int, Dict[int, RoleTrigger]] = {}
         bot.loop.create_task(self.dbload())
 
     @property
@@ -25,8 +23,7 @@ class Triggers(commands.Cog):
 
     async def dbload(self):
         await self.bot.wait_until_ready()
-        self.db = self.bot.db.conn
-        rows = await self.db.execute_fetchall("SELECT * FROM roletriggers")
+        rows = await self.bot.db.conn.execute_fetchall("SELECT * FROM roletriggers")
 
         for row in rows:
             guild = row[0]
@@ -75,69 +72,51 @@ class Triggers(commands.Cog):
 
     @commands.has_permissions(manage_guild=True)
     @commands.command(brief="Lists the role triggers", aliases=["roletr", "roletrigger"])
-    async def roletriggers(self, ctx: aoi.AoiContext, for_role: discord.Role = None,  # noqa C901
-                           add_or_remove: str = None):  # noqa C901
-        rows = await self.db.execute_fetchall("SELECT * FROM roletriggers WHERE guild=?", (ctx.guild.id,))
-        valid_rows = []
-        lost_rows = []
-
-        adds = {}
-        removes = {}
-        union = []
+    async def roletriggers(self, ctx: aoi.AoiContext, for_role: discord.Role = None,
+                           add_or_remove: str = None):
+        adds = self.role_add_triggers.get(ctx.guild.id, {})
+        removes = self.role_remove_triggers.get(ctx.guild.id, {})
 
         # find and remove triggers for deleted roles
-        for row in rows:
-            if ctx.guild.get_role(row[1]):
-                valid_rows.append(row)
-            else:
-                lost_rows.append(row)
-        for row in lost_rows:
-            if row[4] == "add":
-                await self._remove_roleadd_trigger(ctx.guild.id, row[1])
-            else:
-                await self._remove_roleremove_trigger(ctx.guild.id, row[1])
+        for role in [r for r in adds if not ctx.guild.get_role(r)]:
+            await self._remove_roleadd_trigger(ctx.guild.id, role)
+        for role in [r for r in removes if not ctx.guild.get_role(r)]:
+            await self._remove_roleremove_trigger(ctx.guild.id, role)
 
         if not for_role:
-            for row in valid_rows:
-                role = row[1]
-                channel = row[2]
-                typ = row[4]
-                if typ == "add":
-                    adds[role] = channel
-                else:
-                    removes[role] = channel
-                if role not in union:
-                    union.append(role)
-
             def fmt(r: int):
-                add = f"Message sent in <#{adds[r]}> when added\n" if r in adds else ""
-                remove = f"Message sent in <#{removes[r]}> when removed\n" if r in removes else ""
+                add = f"Message sent in <#{adds[r].channel}> when added\n" if r in adds else ""
+                remove = f"Message sent in <#{removes[r].channel}> when removed\n" if r in removes else ""
                 return f"<@&{r}>\n{add}{remove}"
 
-            return await ctx.paginate([fmt(r) for r in union], 10, f"Role Triggers for {ctx.guild}")
+            return await ctx.paginate([fmt(r) for r in {**adds, **removes}], 10, f"Role Triggers for {ctx.guild}")
         if not add_or_remove or add_or_remove not in ["add", "remove"]:
             return await ctx.send_error("`add` or `remove` must be supplied when looking up a role trigger message")
-        row = await (await self.db.execute("SELECT * FROM roletriggers WHERE guild=? AND type=? AND role=?",
-                                           (ctx.guild.id, add_or_remove, for_role.id))).fetchone()
-        if not row:
+        trigger = (adds if add_or_remove == "add" else removes).get(for_role.id)
+        if not trigger:
             return await ctx.send_error(f"No trigger found for {for_role.mention} {add_or_remove}")
-        await ctx.embed(description=f"Send in <#{row[2]}> on {for_role.mention} {add_or_remove}\n\n"
-                                    f"```{row[3][:1800]}```")
+        await ctx.embed(description=f"Send in <#{trigger.channel}> on {for_role.mention} {add_or_remove}\n\n"
+                                    f"```{trigger.message[:1800]}```")
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
-        remove_set: List[discord.Role] = list(set(before.roles) - set(after.roles))
-        add_set: List[discord.Role] = list(set(after.roles) - set(before.roles))
-        if remove_set:
-            if before.guild.id not in self.role_remove_triggers:
-                return
-            if remove_set[0].id in self.role_remove_triggers[before.guild.id]:
-                await self.role_remove_triggers[before.guild.id][remove_set[0].id].run(before)
-        if add_set:
-            if before.guild.id not in self.role_add_triggers:
-                return
-            if add_set[0].id in self.role_add_triggers[before.guild.id]:
-                await self.role_add_triggers[before.guild.id][add_set[0].id].run(before)
+        # most updates are presences and nicknames in guilds without triggers
+        adds = self.role_add_triggers.get(after.guild.id)
+        removes = self.role_remove_triggers.get(after.guild.id)
+        if not adds and not removes:
+            return
+        before_roles = {r.id for r in before.roles}
+        after_roles = {r.id for r in after.roles}
+        if before_roles == after_roles:
+            return
+        if removes:
+            for role in before_roles - after_roles:
+                if role in removes:
+                    await removes[role].run(after)
+        if adds:
+            for role in after_roles - before_roles:
+                if role in adds:
+                    await adds[role].run(after)
 
     async def _append_roleadd_trigger(self, guild: int, role: int, channel: int, message: str, write: bool = False):
         async def send_coro(member: discord.Member):
@@ -147,15 +126,13 @@ class Triggers(commands.Cog):
                 member=member
             )
 
-        if guild not in self.role_add_triggers:
-            self.role_add_triggers[guild] = {}
-        self.role_add_triggers[guild][role] = Trigger(send_coro)
+        self.role_add_triggers.setdefault(guild, {})[role] = RoleTrigger(send_coro, channel, message)
 
         if write:
-            await self.db.execute("DELETE FROM roletriggers WHERE guild=? AND type=? AND role=?", (guild, "add", role))
-            await self.db.execute("INSERT INTO roletriggers VALUES (?,?,?,?,?)",
-                                  (guild, role, channel, message, "add"))
-            await self.db.commit()
+            async with self.bot.db.transaction() as conn:
+                await conn.execute("DELETE FROM roletriggers WHERE guild=? AND type=? AND role=?", (guild, "add", role))
+                await conn.execute("INSERT INTO roletriggers VALUES (?,?,?,?,?)",
+                                   (guild, role, channel, message, "add"))
 
     async def _append_roleremove_trigger(self, guild: int, role: int, channel: int, message: str, write: bool = False):
         async def send_coro(member: discord.Member):
@@ -165,26 +142,27 @@ class Triggers(commands.Cog):
                 member=member
             )
 
-        if guild not in self.role_remove_triggers:
-            self.role_remove_triggers[guild] = {}
-        self.role_remove_triggers[guild][role] = Trigger(send_coro)
+        self.role_remove_triggers.setdefault(guild, {})[role] = RoleTrigger(send_coro, channel, message)
 
         if write:
-            await self.db.execute("DELETE FROM roletriggers WHERE guild=? AND type=? AND role=?",
-                                  (guild, "remove", role))
-            await self.db.execute("INSERT INTO roletriggers VALUES (?,?,?,?,?)",
-                                  (guild, role, channel, message, "remove"))
-            await self.db.commit()
+            async with self.bot.db.transaction() as conn:
+                await conn.execute("DELETE FROM roletriggers WHERE guild=? AND type=? AND role=?",
+                                   (guild, "remove", role))
+                await conn.execute("INSERT INTO roletriggers VALUES (?,?,?,?,?)",
+                                   (guild, role, channel, message, "remove"))
 
     async def _remove_roleadd_trigger(self, guild: int, role: int):
         del self.role_add_triggers[guild][role]
-        await self.db.execute("DELETE FROM roletriggers WHERE guild=? AND type=? AND role=?", (guild, "add", role))
-        await self.db.commit()
+        if not self.role_add_triggers[guild]:
+            del self.role_add_triggers[guild]
+        await self.bot.db.write("DELETE FROM roletriggers WHERE guild=? AND type=? AND role=?", (guild, "add", role))
 
     async def _remove_roleremove_trigger(self, guild: int, role: int):
         del self.role_remove_triggers[guild][role]
-        await self.db.execute("DELETE FROM roletriggers WHERE guild=? AND type=? AND role=?", (guild, "remove", role))
-        await self.db.commit()
+        if not self.role_remove_triggers[guild]:
+            del self.role_remove_triggers[guild]
+        await self.bot.db.write("DELETE FROM roletriggers WHERE guild=? AND type=? AND role=?",
+                                (guild, "remove", role))
 
 
 def setup(bot: aoi.AoiBot) -> None:
@@ -3,14 +3,12 @@ import io
 import random
 from typing import List, Optional, Union
 
-from PIL import Image, ImageDraw
-from PIL.ImageOps import grayscale, colorize
-
 import aoi
 import discord
 from cog_helpers.colors import ColorService
 from discord.ext import commands
 from discord.ext.commands import Greedy
+from libs import images
 from libs.converters import AoiColor, FuzzyAoiColor
 
 
@@ -26,7 +24,8 @@ class Colors(commands.Cog, ColorService):
     @commands.command(brief="Shows a color")
     async def color(self, ctx: aoi.AoiContext, *, color: AoiColor):
         await ctx.embed(title=str(color),
-                        image=self._color_buf(color))
+                        image=io.BytesIO(await self.bot.renderer.render(ctx.guild.id, images.swatch,
+                                                                        color.to_rgb())))
 
     @commands.command(brief="Shows a color palette",
                       usage="color1 color2 ...")
@@ -39,15 +38,7 @@ class Colors(commands.Cog, ColorService):
         clrs = valid_colors
         if not valid_colors:
             return
-        img = Image.new("RGB", (120 * len(clrs), 120))
-        img_draw = ImageDraw.Draw(img)
-        for n, color in enumerate(clrs):
-            img_draw.rectangle([
-                (n * 120, 0),
-                (n * 120 + 120, 120)
-            ], fill=color.to_rgb())
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
+        buf = io.BytesIO(await self.bot.renderer.render(ctx.guild.id, images.palette, [c.to_rgb() for c in clrs]))
         await ctx.embed(title="Color Palette",
                         image=buf,
                         description=" ".join(
@@ -75,21 +66,8 @@ class Colors(commands.Cog, ColorService):
             clrs.sort(key=lambda x: colorsys.rgb_to_hsv(*x.to_rgb())[0])
         if sort_by in ("brightness", "bright"):
             clrs.sort(key=lambda x: colorsys.rgb_to_hls(*x.to_rgb())[1])
-        rows = number_of_colors // 10 + 1
-        cols = 10 if rows > 1 else number_of_colors
-        if not number_of_colors % 10:
-            rows -= 1
-        img = Image.new("RGB", (120 * cols, rows * 120))
-        img_draw = ImageDraw.Draw(img)
-        for n, color in enumerate(clrs):
-            row = n // 10
-            col = n % 10
-            img_draw.rectangle([
-                (col * 120, row * 120),
-                (col * 120 + 120, row * 120 + 120)
-            ], fill=color.to_rgb())
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
+        buf = io.BytesIO(await self.bot.renderer.render(ctx.guild.id, images.palette,
+                                                        [c.to_rgb() for c in clrs], 10))
         await ctx.embed(title="Color Palette",
                         description=" ".join(map(str, clrs[:50])) +
                                     ("..." if len(clrs) >= 50 else ""),
@@ -108,7 +86,8 @@ class Colors(commands.Cog, ColorService):
     )
     async def gradient(self, ctx: aoi.AoiContext, color1: AoiColor, color2: AoiColor,
                        number_of_colors: Optional[int] = 4):
-        buf, colors = self._gradient_buf(color1, color2, number_of_colors, "rgb" not in ctx.flags)
+        colors = self._gradient_colors(color1, color2, number_of_colors, "rgb" not in ctx.flags)
+        buf = io.BytesIO(await self.bot.renderer.render(ctx.guild.id, images.gradient_strip, colors))
         await ctx.embed(title="Gradient",
                         description=" ".join("#" + "".join(hex(x)[2:].rjust(2, "0") for x in c) for c in colors),
                         image=buf)
@@ -130,30 +109,10 @@ class Colors(commands.Cog, ColorService):
         buf.seek(0)
         await ctx.trigger_typing()
         await attachment.save(buf)
-        im: Image = Image.open(buf).convert("RGB")
-        paletted: Image = im.convert("P", palette=Image.ADAPTIVE, colors=number_of_colors)
-        palette = paletted.getpalette()
-        color_counts = sorted(paletted.getcolors(), reverse=True)
-        colors = list()
-        for i in range(number_of_colors):
-            palette_index = color_counts[i][1]
-            dominant_color = palette[palette_index * 3:palette_index * 3 + 3]
-            colors.append(tuple(dominant_color))
-        colors.sort(key=lambda x: colorsys.rgb_to_hsv(*x)[0])
-        im = im.resize((60 * number_of_colors, int(60 * number_of_colors * im.size[1] / im.size[0])), Image.ANTIALIAS)
-
-        palette = Image.new('RGB', (60 * number_of_colors, 60 + im.size[1]))
-        palette.paste(im, (0, 60))
-        draw = ImageDraw.Draw(palette)
-
-        pos_x = 0
-        for color in colors:
-            draw.rectangle([pos_x, 0, pos_x + 60, 60], fill=color)
-            pos_x += 60
-
+        png, colors = await self.bot.renderer.render(ctx.guild.id, images.adaptive_palette, buf.getvalue(),
+                                                     number_of_colors)
         buf.close()
-        buf = io.BytesIO()
-        palette.save(buf, "PNG")
+        buf = io.BytesIO(png)
 
         await ctx.embed(
             description=" ".join("#" + "".join(hex(x)[2:] for x in c) for c in colors),
@@ -181,15 +140,12 @@ class Colors(commands.Cog, ColorService):
         buf.seek(0)
         await ctx.trigger_typing()
         await attachment.save(buf)
-        im: Image = Image.open(buf).convert("RGB")
-        gs = grayscale(im)
-        duo = colorize(gs, dark_color.to_rgb(), light_color.to_rgb(),
-                       midpoint_color.to_rgb() if midpoint_color else None,
-                       black_point, white_point, mid_point)
-        duo = Image.composite(duo, Image.new("RGB", duo.size, (0x00, 0x00, 0x00)), gs)
+        png = await self.bot.renderer.render(ctx.guild.id, images.duotone, buf.getvalue(),
+                                             dark_color.to_rgb(), light_color.to_rgb(),
+                                             midpoint_color.to_rgb() if midpoint_color else None,
+                                             black_point, white_point, mid_point)
         buf.close()
-        buf = io.BytesIO()
-        duo.save(buf, "PNG")
+        buf = io.BytesIO(png)
         await ctx.embed(
             image=buf
         )
@@ -208,31 +164,9 @@ class Colors(commands.Cog, ColorService):
         buf.seek(0)
         await ctx.trigger_typing()
         await attachment.save(buf)
-        im: Image = Image.open(buf).convert("RGB")
-        hist: List[int] = im.histogram()
-        max_rgb = max(hist)
-        hist = [int(x / max_rgb * 128) for x in hist]
-        rgb = hist[:256], hist[256:512], hist[512:]
-
-        rgb_images = [Image.new("L", (280, 152), 0) for _ in rgb]
-        rgb_draws = [ImageDraw.Draw(im) for im in rgb_images]
-
-        for i in range(256):
-            for j in range(3):
-                rgb_draws[j].rectangle((i + 12, 140, i + 12, 140 - rgb[j][i]), 0xff)
-
-        histogram = Image.merge("RGB", rgb_images)
-        hist_draw = ImageDraw.Draw(histogram)
-
-        hist_draw.line([12, 12, 12, 140, 268, 140], 0xffffff)
-        for r in range(12, 141, 16):
-            hist_draw.line([8, r, 12, r], 0xffffff)
-        for r in range(12, 269, 32):
-            hist_draw.line([r, 140, r, 144], 0xffffff)
-
+        png = await self.bot.renderer.render(ctx.guild.id, images.histogram, buf.getvalue())
         buf.close()
-        buf = io.BytesIO()
-        histogram.save(buf, "PNG")
+        buf = io.BytesIO(png)
         await ctx.embed(
             image=buf
         )
@@ -57,6 +57,8 @@ class ErrorHandler(commands.Cog):
                                  f"and you have {error.amount_has}.")
         elif isinstance(error, aoi.RoleHierarchyError):
             await ctx.send_error(_(str(error)))
+        elif isinstance(error, aoi.RenderQueueFull):
+            await ctx.send_error(str(error))
         elif isinstance(error, aoi.PermissionFailed):
             if (await self.bot.db.guild_setting(ctx.guild.id)).perm_errors:
                 await ctx.send_error(str(error))
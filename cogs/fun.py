@@ -3,28 +3,21 @@ from typing import Optional
 
 import PIL.Image
 import PIL.ImageDraw
-import PIL.ImageFont
 import PIL.ImageOps
-import aiohttp
 
 import aoi
 import discord
 from discord.ext import commands
 from games import TicTacToe
+from libs import images
 from libs.minesweeper import SpoilerMinesweeper, MinesweeperError
 
 
-def _font(size: int) -> PIL.ImageFont.ImageFont:
-    return PIL.ImageFont.truetype(
-        "assets/merged.ttf", size=size)
-
-
 class Fun(commands.Cog):
     def __init__(self, bot: aoi.AoiBot):
         self.bot = bot
         self.simp_fp = open("assets/simp-template.png", "rb")
         self.simp_img = PIL.Image.open(self.simp_fp)
-        self.font = _font(33)
         self.av_mask = PIL.Image.new("L", self.simp_img.size, 0)
         self.av_mask_draw = PIL.ImageDraw.Draw(self.av_mask)
         self.av_mask_draw.ellipse((430, 384, 430 + 83, 384 + 83), fill=255)
@@ -62,14 +55,8 @@ class Fun(commands.Cog):
 
         draw = PIL.ImageDraw.Draw(img_copy)
         # draw.rectangle(bounds, fill=(0, 200, 0))
-        name_size, name_height = draw.textsize(member.name, font=self.font)
-        sz = 33
-        font = self.font
-        while name_size > target_width and sz > 4:
-            sz -= 1
-            font = _font(sz)
-            name_size, name_height = draw.textsize(member.name, font=font)
-        draw.text((587 - name_size / 2, 162 - name_height / 2), text=member.name, font=font,
+        name_size, name_height, sz = images.fit(target_width, float("inf"), member.name, 33, w_pad=0, h_pad=0)
+        draw.text((587 - name_size / 2, 162 - name_height / 2), text=member.name, font=images.font(sz),
                   fill=(0, 0, 0))
 
         av_url = member.avatar_url_as(format="png", size=128)
@@ -96,23 +83,21 @@ class Fun(commands.Cog):
 
     @commands.command(brief="Sends a waifu pic")
     async def waifu(self, ctx: aoi.AoiContext):
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get("https://api.waifu.pics/sfw/waifu") as resp:
-                await ctx.embed(
-                    title="A waifu",
-                    image=(await resp.json())["url"]
-                )
+        resp = await self.bot.web.get("https://api.waifu.pics/sfw/waifu")
+        await ctx.embed(
+            title="A waifu",
+            image=resp.json()["url"]
+        )
 
     @commands.command(brief="Gets a random anime quote from the AnimeChan API")
     @commands.cooldown(1, 5, commands.BucketType.user) # cooldown so there isn't too many requests from the same user
     async def animequote(self, ctx: aoi.AoiContext):
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get("https://animechan.vercel.app/api/random") as resp:
-                if resp.status == 200:
-                    master_resp = (await resp.json())
-                    await ctx.embed(description=f"{master_resp['quote']}\n~ {master_resp['character']}", footer=f"Anime: {master_resp['anime']}")
-                else:
-                    await ctx.send_error(f"API returned code: `{resp.status}`. Try again later...")
+        resp = await self.bot.web.get("https://animechan.vercel.app/api/random")
+        if resp.status == 200:
+            master_resp = resp.json()
+            await ctx.embed(description=f"{master_resp['quote']}\n~ {master_resp['character']}", footer=f"Anime: {master_resp['anime']}")
+        else:
+            await ctx.send_error(f"API returned code: `{resp.status}`. Try again later...")
 
 def setup(bot: aoi.AoiBot) -> None:
     fun = Fun(bot)
@@ -4,7 +4,6 @@ import os
 from datetime import datetime
 from typing import Dict
 
-import aiohttp
 
 import aoi
 from discord.ext import commands, tasks
@@ -34,21 +33,19 @@ if os.getenv("PATREON_ID") and os.getenv("PATREON_SECRET"):  # noqa c901
         async def refresh_patreon_pledges(self):
             await self.bot.wait_until_ready()
             async with self.lock:
-                async with aiohttp.request(
-                        "GET",
-                        f"https://api.patreon.com/oauth2/api/campaigns/{self.bot.patreon_id}/pledges",
-                        headers={
-                            "Authorization": f"Bearer {self.bot.patreon_secret}"
-                        }
-                ) as req:
-                    json = await req.json()
-                    self.patrons = {}
-                    for user in json["data"]:
-                        try:
-                            self.patrons[user["relationships"]["patron"]["data"]["id"]] = user["attributes"][
-                                "amount_cents"]
-                        except KeyError:
-                            pass
+                json = (await self.bot.web.get(
+                    f"https://api.patreon.com/oauth2/api/campaigns/{self.bot.patreon_id}/pledges",
+                    headers={
+                        "Authorization": f"Bearer {self.bot.patreon_secret}"
+                    }
+                )).json()
+                self.patrons = {}
+                for user in json["data"]:
+                    try:
+                        self.patrons[user["relationships"]["patron"]["data"]["id"]] = user["attributes"][
+                            "amount_cents"]
+                    except KeyError:
+                        pass
                 self.patreon_resp = json
 
         @commands.cooldown(1, 30, commands.BucketType.user)
@@ -79,9 +76,7 @@ if os.getenv("PATREON_ID") and os.getenv("PATREON_SECRET"):  # noqa c901
                 dt = datetime.now()
                 dtf = f"{dt.month:0>2}{dt.year}"
                 if not row:
-                    await self.bot.db.conn.execute("insert into patreon values (?,?)",
-                                                   (int(user_id), dtf))
-                    await self.bot.db.conn.commit()
+                    await self.bot.db.write("insert into patreon values (?,?)", (int(user_id), dtf))
                     cur = int(self.patrons[patreon_user])
                     await self.bot.db.award_global_currency(ctx.author, cur)
                     return await ctx.send_ok(f"Awarded you ${cur}. Thanks for supporting! ♥")
@@ -89,8 +84,7 @@ if os.getenv("PATREON_ID") and os.getenv("PATREON_SECRET"):  # noqa c901
                     return await ctx.send_error("You've already claimed your reward this month.")
                 cur = int(self.patrons[patreon_user])
                 await self.bot.db.award_global_currency(ctx.author, cur)
-                await self.bot.db.conn.execute("update patreon set last_claim=? where user=?", (dtf, int(user_id)))
-                await self.bot.db.conn.commit()
+                await self.bot.db.write("update patreon set last_claim=? where user=?", (dtf, int(user_id)))
                 await ctx.send_ok(f"Awarded you ${cur}. Thanks for supporting! ♥")
 
 else:
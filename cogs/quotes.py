@@ -1,8 +1,15 @@
+import random
+
 import aoi
 import discord
 from discord.ext import commands
 
 
+def _fts_query(search_term: str) -> str:
+    # quote every word so fts5 operators and punctuation in the search are matched literally
+    return " ".join('"' + word.replace('"', '""') + '"' for word in search_term.split())
+
+
 # TODO help refactor
 class Quotes(commands.Cog):
     def __init__(self, bot: aoi.AoiBot):
@@ -14,21 +21,24 @@ class Quotes(commands.Cog):
 
     @commands.command(brief="Adds a quote", aliases=["aq", "adq"])
     async def addquote(self, ctx: aoi.AoiContext, trigger: str, *, response: str):
-        rowid = \
-            (await self.bot.db.conn.execute_insert("insert into quotes (user, guild, name, content) values (?,?,?,?)",
-                                                   (ctx.author.id, ctx.guild.id, trigger, response)))[0]
-        await self.bot.db.conn.commit()
+        async with self.bot.db.transaction() as conn:
+            rowid = (await conn.execute_insert("insert into quotes (user, guild, name, content) values (?,?,?,?)",
+                                               (ctx.author.id, ctx.guild.id, trigger, response)))[0]
         await ctx.send_ok(f"Added quote **#{rowid}** - **{discord.utils.escape_markdown(trigger)}** - "
                           f"**{discord.utils.escape_markdown(str(ctx.author))}**")
 
     @commands.command(brief="Recalls a quote", aliases=["q"])
     async def quote(self, ctx: aoi.AoiContext, trigger: str):
-        qid, content, user = (
-            await (
-                await self.bot.db.conn.execute("select id, content, user from quotes where guild=? and name=? "  # noqa
-                                               "order by RANDOM() limit 1",
-                                               (ctx.guild.id, trigger))
-            ).fetchone())
+        # counting and offsetting both walk the (guild, name) index instead of sorting every row randomly
+        count = list(await self.bot.db.read("select count(*) from quotes where guild=? and name=?",
+                                            (ctx.guild.id, trigger)))[0][0]
+        if not count:
+            return await ctx.send_error(f"No quotes found for **{discord.utils.escape_markdown(trigger)}**")
+        qid, content, user = list(
+            await self.bot.db.read("select id, content, user from quotes where guild=? and name=? "
+                                   "limit 1 offset ?",
+                                   (ctx.guild.id, trigger, random.randrange(count)))
+        )[0]
         msg = await ctx.send_json(content)
         await msg.edit(
             content=f"Quote **{qid}** by "
@@ -40,8 +50,8 @@ class Quotes(commands.Cog):
         member = member or ctx.author
         await ctx.paginate(
             (f"**#{row[0]}** - **{discord.utils.escape_markdown(row[1])}**"
-             for row in await self.bot.db.conn.execute_fetchall("select id, name from quotes where user=? and guild=?",
-                                                                (member.id, ctx.guild.id))),
+             for row in await self.bot.db.read("select id, name from quotes where user=? and guild=?",
+                                               (member.id, ctx.guild.id))),
             30,
             f"Quotes by {member}"
         )
@@ -53,15 +63,18 @@ class Quotes(commands.Cog):
                                                   (quote,))
                    ).fetchone())
         if user != ctx.author.id and not ctx.author.guild_permissions.administrator:
-            return ctx.send_error("You must be administrator to delete quotes that aren't yours.")
-        await self.bot.db.conn.execute("delete from quotes where id=?", (qid,))
-        await self.bot.db.conn.commit()
+            return await ctx.send_error("You must be administrator to delete quotes that aren't yours.")
+        await self.bot.db.write("delete from quotes where id=?", (qid,))
 
     @commands.command(brief="Search quotes", aliases=["searchq"])
     async def searchquotes(self, ctx: aoi.AoiContext, *, search_term: str):
-        rows = await self.bot.db.conn.execute_fetchall("select id, name from quotes where "
-                                                       "guild=? and content like ?",
-                                                       (ctx.guild.id, f"%{search_term}%"))
+        query = _fts_query(search_term)
+        if not query:
+            return await ctx.send_error("Nothing to search for")
+        rows = await self.bot.db.read("select quotes.id, quotes.name from quotes_fts "
+                                      "join quotes on quotes.id=quotes_fts.rowid "
+                                      "where quotes_fts match ? and quotes.guild=? order by rank limit 300",
+                                      (query, ctx.guild.id))
         await ctx.paginate(
             (f"**{row[0]}** - **{discord.utils.escape_markdown(row[1])}**"
              for row in rows),
@@ -69,7 +82,24 @@ class Quotes(commands.Cog):
             "Quote Search"
         )
 
-    # TODO add list all by tag
+    @commands.command(brief="Lists quote tags, or the quotes under a tag", aliases=["lqt"])
+    async def quotetags(self, ctx: aoi.AoiContext, tag: str = None):
+        if tag:
+            return await ctx.paginate(
+                (f"**#{row[0]}** - <@{row[1]}>"
+                 for row in await self.bot.db.read("select id, user from quotes where guild=? and name=?",
+                                                   (ctx.guild.id, tag))),
+                30,
+                f"Quotes tagged {tag}"
+            )
+        await ctx.paginate(
+            (f"**{discord.utils.escape_markdown(row[0])}** - {row[1]}"
+             for row in await self.bot.db.read("select name, count(*) from quotes where guild=? "
+                                               "group by name order by name",
+                                               (ctx.guild.id,))),
+            30,
+            "Quote Tags"
+        )
 
 
 def setup(bot: aoi.AoiBot) -> None:
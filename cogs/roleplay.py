@@ -2,7 +2,6 @@ import random
 from dataclasses import dataclass
 from typing import List, Dict, Tuple
 
-import aiohttp
 from ruamel.yaml import YAML
 
 import aoi
@@ -32,9 +31,8 @@ def setup(bot: aoi.AoiBot) -> None:
     bot.add_cog(fun)
 
     async def get_data(name) -> Tuple[RoleplayResponse, str]:
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get(f"https://api.waifu.pics/sfw/{name}") as resp:
-                return fun.roleplay_responses[name], (await resp.json())["url"]
+        resp = await fun.bot.web.get(f"https://api.waifu.pics/sfw/{name}")
+        return fun.roleplay_responses[name], resp.json()["url"]
 
     async def exec_multi_rp_command(self: Roleplay, ctx: aoi.AoiContext, user: discord.Member):
         resp, image = await get_data(ctx.command.name)
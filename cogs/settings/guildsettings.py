@@ -167,20 +167,17 @@ class GuildSettings(commands.Cog):
     @commands.command(brief="Set an alias for a command")
     async def alias(self, ctx: aoi.AoiContext, alias_from: str, *, alias_to: str = None):
         guild_id = ctx.guild.id
-        if guild_id not in self.bot.aliases:
+        if guild_id not in self.bot.aliases or alias_from not in self.bot.aliases[guild_id]:
             if not alias_to:
                 return await ctx.send_error(f"`{alias_from}` isn't aliased to anything")
-            await self.bot.db.conn.execute("insert into alias values (?,?,?)", (guild_id, alias_from, alias_to))
-            await self.bot.db.conn.commit()
-            self.bot.aliases[guild_id] = {alias_from: alias_to}
-        else:
-            await self.bot.db.conn.execute("delete from alias where guild=? and 'from'=?", (guild_id, alias_from))
+        async with self.bot.db.transaction() as conn:
+            await conn.execute('delete from alias where guild=? and "from"=?', (guild_id, alias_from))
             if alias_to:
-                await self.bot.db.conn.execute("insert into alias values (?,?,?)", (guild_id, alias_from, alias_to))
-                self.bot.aliases[guild_id][alias_from] = alias_to
-            else:
-                del self.bot.aliases[guild_id][alias_from]
-            await self.bot.db.conn.commit()
+                await conn.execute("insert into alias values (?,?,?)", (guild_id, alias_from, alias_to))
+        if alias_to:
+            self.bot.aliases.setdefault(guild_id, aoi.AliasTable()).set(alias_from, alias_to)
+        else:
+            self.bot.aliases[guild_id].remove(alias_from)
         await ctx.send_ok(f"`{alias_from}` aliased to `{alias_to}`" if alias_to else
                           f"`{alias_from}` no longer aliased.")
 
@@ -29,9 +29,8 @@ class GlobalShop(commands.Cog):
             f"Add `{title}` for ${amount:,}?",
             f"`{title}` added for ${amount:,}.",
             f"`{title}` not added.",
-            self.bot.db.conn.execute("insert into title_shop (title, cost) values (?,?)", (title, amount))
+            self.bot.db.write("insert into title_shop (title, cost) values (?,?)", (title, amount))
         )
-        await self.bot.db.conn.commit()
 
     @commands.command(
         brief="Lists the available titles"
@@ -40,7 +39,7 @@ class GlobalShop(commands.Cog):
         await ctx.paginate(
             [f"**{r[0]} - ${r[2]:,}**\n{r[1]}\n"
              for r in
-             await (await self.bot.db.conn.execute("select * from title_shop")).fetchall()],
+             await self.bot.db.read("select * from title_shop")],
             title="Title Shop",
             n=10,
             fmt=f"%s\n\nDo `{ctx.prefix}buytitle n` to buy a title."
@@ -62,9 +61,8 @@ class GlobalShop(commands.Cog):
         if amt > await self.bot.db.get_global_currency(ctx.author):
             return await ctx.send_error("That title costs more than you have")
 
-        for r in self.bot.db.owned_titles[ctx.author.id]:
-            if title.lower() == r.lower():
-                return await ctx.send_error("You already own that title")
+        if (await self.bot.db.get_user_global(ctx.author)).owns_title(title):
+            return await ctx.send_error("You already own that title")
 
         _ = await ctx.confirm(
             f"Buy `{title}` for ${amt:,}?",
@@ -81,10 +79,11 @@ class GlobalShop(commands.Cog):
         brief="Lists your titles"
     )
     async def mytitles(self, ctx: aoi.AoiContext):
+        user = await self.bot.db.get_user_global(ctx.author)
         await ctx.paginate(
             [f"**{n}** - {v}\n"
              for n, v in
-             enumerate(self.bot.db.owned_titles[ctx.author.id])],
+             enumerate(user.owned_titles)],
             title="Owned titles",
             n=10,
             fmt=f"%s\n\nDo `{ctx.prefix}equiptitle n` to set your profile title."
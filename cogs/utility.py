@@ -1,10 +1,10 @@
+import asyncio
 import io
 from datetime import datetime
 from functools import reduce
 from io import BytesIO
 from typing import Optional, Dict, Any, Tuple
 
-import aiohttp
 import sympy
 from PIL import Image
 from PIL import ImageOps
@@ -27,12 +27,13 @@ class Utility(commands.Cog):
         self.sat_cache: Dict[str, Tuple[datetime, Any]] = {}
         self.apod_cache: Dict[str, Tuple[str, str, str, str]] = {}
         self.gmap: Optional[gmaps.GeoLocation] = None
-        self.wx = wx.WeatherGov(self.bot.weather_gov)
 
     async def _init(self):
         self.bot.logger.info("util:Waiting for bot")
         await self.bot.wait_until_ready()
         self.gmap = self.bot.gmap
+        # the bot's http client and api keys are only set up once it starts
+        self.wx = wx.WeatherGov(self.bot.weather_gov, self.bot.web)
         self.bot.logger.info("util:Ready!")
 
     @property
@@ -59,9 +60,7 @@ class Utility(commands.Cog):
               f"&date={dt.strftime('%Y-%m-%d')}"
         buf = io.BytesIO()
         async with ctx.typing():
-            async with aiohttp.ClientSession() as sess:
-                async with sess.get(url) as resp:
-                    buf.write(await resp.content.read())
+            buf.write((await self.bot.web.get(url)).body)
         await ctx.embed(
             title=f"{lat} {long} {dt.strftime('%Y-%m-%d')}",
             image=buf
@@ -80,10 +79,8 @@ class Utility(commands.Cog):
         dt = date.strftime('%Y-%m-%d')
         if dt not in self.apod_cache:
             async with ctx.typing():
-                async with aiohttp.ClientSession() as sess:
-                    async with sess.get(f"https://api.nasa.gov/planetary/apod?api_key={self.bot.nasa}&"
-                                        f"date={dt}") as resp:
-                        js = await resp.json()
+                js = (await self.bot.web.get(f"https://api.nasa.gov/planetary/apod?api_key={self.bot.nasa}&"
+                                             f"date={dt}")).json()
             if js.get("code", None) in [404, 400, 403, 401]:
                 self.apod_cache[dt] = (str(js["code"]), "404", "404",
                                        js["msg"])
@@ -145,13 +142,8 @@ class Utility(commands.Cog):
         ]
         imgs = []
         async with ctx.typing():
-            async with aiohttp.ClientSession() as sess:
-                for url in urls:
-                    async with sess.get(url) as resp:
-                        buf = io.BytesIO()
-                        buf.write(await resp.content.read())
-                        buf.seek(0)
-                        imgs.append(Image.open(buf, "png").convert("RGBA"))
+            for resp in await asyncio.gather(*(self.bot.web.get(url) for url in urls)):
+                imgs.append(Image.open(io.BytesIO(resp.body), "png").convert("RGBA"))
         composite = reduce(lambda i1, i2: Image.alpha_composite(i1, i2), imgs)
         self.sat_cache[radar] = (datetime.now(), composite)
         buf = io.BytesIO()
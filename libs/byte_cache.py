@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class ByteCache:
+    """
+    Two-tier LRU cache of bytes. Entries live in memory up to `memory_limit` bytes and in
+    `directory` up to `disk_limit` bytes, so they survive restarts. Keys can be any string,
+    files are named by the key's hash.
+    """
+
+    def __init__(self, directory: str, memory_limit: int, disk_limit: int):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_size = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        # oldest first, so eviction picks up where the last run left off
+        for entry in sorted(os.scandir(directory), key=lambda e: e.stat().st_mtime):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                self._disk[entry.name] = entry.stat().st_size
+                self._disk_size += entry.stat().st_size
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        name = self._name(key)
+        if name in self._memory:
+            self._memory.move_to_end(name)
+            self.memory_hits += 1
+            return self._memory[name]
+        if name in self._disk:
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(None, self._read, name)
+            except OSError:
+                self._disk_size -= self._disk.pop(name, 0)
+                self.misses += 1
+                return None
+            # it may have been evicted while it was being read
+            if name in self._disk:
+                self._disk.move_to_end(name)
+            self.disk_hits += 1
+            self._remember(name, data)
+            return data
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, data: bytes):
+        name = self._name(key)
+        self._remember(name, data)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, name, data)
+        if name in self._disk:
+            self._disk_size -= self._disk.pop(name)
+        self._disk[name] = len(data)
+        self._disk_size += len(data)
+        evicted = []
+        while self._disk_size > self.disk_limit and len(self._disk) > 1:
+            old, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            evicted.append(old)
+        if evicted:
+            await loop.run_in_executor(None, self._remove, evicted)
+
+    # file access runs in the default executor so the event loop never waits on the disk
+
+    def _read(self, name: str) -> bytes:
+        with open(os.path.join(self.directory, name), "rb") as fp:
+            return fp.read()
+
+    def _write(self, name: str, data: bytes):
+        # a temp file per write, so two puts of the same key can't interleave their bytes
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as fp:
+            fp.write(data)
+        os.replace(fp.name, os.path.join(self.directory, name))
+
+    def _remove(self, names: List[str]):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _remember(self, name: str, data: bytes):
+        if name in self._memory:
+            self._memory_size -= len(self._memory.pop(name))
+        self._memory[name] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_limit and len(self._memory) > 1:
+            self._memory_size -= len(self._memory.popitem(last=False)[1])
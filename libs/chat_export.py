@@ -0,0 +1,174 @@
+import datetime
+import html
+import json
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, IO, List, Set
+
+import discord
+
+# how much of a part is kept in memory before it goes to disk
+SPOOL_SIZE = 1024 * 1024
+
+
+def message_record(message: discord.Message) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "author": str(message.author),
+        "author_id": message.author.id,
+        "bot": message.author.bot,
+        "created_at": message.created_at.replace(tzinfo=datetime.timezone.utc).timestamp(),
+        "content": message.content,
+        "attachments": [a.url for a in message.attachments]
+    }
+
+
+async def newest_to_oldest(history: AsyncIterator[discord.Message],
+                           page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Replays newest first history oldest first. Each page is written to a temp file in reverse,
+    then the pages are read back last to first, so only one page is ever held in memory.
+    """
+    with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as spool:
+        pages: List[int] = []
+        page: List[str] = []
+        async for message in history:
+            page.append(json.dumps(message_record(message)))
+            if len(page) == page_size:
+                pages.append(spool.tell())
+                spool.write(("\n".join(reversed(page)) + "\n").encode())
+                page.clear()
+        if page:
+            pages.append(spool.tell())
+            spool.write(("\n".join(reversed(page)) + "\n").encode())
+        ends = pages[1:] + [spool.tell()]
+        for start, end in reversed(list(zip(pages, ends))):
+            spool.seek(start)
+            for line in spool.read(end - start).decode().splitlines():
+                yield json.loads(line)
+
+
+class _TextFormat:
+    extension = "txt"
+
+    def __init__(self, header: str):
+        self.header = header
+        self.seen_authors: Set[int] = set()
+        self.seen_dates: Set[str] = set()
+
+    def start(self, part: int) -> str:
+        # each part reads on its own, so it gets its own date banners and author ids
+        self.seen_authors.clear()
+        self.seen_dates.clear()
+        return f"{self.header} Part {part}.\n\n"
+
+    def format(self, record: Dict[str, Any]) -> str:
+        created_at = datetime.datetime.utcfromtimestamp(record["created_at"])
+        out = ""
+        date = created_at.strftime("%x")
+        if date not in self.seen_dates:
+            self.seen_dates.add(date)
+            out += "=" * 10 + date + "=" * 10
+        out += f"\n[{created_at.strftime('%X')}] "
+        if record["author_id"] not in self.seen_authors:
+            self.seen_authors.add(record["author_id"])
+            out += f"[{record['author']} | {record['author_id']}] "
+        else:
+            out += f"[{record['author']}]"
+        if record["bot"]:
+            out += " [BOT]"
+        lines = (" " + record["content"]).splitlines() + record["attachments"]
+        out += f":{lines[0]}\n"
+        out += "".join(f"      {line}\n" for line in lines[1:])
+        return out
+
+    def end(self) -> str:
+        return ""
+
+
+class _JsonLinesFormat(_TextFormat):
+    extension = "jsonl"
+
+    def start(self, part: int) -> str:
+        return ""
+
+    def format(self, record: Dict[str, Any]) -> str:
+        return json.dumps(record) + "\n"
+
+
+class _HtmlFormat(_TextFormat):
+    extension = "html"
+
+    def start(self, part: int) -> str:
+        return f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(self.header)}</title>" \
+               f"<style>body{{font-family:sans-serif}} .m{{margin:4px 0}} .a{{font-weight:bold}} " \
+               f".t{{color:#888;font-size:small}} .c{{white-space:pre-wrap}}</style></head><body>\n" \
+               f"<h3>{html.escape(self.header)} Part {part}.</h3>\n"
+
+    def format(self, record: Dict[str, Any]) -> str:
+        created_at = datetime.datetime.utcfromtimestamp(record["created_at"])
+        attachments = "".join(f"<br><a href=\"{html.escape(url)}\">{html.escape(url)}</a>"
+                              for url in record["attachments"])
+        return f"<div class=\"m\" id=\"{record['id']}\"><span class=\"t\">{created_at.strftime('%x %X')}</span> " \
+               f"<span class=\"a\" title=\"{record['author_id']}\">{html.escape(record['author'])}" \
+               f"{' [BOT]' if record['bot'] else ''}</span> " \
+               f"<span class=\"c\">{html.escape(record['content'])}</span>{attachments}</div>\n"
+
+    def end(self) -> str:
+        return "</body></html>\n"
+
+
+FORMATS = {"txt": _TextFormat, "jsonl": _JsonLinesFormat, "html": _HtmlFormat}
+
+
+class ChatExport:
+    """
+    Formats records into spooled temp files, starting a new part before one would go over `part_size`
+    bytes. Finished parts are handed to `send` and closed, so at most one part exists at a time.
+    """
+
+    def __init__(self, fmt: str, header: str, part_size: int, send: Callable[[IO[bytes], str], Awaitable[Any]]):
+        self.format = FORMATS[fmt](header)
+        self.part_size = part_size
+        self.send = send
+        self.count = 0
+        self.parts = 0
+        self.first = None
+        self.last = None
+        self._part = None
+        self._size = 0
+        self._part_count = 0
+        self._end = self.format.end().encode()
+
+    async def write(self, record: Dict[str, Any]):
+        if not self._part:
+            self._start_part()
+        data = self.format.format(record).encode()
+        if self._part_count and self._size + len(data) + len(self._end) > self.part_size:
+            await self._finish_part()
+            self._start_part()
+            # formatted again now that the new part has reset the format's state
+            data = self.format.format(record).encode()
+        self._size += self._part.write(data)
+        self._part_count += 1
+        self.count += 1
+        self.first = self.first or record["created_at"]
+        self.last = record["created_at"]
+
+    async def close(self):
+        if self._part:
+            await self._finish_part()
+
+    def _start_part(self):
+        self.parts += 1
+        self._part = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+        self._size = self._part.write(self.format.start(self.parts).encode())
+        self._part_count = 0
+
+    async def _finish_part(self):
+        part, self._part = self._part, None
+        try:
+            part.write(self._end)
+            part.seek(0)
+            await self.send(part, f"chat-save-{self.parts}.{self.format.extension}")
+        finally:
+            part.close()
@@ -0,0 +1,76 @@
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class ExpiryScheduler(Generic[K]):
+    """
+    Calls back once for each key when its deadline (a unix timestamp) passes. Deadlines are kept in a
+    min-heap and a single task sleeps until the earliest one, so nothing is polled. Rescheduling or
+    cancelling a key leaves its old heap entry behind, it's skipped when popped and the heap is rebuilt
+    once stale entries outnumber live ones.
+    """
+
+    def __init__(self, callback: Callable[[K], Awaitable[None]]):
+        self._callback = callback
+        self._heap: List[Tuple[float, int, K]] = []
+        self._deadlines: Dict[K, float] = {}
+        # ties are broken on insertion order so keys never have to be comparable
+        self._counter = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._deadlines
+
+    def deadline(self, key: K) -> Optional[float]:
+        return self._deadlines.get(key)
+
+    def schedule(self, key: K, deadline: float):
+        self._deadlines[key] = deadline
+        self._counter += 1
+        heapq.heappush(self._heap, (deadline, self._counter, key))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._compact()
+        if self._wakeup and self._heap[0][2] == key:
+            # the runner is sleeping towards a later deadline
+            self._wakeup.set()
+
+    def cancel(self, key: K):
+        self._deadlines.pop(key, None)
+
+    def start(self):
+        if not self._task:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]]
+        heapq.heapify(self._heap)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, key = heapq.heappop(self._heap)
+                if self._deadlines.get(key) != deadline:
+                    continue
+                del self._deadlines[key]
+                asyncio.ensure_future(self._callback(key))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),
+                                       self._heap[0][0] - time.time() if self._heap else None)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpResponse:
+    def __init__(self, resp: aiohttp.ClientResponse, body: bytes):
+        self.url = str(resp.url)
+        self.status = resp.status
+        self.headers = resp.headers
+        self.body = body
+        self._request_info = resp.request_info
+        self._history = resp.history
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise aiohttp.ClientResponseError(self._request_info, self._history, status=self.status,
+                                              message=self.text()[:200], headers=self.headers)
+
+
+class HostStats:
+    __slots__ = ("requests", "errors", "retries", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.requests if self.requests else 0
+
+
+class HttpClient:
+    """
+    One pooled aiohttp session shared by everything that talks to the web. Connections are kept
+    alive and limited per host, DNS lookups are cached, and idempotent requests that fail with a
+    connection error, a timeout, or a 429/5xx are retried with exponential backoff.
+    Bodies are read before returning so the connection goes straight back to the pool.
+    """
+
+    def __init__(self, *, limit: int = 100, limit_per_host: int = 10, dns_ttl: int = 300,
+                 keepalive: float = 30, timeout: float = 15, retries: int = 2, backoff: float = 0.5):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.stats: Dict[str, HostStats] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # created on first use so it binds to the running loop
+        if not self._session or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit,
+                                               limit_per_host=self.limit_per_host,
+                                               ttl_dns_cache=self.dns_ttl,
+                                               keepalive_timeout=self.keepalive),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def request(self, method: str, url: str, *, retries: Optional[int] = None, **kwargs) -> HttpResponse:
+        host = urlsplit(url).hostname or ""
+        stats = self.stats.setdefault(host, HostStats())
+        if retries is None:
+            retries = self.retries if method in ("GET", "HEAD") else 0
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            delay = self.backoff * 2 ** attempt
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    response = HttpResponse(resp, await resp.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                self._record(stats, start, True)
+                if attempt >= retries:
+                    raise
+            else:
+                self._record(stats, start, not response.ok)
+                if response.status not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                if response.status == 429:
+                    try:
+                        delay = max(delay, float(response.headers.get("Retry-After", 0)))
+                    except ValueError:
+                        pass
+            attempt += 1
+            stats.retries += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("POST", url, **kwargs)
+
+    @staticmethod
+    def _record(stats: HostStats, start: float, error: bool):
+        elapsed = (time.perf_counter() - start) * 1000
+        stats.requests += 1
+        stats.errors += error
+        stats.total_ms += elapsed
+        stats.max_ms = max(stats.max_ms, elapsed)
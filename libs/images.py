@@ -0,0 +1,285 @@
+"""
+Card and color image rendering. Everything here is a plain function of its arguments
+that returns PNG bytes, so it can be run in the bot's render process pool.
+"""
+import colorsys
+import functools
+import io
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+from PIL.ImageOps import colorize, grayscale
+
+from libs import leveling
+
+RGB = Tuple[int, int, int]
+
+
+@functools.lru_cache(maxsize=None)
+def font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype("assets/merged.ttf", size=size)
+
+
+# only used to measure text, never drawn on
+_measure = ImageDraw.Draw(Image.new("L", (1, 1)))
+
+
+@functools.lru_cache(maxsize=4096)
+def text_size(text: str, size: int) -> Tuple[int, int]:
+    return _measure.textsize(text, font=font(size))
+
+
+def _png(img: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="png")
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=None)
+def _template(path: str) -> Image.Image:
+    # cached per worker process, callers must copy before drawing
+    with open(path, "rb") as fp:
+        img = Image.open(fp)
+        img.load()
+    return img
+
+
+def _center(x, y, x2, y2, w, h):
+    return (x + x2) / 2 - w / 2, (y + y2) / 2 - h / 2
+
+
+@functools.lru_cache(maxsize=4096)
+def fit(w, h, text, size, *, w_pad=5, h_pad=5) -> Tuple[int, int, int]:
+    """Returns the size of the text and the largest font size up to `size` (but at least 4) that fits in w x h"""
+    def fits(sz):
+        _w, _h = text_size(text, sz)
+        return _w <= w - w_pad * 2 and _h <= h - h_pad * 2
+
+    low, high = 4, size
+    if fits(high):
+        low = high
+    while low < high:
+        mid = (low + high + 1) // 2
+        if fits(mid):
+            low = mid
+        else:
+            high = mid - 1
+    return (*text_size(text, low), low)
+
+
+def _center_and_fit(x, y, x2, y2, text, size, *, w_pad=5, h_pad=5):
+    w, h, sz = fit(abs(x - x2), abs(y - y2), text, size, w_pad=w_pad, h_pad=h_pad)
+    x, y = _center(x, y, x2, y2, w, h)
+    return x, y, w, h, sz
+
+
+def crop_center(pil_img, crop_width, crop_height):
+    img_width, img_height = pil_img.size
+    return pil_img.crop(((img_width - crop_width) // 2,
+                         (img_height - crop_height) // 2,
+                         (img_width + crop_width) // 2,
+                         (img_height + crop_height) // 2))
+
+
+def crop_max_square(pil_img):
+    return crop_center(pil_img, min(pil_img.size), min(pil_img.size))
+
+
+def cur_string(cur: int):
+    neg = abs(cur) != cur
+    cur = abs(cur)
+    if cur < 1000:
+        return f"{'-' if neg else ''}${cur}"
+    elif cur < 100000:
+        return f"{'-' if neg else ''}${round(cur / 100) / 10}K"
+    elif cur < 1000000:
+        return f"{'-' if neg else ''}${round(cur / 1000)}K"
+    elif cur < 1000000000:
+        return f"{'-' if neg else ''}${round(cur / 1000000)}M"
+    elif cur < 1000000000000:
+        return f"{'-' if neg else ''}${round(cur / 1000000000)}B"
+
+
+# region # Cards
+
+def square_background(background: bytes) -> bytes:
+    return _png(crop_max_square(Image.open(io.BytesIO(background))).resize((512, 512)).convert("RGBA"))
+
+
+def square_avatar(avatar: bytes) -> bytes:
+    return _png(Image.open(io.BytesIO(avatar)).resize((128, 128)).convert("RGBA"))
+
+
+def profile_card(background: bytes, avatar: bytes, name: str, title: str,
+                 global_xp: int, global_rank: int, server_xp: int, server_rank: int,
+                 global_currency: int, guild_currency: int) -> bytes:
+    # background and avatar come from square_background and square_avatar
+    card_bg = Image.open(io.BytesIO(background)).convert("RGBA")
+    global_level, global_rem = leveling.level(global_xp)
+    server_level, server_rem = leveling.level(server_xp)
+    img = _template("assets/profile.png").copy()
+    avatar_img = Image.open(io.BytesIO(avatar))
+    img.paste(avatar_img, (32, 32))
+
+    # create overlays for the xp bars
+    global_width = 330.66672 * global_rem / leveling.xp_per_level(global_level + 1)
+    global_xp_poly = (133.33328, 192), \
+                     (133.33328 + global_width, 192), \
+                     (117.33328 + global_width, 240), \
+                     (117.33328, 240)
+
+    server_width = 330.66672 * server_rem / leveling.xp_per_level(server_level + 1)
+    server_xp_poly = (112, 256), \
+                     (112 + server_width, 256), \
+                     (96 + server_width, 304), \
+                     (96, 304)
+    overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
+    ImageDraw.Draw(overlay).polygon(global_xp_poly, fill=(0, 0, 0) + (120,))
+    ImageDraw.Draw(overlay).polygon(server_xp_poly, fill=(0, 0, 0) + (120,))
+    img = Image.alpha_composite(img.convert("RGBA"), overlay)
+    img_draw = ImageDraw.Draw(img)
+
+    # draw text
+    for box, text in (
+            ((454, 162, 190, 111), title),
+            ((217.6, 80, 480, 32), name),
+            ((115.8, 191, 480, 242), f"Level {global_level} - # {global_rank}"),
+            ((95, 255, 459.2, 306), f"Level {server_level} - # {server_rank}"),
+            ((115.8, 319, 257.5, 370), cur_string(global_currency)),
+            ((94.5, 383, 236.2, 434), cur_string(guild_currency))
+    ):
+        x, y, _, _, sz = _center_and_fit(*box, text, 32, w_pad=24)
+        img_draw.text((x, y), text, font=font(sz))
+    return _png(Image.alpha_composite(card_bg, img))
+
+
+def xp_card(template: str, color: RGB, xp: int, rank: int, name: str) -> bytes:
+    level, rem = leveling.level(xp)
+    required = leveling.xp_per_level(level + 1)
+    img = _template(template).convert("RGBA")
+    poly_width = 243 * rem / required
+    poly = [(119, 11), (112, 59), (112 + poly_width, 59), (119 + poly_width, 11)]
+    overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
+    ImageDraw.Draw(overlay).polygon(poly, fill=color + (80,))
+    img = Image.alpha_composite(img, overlay)
+    draw = ImageDraw.Draw(img)
+    draw.text((8, 75), text=f"#{rank}", font=font(24), fill=color)
+    draw.text((21, 13), text=str(level), font=font(42), fill=color)
+    name_size, name_height, sz = fit(330, float("inf"), name, 30, w_pad=0, h_pad=0)
+    # y 15 x 190 64
+    draw.text((190 - name_size / 2, 214 - name_height / 2), text=name, font=font(sz), fill=color)
+    rem_level_size = text_size(f"{rem}/{required}", 30)[0]
+    # y 10 x 111 364
+    draw.text((230 - rem_level_size / 2, 19), text=f"{rem}/{required}", font=font(30), fill=color)
+    return _png(img)
+
+
+def wallet_card(name: str, global_currency: int, guild_currency: int) -> bytes:
+    img = _template("assets/wallet.png").copy()
+    draw = ImageDraw.Draw(img)
+    for i, text in enumerate((name, f"${global_currency:,}", f"${guild_currency:,}")):
+        x, y, _, _, sz = _center_and_fit(
+            [14, 78, 78][i],
+            [66, 146, 226][i] - 52,
+            498,
+            [66, 146, 226][i],
+            text,
+            40
+        )
+        draw.text((x, y), text, fill=(0, 0, 0), font=font(sz))
+    return _png(img)
+
+
+# endregion
+
+# region # Colors
+
+def swatch(color: RGB) -> bytes:
+    return _png(Image.new("RGB", (120, 120), color))
+
+
+def palette(colors: List[RGB], per_row: int = 0) -> bytes:
+    per_row = per_row or len(colors)
+    rows = (len(colors) + per_row - 1) // per_row
+    img = Image.new("RGB", (120 * min(per_row, len(colors)), rows * 120))
+    img_draw = ImageDraw.Draw(img)
+    for n, color in enumerate(colors):
+        row = n // per_row
+        col = n % per_row
+        img_draw.rectangle([
+            (col * 120, row * 120),
+            (col * 120 + 120, row * 120 + 120)
+        ], fill=color)
+    return _png(img)
+
+
+def gradient_strip(colors: List[RGB]) -> bytes:
+    num = len(colors)
+    img = Image.new("RGB", (240, 48))
+    img_draw = ImageDraw.Draw(img)
+    for n, clr in enumerate(colors):
+        img_draw.rectangle([
+            (n * 240 / num, 0),
+            ((n + 1) * 240 / num, 48)
+        ], fill=tuple(map(int, clr)))
+    return _png(img)
+
+
+def adaptive_palette(image: bytes, number_of_colors: int) -> Tuple[bytes, List[RGB]]:
+    im = Image.open(io.BytesIO(image)).convert("RGB")
+    paletted = im.convert("P", palette=Image.ADAPTIVE, colors=number_of_colors)
+    colors_palette = paletted.getpalette()
+    color_counts = sorted(paletted.getcolors(), reverse=True)
+    colors = list()
+    for i in range(number_of_colors):
+        palette_index = color_counts[i][1]
+        dominant_color = colors_palette[palette_index * 3:palette_index * 3 + 3]
+        colors.append(tuple(dominant_color))
+    colors.sort(key=lambda x: colorsys.rgb_to_hsv(*x)[0])
+    im = im.resize((60 * number_of_colors, int(60 * number_of_colors * im.size[1] / im.size[0])), Image.ANTIALIAS)
+
+    result = Image.new('RGB', (60 * number_of_colors, 60 + im.size[1]))
+    result.paste(im, (0, 60))
+    draw = ImageDraw.Draw(result)
+
+    pos_x = 0
+    for color in colors:
+        draw.rectangle([pos_x, 0, pos_x + 60, 60], fill=color)
+        pos_x += 60
+    return _png(result), colors
+
+
+def duotone(image: bytes, dark: RGB, light: RGB, mid: Optional[RGB],
+            black_point: int, white_point: int, mid_point: int) -> bytes:
+    im = Image.open(io.BytesIO(image)).convert("RGB")
+    gs = grayscale(im)
+    duo = colorize(gs, dark, light, mid, black_point, white_point, mid_point)
+    duo = Image.composite(duo, Image.new("RGB", duo.size, (0x00, 0x00, 0x00)), gs)
+    return _png(duo)
+
+
+def histogram(image: bytes) -> bytes:
+    im = Image.open(io.BytesIO(image)).convert("RGB")
+    hist: List[int] = im.histogram()
+    max_rgb = max(hist)
+    hist = [int(x / max_rgb * 128) for x in hist]
+    rgb = hist[:256], hist[256:512], hist[512:]
+
+    rgb_images = [Image.new("L", (280, 152), 0) for _ in rgb]
+    rgb_draws = [ImageDraw.Draw(im) for im in rgb_images]
+
+    for i in range(256):
+        for j in range(3):
+            rgb_draws[j].rectangle((i + 12, 140, i + 12, 140 - rgb[j][i]), 0xff)
+
+    result = Image.merge("RGB", rgb_images)
+    hist_draw = ImageDraw.Draw(result)
+
+    hist_draw.line([12, 12, 12, 140, 268, 140], 0xffffff)
+    for r in range(12, 141, 16):
+        hist_draw.line([8, r, 12, r], 0xffffff)
+    for r in range(12, 269, 32):
+        hist_draw.line([r, 140, r, 144], 0xffffff)
+    return _png(result)
+
+# endregion
@@ -0,0 +1,25 @@
+import math
+from typing import Iterable, List, Tuple
+
+# level n -> n + 1 takes 8n + 40 xp, so reaching level n takes 4n^2 + 36n in total
+
+
+def xp_per_level(lvl: int) -> int:
+    return 8 * lvl + 32 if lvl > 0 else 0
+
+
+def total_xp(lvl: int) -> int:
+    return 4 * lvl * lvl + 36 * lvl
+
+
+def level(xp: int) -> Tuple[int, int]:
+    """Returns the level for an amount of xp and the xp gained towards the next one"""
+    return levels((xp,))[0]
+
+
+def levels(xps: Iterable[int]) -> List[Tuple[int, int]]:
+    """level() for a whole leaderboard page at once"""
+    # 4n^2 + 36n <= xp  <=>  (2n + 9)^2 <= xp + 81, so the floored root gives the level exactly
+    xps = [max(xp, 0) for xp in xps]
+    lvls = [(math.isqrt(xp + 81) - 9) // 2 for xp in xps]
+    return [(lvl, xp - 4 * lvl * lvl - 36 * lvl) for xp, lvl in zip(xps, lvls)]
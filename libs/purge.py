@@ -0,0 +1,99 @@
+import asyncio
+import datetime
+import time
+from typing import Callable, List, Optional
+
+import discord
+
+# discord won't bulk delete anything older than 14 days, the slack covers messages that age while queued
+BULK_DELETE_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+BULK_DELETE_SIZE = 100
+
+
+class Purge:
+    """
+    Deletes up to `limit` messages passing `check` from a channel. A producer pages through history while
+    a consumer deletes whatever has been found so far, so fetching and deleting overlap. Recent messages
+    are bulk deleted, ones too old for that are deleted one at a time. discord.py already holds each
+    request until its rate limit allows it, so neither side sleeps on its own.
+    """
+
+    def __init__(self, http: discord.http.HTTPClient, channel: discord.TextChannel, limit: int,
+                 check: Callable[[discord.Message], bool], *, before: Optional[discord.Message] = None,
+                 scan_limit: Optional[int] = None, reason: Optional[str] = None):
+        self.http = http
+        self.channel = channel
+        self.limit = limit
+        self.check = check
+        self.before = before
+        self.scan_limit = scan_limit
+        self.reason = reason
+        self.scanned = 0
+        self.found = 0
+        self.deleted = 0
+        self.deleted_old = 0
+        # bounded so a fast history doesn't run far ahead of the deletes
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=BULK_DELETE_SIZE * 2)
+
+    @property
+    def scan_limited(self) -> bool:
+        # history stopped at scan_limit before enough matching messages were found
+        return self.scan_limit is not None and self.scanned >= self.scan_limit and self.found < self.limit
+
+    def status(self) -> str:
+        return f"{self.deleted}/{self.limit} deleted, {self.scanned} scanned" + \
+               (f", {self.deleted_old} one by one" if self.deleted_old else "")
+
+    async def run(self):
+        tasks = [asyncio.ensure_future(self._produce()), asyncio.ensure_future(self._consume())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # wait for both to actually stop, so nothing is still deleting once this returns
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for task in done:
+            task.result()
+
+    async def _produce(self):
+        async for message in self.channel.history(limit=self.scan_limit, before=self.before):
+            self.scanned += 1
+            if not self.check(message):
+                continue
+            await self._queue.put(message)
+            self.found += 1
+            if self.found >= self.limit:
+                break
+        await self._queue.put(None)
+
+    async def _consume(self):
+        finished = False
+        while not finished:
+            batch: List[Optional[discord.Message]] = [await self._queue.get()]
+            while len(batch) < BULK_DELETE_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+            # the smallest id discord will still bulk delete
+            cutoff = int((time.time() - BULK_DELETE_AGE.total_seconds()) * 1000 - discord.utils.DISCORD_EPOCH) << 22
+            await self._delete_bulk([m for m in batch if m.id > cutoff])
+            for message in batch:
+                if message.id <= cutoff and await self._delete_one(message):
+                    self.deleted_old += 1
+
+    async def _delete_bulk(self, messages: List[discord.Message]):
+        if len(messages) == 1:
+            await self._delete_one(messages[0])
+        elif messages:
+            await self.http.delete_messages(self.channel.id, [m.id for m in messages], reason=self.reason)
+            self.deleted += len(messages)
+
+    async def _delete_one(self, message: discord.Message) -> bool:
+        try:
+            await self.http.delete_message(self.channel.id, message.id, reason=self.reason)
+        except discord.NotFound:
+            return False
+        self.deleted += 1
+        return True
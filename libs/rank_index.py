@@ -0,0 +1,43 @@
+from typing import Dict, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+
+class RankIndex:
+    """
+    Keeps keys ordered by value (highest first) so that ranks and leaderboard pages
+    can be read in O(log n) instead of sorting the whole mapping every time.
+    Equal values are ordered by key.
+    """
+
+    def __init__(self, values: Optional[Dict[int, int]] = None):
+        self._values: Dict[int, int] = dict(values or {})
+        self._order = SortedList((-v, k) for k, v in self._values.items())
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._values
+
+    def update(self, key: int, value: int) -> None:
+        old = self._values.get(key)
+        if old == value:
+            return
+        if old is not None:
+            self._order.remove((-old, key))
+        self._values[key] = value
+        self._order.add((-value, key))
+
+    def remove(self, key: int) -> None:
+        old = self._values.pop(key, None)
+        if old is not None:
+            self._order.remove((-old, key))
+
+    def rank(self, key: int) -> Optional[int]:
+        if key not in self._values:
+            return None
+        return self._order.index((-self._values[key], key)) + 1
+
+    def page(self, start: int, count: int) -> List[Tuple[int, int]]:
+        return [(k, -v) for v, k in self._order.islice(max(start, 0), max(start, 0) + count)]
@@ -40,99 +40,33 @@ def get_prefix(_bot: aoi.AoiBot, message: discord.Message):
     return commands.when_mentioned_or(_bot.db.prefixes[message.guild.id])(_bot, message)
 
 
-bot = aoi.AoiBot(command_prefix=get_prefix, help_command=None,
-                 intents=discord.Intents.all(), fetch_offline_users=True,
-                 chunk_members_on_startup=True)
-
-bot.load_extensions()
-
-
-@bot.check
-async def permission_check(ctx: aoi.AoiContext):  # noqa: C901
+async def permission_check(ctx: aoi.AoiContext):
     if not ctx.guild:
         return True
-    can_use = True
-    current_n = 0
 
     if ctx.author.id in ctx.bot.db.blacklisted:
         return
 
-    def update_use(can: bool, _n: int):
-        nonlocal current_n
-        nonlocal can_use
-        can_use = can
-        if not can:
-            current_n = _n
-
     if ctx.command.name == 'help':
         return True
 
     if ctx.command.cog.qualified_name == "Permissions":
         return True
-    perms = await bot.db.get_permissions(ctx.guild.id)
-    roles = [r.id for r in ctx.author.roles]
-    channel = ctx.channel.id
-    category = ctx.channel.category.id if ctx.channel.category else 0
-    command_name = ctx.command.name.lower()
-    cog_name = ctx.command.cog.qualified_name.lower()
-    user = ctx.author.id
-    for n, i in enumerate(perms):
-        tok = i.split()
-
-        if tok[0] == "asm":
-            update_use(tok[1] == "enable", n)
-        if tok[0] == "acm":
-            if channel == int(tok[1]):
-                update_use(tok[2] == "enable", n)
-        if tok[0] == "arm" and int(tok[1]) in roles:
-            update_use(tok[1] == "enable", n)
-        if tok[0] == "axm" and int(tok[1]) == category:
-            update_use(tok[2] == "enable", n)
-        if tok[0] == "aum" and int(tok[1]) == user:
-            update_use(tok[2] == "enable", n)
-
-        if tok[0] == "cm":
-            if ctx.channel.id == int(tok[1]) and \
-                    cog_name.lower() == tok[3].lower():
-                update_use(tok[2] == "enable", n)
-        if tok[0] == "sm":
-            if cog_name.lower() == tok[2].lower():
-                update_use(tok[1] == "enable", n)
-        if tok[0] == "xm":
-            if cog_name.lower() == tok[3].lower() and category == int(tok[1]):
-                update_use(tok[2] == "enable", n)
-        if tok[0] == "rm":
-            if cog_name.lower() == tok[3].lower() and int(tok[1]) in roles:
-                update_use(tok[2] == "enable", n)
-        if tok[0] == "um":
-            if cog_name.lower() == tok[3].lower() and int(tok[1]) == user:
-                update_use(tok[2] == "enable", n)
-
-        if tok[0] == "cc":
-            if ctx.channel.id == int(tok[1]) and \
-                    command_name.lower() == tok[3].lower():
-                update_use(tok[2] == "enable", n)
-        if tok[0] == "sc":
-            if command_name.lower() == tok[2].lower():
-                update_use(tok[1] == "enable", n)
-        if tok[0] == "xc":
-            if command_name.lower() == tok[3].lower() and category == int(tok[1]):
-                update_use(tok[2] == "enable", n)
-        if tok[0] == "rc":
-            if command_name.lower() == tok[3].lower() and int(tok[1]) in roles:
-                update_use(tok[2] == "enable", n)
-        if tok[0] == "rc":
-            if command_name.lower() == tok[3].lower() and int(tok[1]) == user:
-                update_use(tok[2] == "enable", n)
-    if not can_use:
-        raise aoi.PermissionFailed(f"Permission #{current_n} - {perms[current_n]} "
+    program = await ctx.bot.db.get_permission_program(ctx.guild.id)
+    denied = program.check(
+        ctx.command.name.lower(),
+        ctx.command.cog.qualified_name.lower(),
+        ctx.channel.id,
+        ctx.channel.category.id if ctx.channel.category else 0,
+        [r.id for r in ctx.author.roles],
+        ctx.author.id
+    )
+    if denied is not None:
+        raise aoi.PermissionFailed(f"Permission #{denied} - {program.chain[denied]} "
                                    f"is disallowing you from this command")
     return True
 
 
-dashboard = Dashboard(bot)
-
-
 def bot_process():
     try:
         bot.logger.info(f"Starting Aoi Bot with PID {os.getpid()}")
@@ -146,14 +80,25 @@ def dashboard_process():
     dashboard.run()
 
 
-_bot_proc = multiprocessing.Process(target=bot_process)
-_dash_proc = multiprocessing.Process(target=dashboard_process)
+# render workers import this module without running it, see aoi.render
+if __name__ == "__main__":
+    bot = aoi.AoiBot(command_prefix=get_prefix, help_command=None,
+                     intents=discord.Intents.all(), fetch_offline_users=True,
+                     chunk_members_on_startup=True)
+
+    bot.load_extensions()
+    bot.check(permission_check)
+
+    dashboard = Dashboard(bot)
+
+    _bot_proc = multiprocessing.Process(target=bot_process)
+    _dash_proc = multiprocessing.Process(target=dashboard_process)
 
-_bot_proc.start()
-_dash_proc.start()
+    _bot_proc.start()
+    _dash_proc.start()
 
-_bot_proc.join()
-_dash_proc.kill()
+    _bot_proc.join()
+    _dash_proc.kill()
 
-if bot.is_restarting:
-    os.execl(sys.executable, sys.executable, *sys.argv)
+    if bot.is_restarting:
+        os.execl(sys.executable, sys.executable, *sys.argv)
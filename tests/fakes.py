@@ -0,0 +1,101 @@
+"""Stand-ins for discord's HTTP layer, just enough of it for the code under test to run against"""
+import asyncio
+from typing import Dict, List, Optional
+
+try:
+    import discord
+except ImportError:
+    discord = None
+
+
+class FakeResponse:
+    def __init__(self, status: int, headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.reason = "fake"
+        self.headers = headers or {}
+
+
+def http_error(status: int, retry_after: Optional[float] = None) -> "discord.HTTPException":
+    response = FakeResponse(status, {"Retry-After": str(retry_after)} if retry_after is not None else None)
+    if status == 403:
+        return discord.Forbidden(response, "fake")
+    if status == 404:
+        return discord.NotFound(response, "fake")
+    return discord.HTTPException(response, "fake")
+
+
+class FakeRoute:
+    """
+    An endpoint called once per item. Each item can be given a list of statuses to fail with before
+    it succeeds, and every call is recorded with the loop time it started at.
+    """
+
+    def __init__(self, latency: float = 0, errors: Optional[Dict[object, List[int]]] = None,
+                 retry_after: float = 0.1):
+        self.latency = latency
+        self.errors = {item: list(statuses) for item, statuses in (errors or {}).items()}
+        self.retry_after = retry_after
+        self.calls: List[tuple] = []
+
+    async def __call__(self, item):
+        self.calls.append((item, asyncio.get_event_loop().time()))
+        await asyncio.sleep(self.latency)
+        statuses = self.errors.get(item)
+        if statuses:
+            status = statuses.pop(0)
+            raise http_error(status, self.retry_after if status == 429 else None)
+        return item
+
+    def times(self, item) -> List[float]:
+        return [time for called, time in self.calls if called == item]
+
+
+class FakeMessage:
+    def __init__(self, id: int, bot: bool = False):
+        self.id = id
+        self.pinned = False
+        self.bot = bot
+
+
+class FakeChannel:
+    """A channel whose history is fetched in pages of 100, each taking `latency` seconds"""
+
+    id = 1
+
+    def __init__(self, messages: List[FakeMessage], latency: float = 0, log: Optional[list] = None):
+        self.messages = messages
+        self.latency = latency
+        self.log = log if log is not None else []
+
+    async def history(self, limit: Optional[int] = None, before=None):  # noqa
+        for i, message in enumerate(self.messages[:limit]):
+            if i % 100 == 0:
+                self.log.append(("fetch", i))
+                await asyncio.sleep(self.latency)
+            yield message
+
+
+class FakeHTTP:
+    """Records bulk and single deletes, single deletes of the ids in `missing` raise NotFound"""
+
+    def __init__(self, latency: float = 0, log: Optional[list] = None, missing=(), bulk_error: Optional[int] = None):
+        self.latency = latency
+        self.log = log if log is not None else []
+        self.missing = set(missing)
+        self.bulk_error = bulk_error
+        self.deleting = 0
+
+    async def delete_messages(self, channel_id: int, message_ids: List[int], reason: Optional[str] = None):  # noqa
+        if self.bulk_error:
+            raise http_error(self.bulk_error)
+        self.deleting += 1
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.deleting -= 1
+        self.log.append(("bulk", list(message_ids)))
+
+    async def delete_message(self, channel_id: int, message_id: int, reason: Optional[str] = None):  # noqa
+        if message_id in self.missing:
+            raise http_error(404)
+        self.log.append(("one", message_id))
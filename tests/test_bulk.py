@@ -0,0 +1,60 @@
+import asyncio
+import unittest
+
+from tests.fakes import FakeRoute, discord
+
+if discord:
+    from aoi.bulk import BulkOperation
+
+
+@unittest.skipUnless(discord, "needs discord.py")
+class BulkOperationTest(unittest.IsolatedAsyncioTestCase):
+    async def test_rate_limit_pauses_every_worker(self):
+        route = FakeRoute(latency=0.01, errors={0: [429]}, retry_after=0.1)
+        operation = BulkOperation(range(12), route, retries=0)
+        await operation.run()
+        self.assertEqual(operation.ordered_results, list(range(12)))
+        self.assertFalse(operation.failed)
+        limited = route.times(0)[0]
+        # everything that started after the 429 waited for its Retry-After, and the 429 didn't use a retry
+        later = [time for _, time in route.calls if time > limited + 0.005]
+        self.assertTrue(later)
+        self.assertGreaterEqual(min(later), limited + 0.1)
+
+    async def test_server_errors_back_off(self):
+        route = FakeRoute(errors={0: [503, 502]})
+        operation = BulkOperation([0], route, retries=3, backoff=0.05)
+        await operation.run()
+        self.assertEqual(operation.results, {0: 0})
+        first, second, third = route.times(0)
+        self.assertGreaterEqual(second - first, 0.05)
+        self.assertGreaterEqual(third - second, 0.1)
+
+    async def test_failures_are_counted(self):
+        route = FakeRoute(errors={1: [403], 2: [500, 500, 500]})
+        operation = BulkOperation(range(4), route, retries=2, backoff=0.01)
+        await operation.run()
+        self.assertEqual(sorted(operation.results), [0, 3])
+        self.assertEqual({i: error.status for i, error in operation.failed.items()}, {1: 403, 2: 500})
+        # client errors aren't retried, server errors are until retries run out
+        self.assertEqual((len(route.times(1)), len(route.times(2))), (1, 3))
+        self.assertEqual(operation.remaining, [])
+        self.assertEqual(operation.status(), "2/4, 2 failed")
+
+    async def test_cancel_and_resume(self):
+        route = FakeRoute(latency=0.01)
+        operation = BulkOperation(range(40), route, concurrency=2)
+        task = asyncio.ensure_future(operation.run())
+        await asyncio.sleep(0.055)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        done = set(operation.results)
+        self.assertTrue(done)
+        self.assertEqual(set(operation.remaining), set(range(40)) - done)
+
+        await operation.run()
+        self.assertEqual(operation.ordered_results, list(range(40)))
+        # only the calls in flight when it was stopped are made twice
+        self.assertLessEqual(len(route.calls), 40 + operation.concurrency)
+        self.assertFalse(done & {item for item in range(40) if len(route.times(item)) > 1})
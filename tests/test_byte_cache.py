@@ -0,0 +1,43 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from libs.byte_cache import ByteCache
+
+
+class ByteCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    async def test_memory_then_disk(self):
+        cache = ByteCache(self.directory, 1024, 4096)
+        self.assertIsNone(await cache.get("a"))
+        await cache.put("a", b"x" * 100)
+        self.assertEqual(await cache.get("a"), b"x" * 100)
+        self.assertEqual(cache.memory_hits, 1)
+        # a new cache over the same directory only has the disk tier
+        cache = ByteCache(self.directory, 1024, 4096)
+        self.assertEqual(await cache.get("a"), b"x" * 100)
+        self.assertEqual(cache.disk_hits, 1)
+
+    async def test_limits(self):
+        cache = ByteCache(self.directory, 250, 350)
+        for key in "abcd":
+            await cache.put(key, key.encode() * 100)
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+        self.assertLessEqual(cache._memory_size, 250)
+        cache = ByteCache(self.directory, 250, 350)
+        self.assertIsNone(await cache.get("a"))
+        self.assertEqual(await cache.get("d"), b"d" * 100)
+
+    async def test_concurrent_puts(self):
+        cache = ByteCache(self.directory, 0, 10 ** 6)
+        await asyncio.gather(*(cache.put("a", bytes([i]) * 10000) for i in range(20)))
+        self.assertEqual(os.listdir(self.directory), [cache._name("a")])
+        data = await ByteCache(self.directory, 0, 10 ** 6).get("a")
+        self.assertEqual(len(set(data)), 1)
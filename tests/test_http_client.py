@@ -0,0 +1,74 @@
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+from libs.http_client import HttpClient
+
+
+class HttpClientTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hits = {"flaky": 0, "post": 0}
+
+        async def ok(_):
+            return web.json_response({"ok": True})
+
+        async def flaky(_):
+            self.hits["flaky"] += 1
+            if self.hits["flaky"] < 3:
+                return web.Response(status=503)
+            return web.json_response({"n": self.hits["flaky"]})
+
+        async def limited(_):
+            return web.Response(status=429, headers={"Retry-After": "0.05"})
+
+        async def missing(_):
+            return web.json_response({"code": 404}, status=404)
+
+        async def post(_):
+            self.hits["post"] += 1
+            return web.Response(status=503)
+
+        app = web.Application()
+        app.add_routes([web.get("/ok", ok), web.get("/flaky", flaky), web.get("/limited", limited),
+                        web.get("/missing", missing), web.post("/post", post)])
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"  # noqa
+        self.client = HttpClient(backoff=0.01)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.runner.cleanup()
+
+    async def test_retries_server_errors(self):
+        resp = await self.client.get(self.base + "/flaky")
+        self.assertEqual(resp.json(), {"n": 3})
+        stats = self.client.stats["127.0.0.1"]
+        self.assertEqual((stats.requests, stats.errors, stats.retries), (3, 2, 2))
+
+    async def test_gives_up_on_rate_limit(self):
+        resp = await self.client.get(self.base + "/limited")
+        self.assertEqual(resp.status, 429)
+        self.assertEqual(self.client.stats["127.0.0.1"].retries, 2)
+
+    async def test_post_is_not_retried(self):
+        resp = await self.client.post(self.base + "/post")
+        self.assertEqual(resp.status, 503)
+        self.assertEqual(self.hits["post"], 1)
+
+    async def test_client_errors_are_returned(self):
+        resp = await self.client.get(self.base + "/missing")
+        self.assertFalse(resp.ok)
+        self.assertEqual(resp.json(), {"code": 404})
+        with self.assertRaises(aiohttp.ClientResponseError):
+            resp.raise_for_status()
+
+    async def test_reuses_session(self):
+        for _ in range(5):
+            self.assertTrue((await self.client.get(self.base + "/ok")).ok)
+        session = self.client.session
+        await self.client.get(self.base + "/ok")
+        self.assertIs(self.client.session, session)
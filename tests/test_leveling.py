@@ -0,0 +1,30 @@
+import itertools
+import unittest
+
+from libs import leveling
+
+
+def scan_level(xp: int):
+    # the running-total scan xp.py and profile.py used before the closed form
+    total = 0
+    for lvl in itertools.count():
+        step = leveling.xp_per_level(lvl + 1)
+        if total + step > xp:
+            return lvl, xp - total
+        total += step
+
+
+class LevelingTest(unittest.TestCase):
+    def test_matches_the_scan(self):
+        xps = range(0, 200_000, 7)
+        self.assertEqual(leveling.levels(xps), [scan_level(xp) for xp in xps])
+
+    def test_level_boundaries(self):
+        for lvl in range(0, 100_000, 997):
+            total = leveling.total_xp(lvl)
+            self.assertEqual(leveling.level(total), (lvl, 0))
+            if lvl:
+                self.assertEqual(leveling.level(total - 1), (lvl - 1, leveling.xp_per_level(lvl) - 1))
+
+    def test_negative_xp(self):
+        self.assertEqual(leveling.levels([-5, 0]), [(0, 0), (0, 0)])
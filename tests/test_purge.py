@@ -0,0 +1,76 @@
+import asyncio
+import datetime
+import time
+import unittest
+
+from tests.fakes import FakeChannel, FakeHTTP, FakeMessage, discord
+
+if discord:
+    from libs.purge import Purge
+
+
+def snowflake(age: datetime.timedelta, n: int = 0) -> int:
+    return (int((time.time() - age.total_seconds()) * 1000 - discord.utils.DISCORD_EPOCH) << 22) + n
+
+
+def messages(count: int, age=datetime.timedelta(hours=1)):
+    # newest first, like history
+    return [FakeMessage(snowflake(age, count - i)) for i in range(count)]
+
+
+@unittest.skipUnless(discord, "needs discord.py")
+class PurgeTest(unittest.IsolatedAsyncioTestCase):
+    async def test_deletes_while_fetching(self):
+        log = []
+        purge = Purge(FakeHTTP(0.02, log), FakeChannel(messages(500), 0.02, log), 500, lambda m: True)
+        await purge.run()
+        self.assertEqual((purge.scanned, purge.deleted, purge.deleted_old), (500, 500, 0))
+        kinds = [kind for kind, _ in log]
+        # the first bulk delete goes out before history has been fully fetched
+        self.assertLess(kinds.index("bulk"), max(i for i, kind in enumerate(kinds) if kind == "fetch"))
+        self.assertTrue(all(len(ids) <= 100 for kind, ids in log if kind == "bulk"))
+
+    async def test_old_messages_are_deleted_one_at_a_time(self):
+        old = messages(3, datetime.timedelta(days=20))
+        recent = messages(5)
+        http = FakeHTTP(missing={old[1].id})
+        purge = Purge(http, FakeChannel(recent + old), 10, lambda m: True)
+        await purge.run()
+        self.assertEqual(http.log, [("bulk", [m.id for m in recent]), ("one", old[0].id), ("one", old[2].id)])
+        # the one that was already gone isn't counted
+        self.assertEqual((purge.deleted, purge.deleted_old), (7, 2))
+
+    async def test_single_recent_message_isnt_bulk_deleted(self):
+        http = FakeHTTP()
+        message = messages(1)[0]
+        await Purge(http, FakeChannel([message]), 1, lambda m: True).run()
+        self.assertEqual(http.log, [("one", message.id)])
+
+    async def test_scan_limit(self):
+        history = messages(300)
+        for message in history[::10]:
+            message.bot = True
+        purge = Purge(FakeHTTP(), FakeChannel(history), 50, lambda m: m.bot, scan_limit=200)
+        await purge.run()
+        self.assertEqual((purge.scanned, purge.deleted), (200, 20))
+        self.assertTrue(purge.scan_limited)
+        purge = Purge(FakeHTTP(), FakeChannel(history), 10, lambda m: m.bot, scan_limit=200)
+        await purge.run()
+        self.assertFalse(purge.scan_limited)
+
+    async def test_errors_are_raised(self):
+        purge = Purge(FakeHTTP(bulk_error=403), FakeChannel(messages(200)), 200, lambda m: True)
+        with self.assertRaises(discord.Forbidden):
+            await asyncio.wait_for(purge.run(), 2)
+        self.assertEqual(len(asyncio.all_tasks()), 1)
+
+    async def test_cancel_leaves_no_tasks(self):
+        http = FakeHTTP(0.05)
+        task = asyncio.ensure_future(Purge(http, FakeChannel(messages(1000), 0.02), 1000, lambda m: True).run())
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(asyncio.all_tasks()), 4)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(len(asyncio.all_tasks()), 1)
+        self.assertEqual(http.deleting, 0)
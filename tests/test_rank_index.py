@@ -0,0 +1,41 @@
+import random
+import unittest
+
+from libs.rank_index import RankIndex
+
+
+class RankIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.values = {user: random.randint(0, 50) for user in range(500)}
+        self.index = RankIndex(self.values)
+
+    def expected(self):
+        # highest first, ties by key, the same order the leaderboards used before
+        return sorted(self.values.items(), key=lambda x: (-x[1], x[0]))
+
+    def check(self):
+        order = self.expected()
+        self.assertEqual(len(self.index), len(order))
+        for rank, (user, _) in enumerate(order, 1):
+            self.assertEqual(self.index.rank(user), rank)
+        self.assertEqual(self.index.page(0, len(order)), order)
+        self.assertEqual(self.index.page(40, 10), order[40:50])
+
+    def test_matches_a_full_sort(self):
+        self.check()
+
+    def test_updates_and_removals(self):
+        for _ in range(2000):
+            user = random.randrange(600)
+            if random.random() < 0.1:
+                self.values.pop(user, None)
+                self.index.remove(user)
+            else:
+                self.values[user] = self.values.get(user, 0) + random.randint(0, 5)
+                self.index.update(user, self.values[user])
+        self.check()
+
+    def test_missing_keys(self):
+        self.assertIsNone(self.index.rank(10 ** 6))
+        self.index.remove(10 ** 6)
+        self.assertEqual(self.index.page(10 ** 6, 10), [])
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from typing import List, Tuple, Optional
 
-import aiohttp
+from libs.http_client import HttpClient
 
 
 @dataclass
@@ -17,8 +17,10 @@ class GelbooruBrowser:
     def __init__(self,
                  api_key: str,
                  user_id: str,
+                 client: HttpClient,
                  *,
                  banned_tags: List[str] = []):
+        self.client = client
         self.banned_tags = banned_tags
         self.api_key = api_key
         self.user_id = user_id
@@ -39,21 +41,19 @@ class GelbooruBrowser:
                 filtered_tag = True
         if not filtered_tags:
             return None, filtered_tag, False
-        async with aiohttp.ClientSession() as sess:
-            url = f"https://gelbooru.com/index.php?tags={'+'.join(filtered_tags)}" \
-                  f"&api_key={self.api_key}&user_id={self.user_id}" \
-                  f"&page=dapi&s=post&q=index&json=1&limit=100"
-            async with sess.get(url) as resp:
-                js = await resp.json()
-                if not js:
-                    return None, filtered_tag, False
-                for i in js:
-                    posts.append(GelbooruPost(
-                        image_url=i["file_url"],
-                        page=f"https://gelbooru.com/index.php?page=post&s=view&id={i['id']}",
-                        id=i["id"],
-                        tags=i["tags"].split()
-                    ))
+        url = f"https://gelbooru.com/index.php?tags={'+'.join(filtered_tags)}" \
+              f"&api_key={self.api_key}&user_id={self.user_id}" \
+              f"&page=dapi&s=post&q=index&json=1&limit=100"
+        js = (await self.client.get(url)).json()
+        if not js:
+            return None, filtered_tag, False
+        for i in js:
+            posts.append(GelbooruPost(
+                image_url=i["file_url"],
+                page=f"https://gelbooru.com/index.php?page=post&s=view&id={i['id']}",
+                id=i["id"],
+                tags=i["tags"].split()
+            ))
         filtered_post = False
         for i in posts:
             if any(e in self.banned_tags for e in i.tags):
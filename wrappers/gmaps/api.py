@@ -3,15 +3,16 @@ from __future__ import annotations
 import urllib.parse
 from typing import List
 
-import aiohttp
-
+from libs.http_client import HttpClient
 from ..gmaps import helpers as h
 
 
 class GeoLocation:
     def __init__(self,
-                 key: str):
+                 key: str,
+                 client: HttpClient):
         self.key = key
+        self.client = client
 
     def build_url(self, location: str) -> str:
         location = urllib.parse.quote_plus(location)
@@ -19,10 +20,9 @@ class GeoLocation:
                f"address={location}&key={self.key}"
 
     async def lookup_address(self, address: str) -> List[h.Location]:
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get(self.build_url(address)) as resp:
-                resp.raise_for_status()
-                js = await resp.json()
+        resp = await self.client.get(self.build_url(address))
+        resp.raise_for_status()
+        js = resp.json()
         locations: List[h.Location] = []
         for loc in js["results"]:
             geo = h.LocationGeometry(
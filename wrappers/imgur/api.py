@@ -2,12 +2,13 @@ import random
 import urllib.parse
 from typing import Tuple
 
-import aiohttp
+from libs.http_client import HttpClient
 
 
 class Imgur:
-    def __init__(self, user: str):
+    def __init__(self, user: str, client: HttpClient):
         self.user = user
+        self.client = client
 
     async def random_by_tag(self, tag: str) -> Tuple[str, str, str, str]:
         url = f"https://api.imgur.com/3/gallery/t/{urllib.parse.quote_plus(tag)}"
@@ -15,9 +16,7 @@ class Imgur:
             'Authorization': f'Client-ID {self.user}'
         }
 
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get(url, headers=headers) as resp:
-                js = random.choice((await resp.json())["data"]["items"])
+        js = random.choice((await self.client.get(url, headers=headers)).json()["data"]["items"])
 
         return (js["images"][0]["id"] if js["is_album"] else js["id"]), \
                js["id"], \
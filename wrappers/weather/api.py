@@ -1,15 +1,15 @@
 from datetime import datetime
 from typing import Dict, Tuple, List
 
-import aiohttp
-
+from libs.http_client import HttpClient
 from wrappers import gmaps
 from .helpers import LatLongLookupResult, WeatherCondition
 
 
 class WeatherGov:
-    def __init__(self, key: str):
+    def __init__(self, key: str, client: HttpClient):
         self.key = key
+        self.client = client
         self.grid_cache: Dict[Tuple[float, float], LatLongLookupResult] = {}
 
     async def lookup_grid(self, lat: float, long: float) -> \
@@ -18,10 +18,7 @@ class WeatherGov:
         long = round(long, 4)
         if (lat, long) in self.grid_cache:
             return self.grid_cache[(lat, long)]
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get(f"https://api.weather.gov/points/{lat},{long}") as resp:
-                js = await resp.json()
-                js = js["properties"]
+        js = (await self.client.get(f"https://api.weather.gov/points/{lat},{long}")).json()["properties"]
         result = LatLongLookupResult(
             point=gmaps.LocationCoordinates(
                 lat=lat,
@@ -41,9 +38,7 @@ class WeatherGov:
     async def lookup_hourly(self, location: gmaps.LocationCoordinates) -> \
             List[WeatherCondition]:
         grid = await self.lookup_grid(location.lat, location.long)
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get(grid.forecast_hourly_endpoint) as resp:
-                js = (await resp.json())["properties"]["periods"]
+        js = (await self.client.get(grid.forecast_hourly_endpoint)).json()["properties"]["periods"]
         return [
             WeatherCondition(
                 start=datetime.fromisoformat(wc["startTime"]),